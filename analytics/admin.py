@@ -0,0 +1,56 @@
+from django.contrib import admin
+
+from . import reports
+from . import serializers
+from .models import GatewayRollup, ProductSalesRollup, SalesRollup
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """
+    Rollups are written by `update_sales_rollups` only.
+    """
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(RollupAdmin):
+    list_display = ['start', 'period', 'orders', 'paid_orders', 'revenue', ]
+    list_filter = ['period', ]
+    date_hierarchy = 'start'
+    ordering = ['-start', ]
+
+    def changelist_view(self, request, extra_context=None):
+        # the dashboard above the list, from the daily rollups of the last 30 days
+        since, until = reports.date_range()
+        extra_context = {
+            **(extra_context or {}),
+            'since': since,
+            'until': until,
+            'totals': reports.totals(since, until),
+            'top_products': reports.top_products(since, until, 10),
+            'gateways': serializers.GatewayConversionSerializer(
+                reports.gateway_conversions(since, until), many=True
+            ).data,
+        }
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(ProductSalesRollup)
+class ProductSalesRollupAdmin(RollupAdmin):
+    list_display = ['day', 'product', 'units', 'revenue', ]
+    list_select_related = ['product', ]
+    date_hierarchy = 'day'
+    ordering = ['-day', '-units', ]
+
+
+@admin.register(GatewayRollup)
+class GatewayRollupAdmin(RollupAdmin):
+    list_display = ['day', 'gateway', 'payment_requests', 'paid_orders', 'conversion', ]
+    list_select_related = ['gateway', ]
+    date_hierarchy = 'day'
+    ordering = ['-day', ]
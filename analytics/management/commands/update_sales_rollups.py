@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from analytics import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Adds the orders, payments and payment requests created since the last run to the sales rollups. '
+        'Run it periodically, e.g. every few minutes from cron.'
+    )
+
+    def handle(self, *args, **options):
+        since, until = rollups.update()
+        if since == until:
+            self.stdout.write('nothing new to roll up.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'rolled up the rows from {since or "the beginning"} to {until}.'))
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('payments', '0003_alter_paymentrequest_timestamp'),
+        ('products', '0003_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Name')),
+                ('processed_until', models.DateTimeField(null=True, verbose_name='Processed Until')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Period')),
+                ('start', models.DateTimeField(verbose_name='Start')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Orders')),
+                ('paid_orders', models.PositiveIntegerField(default=0, verbose_name='Paid Orders')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='Revenue')),
+            ],
+            options={
+                'unique_together': {('period', 'start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GatewayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('payment_requests', models.PositiveIntegerField(default=0, verbose_name='Payment Requests')),
+                ('paid_orders', models.PositiveIntegerField(default=0, verbose_name='Paid Orders')),
+                ('gateway', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='payments.gateway', verbose_name='Gateway')),
+            ],
+            options={
+                'unique_together': {('day', 'gateway')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Units')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='Revenue')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='Product')),
+            ],
+            options={
+                'unique_together': {('day', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import models
+
+from payments.models import Gateway
+from products.models import Product
+
+
+class SalesRollup(models.Model):
+    """
+    Orders created, orders paid and revenue per hour or day, maintained by `analytics.rollups`.
+    """
+    PERIOD_HOUR = 'hour'
+    PERIOD_DAY = 'day'
+    PERIODS = [
+        (PERIOD_HOUR, 'Hour'),
+        (PERIOD_DAY, 'Day'),
+    ]
+
+    period = models.CharField('Period', max_length=4, choices=PERIODS)
+    start = models.DateTimeField('Start')
+    orders = models.PositiveIntegerField('Orders', default=0)
+    paid_orders = models.PositiveIntegerField('Paid Orders', default=0)
+    revenue = models.BigIntegerField('Revenue', default=0)
+
+    class Meta:
+        unique_together = [['period', 'start']]
+
+    def __str__(self):
+        return f'{self.period} {self.start}'
+
+
+class ProductSalesRollup(models.Model):
+    """
+    Units of a product sold and their revenue per day.
+    """
+    day = models.DateField('Day')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name='Product')
+    units = models.PositiveIntegerField('Units', default=0)
+    revenue = models.BigIntegerField('Revenue', default=0)
+
+    class Meta:
+        unique_together = [['day', 'product']]
+
+
+class GatewayRollup(models.Model):
+    """
+    Payment requests sent to a gateway and orders paid through it per day.
+    """
+    day = models.DateField('Day')
+    gateway = models.ForeignKey(Gateway, on_delete=models.CASCADE, related_name='+', verbose_name='Gateway')
+    payment_requests = models.PositiveIntegerField('Payment Requests', default=0)
+    paid_orders = models.PositiveIntegerField('Paid Orders', default=0)
+
+    class Meta:
+        unique_together = [['day', 'gateway']]
+
+    @property
+    def conversion(self):
+        return self.paid_orders / self.payment_requests if self.payment_requests else None
+
+
+class RollupWatermark(models.Model):
+    """
+    Time up to which the rows of a rollup job were processed.
+    """
+    name = models.CharField('Name', max_length=50, primary_key=True)
+    processed_until = models.DateTimeField('Processed Until', null=True)
@@ -0,0 +1,44 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import GatewayRollup, ProductSalesRollup, SalesRollup
+
+
+# reports read the rollups only, never the orders
+
+
+def date_range(since=None, until=None, days=30):
+    until = until or timezone.localdate()
+    return since or until - timedelta(days=days - 1), until
+
+
+def sales(period, since, until):
+    start = timezone.make_aware(datetime.combine(since, time()))
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=1), time()))
+    return SalesRollup.objects.filter(period=period, start__gte=start, start__lt=end).order_by('start')
+
+
+def totals(since, until):
+    return sales(SalesRollup.PERIOD_DAY, since, until).aggregate(
+        orders=Sum('orders'), paid_orders=Sum('paid_orders'), revenue=Sum('revenue')
+    )
+
+
+def top_products(since, until, limit):
+    return list(
+        ProductSalesRollup.objects.filter(day__range=(since, until))
+        .values('product', 'product__title')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-units', 'product')[:limit]
+    )
+
+
+def gateway_conversions(since, until):
+    return list(
+        GatewayRollup.objects.filter(day__range=(since, until))
+        .values('gateway', 'gateway__name')
+        .annotate(payment_requests=Sum('payment_requests'), paid_orders=Sum('paid_orders'))
+        .order_by('gateway')
+    )
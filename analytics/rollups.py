@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Trunc, TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from payments.models import PaymentRequest
+
+from .models import GatewayRollup, ProductSalesRollup, RollupWatermark, SalesRollup
+
+
+WATERMARK = 'sales'
+
+
+def window(field, since, until):
+    lookup = Q(**{f'{field}__lte': until})
+    if since is not None:
+        lookup &= Q(**{f'{field}__gt': since})
+    return lookup
+
+
+def accumulate(model, keys, counters, rows, batch_size=1000):
+    """
+    Adds the `counters` of each row to the rollup row with the same `keys`, creating the missing ones.
+    Only called under the watermark lock, so reading and writing the counters can't race another run.
+    """
+    if not rows:
+        return
+    existing = {
+        tuple(getattr(rollup, key) for key in keys): rollup
+        for rollup in model.objects.filter(**{f'{key}__in': {row[key] for row in rows} for key in keys})
+    }
+    created, updated = [], []
+    for row in rows:
+        identity = tuple(row[key] for key in keys)
+        rollup = existing.get(identity)
+        if rollup is None:
+            rollup = existing[identity] = model(**{key: row[key] for key in keys})
+            created.append(rollup)
+        elif rollup.pk is not None:
+            updated.append(rollup)
+        for counter in counters:
+            setattr(rollup, counter, getattr(rollup, counter) + (row[counter] or 0))
+    model.objects.bulk_update(updated, counters, batch_size=batch_size)
+    model.objects.bulk_create(created, batch_size=batch_size)
+
+
+def paid_orders(since, until):
+    orders = Order.objects.filter(window('datetime_paid', since, until))
+    if since is None:
+        # orders paid before `datetime_paid` existed count on the day they were created
+        orders = Order.objects.filter(
+            window('datetime_paid', since, until)
+            | Q(is_paid=True, datetime_paid__isnull=True, datetime_created__lte=until)
+        )
+    return orders.annotate(paid_at=Coalesce('datetime_paid', 'datetime_created'))
+
+
+def add_sales(since, until):
+    created = Order.objects.filter(window('datetime_created', since, until))
+    paid = paid_orders(since, until)
+    for period in (SalesRollup.PERIOD_HOUR, SalesRollup.PERIOD_DAY):
+        accumulate(SalesRollup, ['period', 'start'], ['orders'], [
+            {'period': period, 'start': row['start'], 'orders': row['orders']}
+            for row in created.annotate(start=Trunc('datetime_created', period)).values('start').annotate(
+                orders=Count('id')
+            ).order_by()
+        ])
+        accumulate(SalesRollup, ['period', 'start'], ['paid_orders', 'revenue'], [
+            {'period': period, 'start': row['start'], 'paid_orders': row['paid_orders'], 'revenue': row['revenue']}
+            for row in paid.annotate(start=Trunc('paid_at', period)).values('start').annotate(
+                paid_orders=Count('id'), revenue=Sum('total_price')
+            ).order_by()
+        ])
+
+
+def add_product_sales(since, until):
+    items = OrderItem.objects.filter(order__in=paid_orders(since, until).values('id'))
+    accumulate(ProductSalesRollup, ['day', 'product_id'], ['units', 'revenue'], [
+        {'day': row['day'], 'product_id': row['product'], 'units': row['units'], 'revenue': row['revenue']}
+        for row in items.annotate(
+            day=TruncDate(Coalesce('order__datetime_paid', 'order__datetime_created'))
+        ).values('day', 'product').annotate(units=Count('id'), revenue=Sum('price')).order_by()
+    ])
+
+
+def add_gateway_conversions(since, until):
+    requests = PaymentRequest.objects.filter(window('timestamp', since, until))
+    accumulate(GatewayRollup, ['day', 'gateway_id'], ['payment_requests'], [
+        {'day': row['day'], 'gateway_id': row['gateway'], 'payment_requests': row['payment_requests']}
+        for row in requests.annotate(day=TruncDate('timestamp')).values('day', 'gateway').annotate(
+            payment_requests=Count('id')
+        ).order_by()
+    ])
+    # an order is paid through the gateway of its last payment request
+    last_gateway = PaymentRequest.objects.filter(order=OuterRef('pk')).order_by('-timestamp').values('gateway')[:1]
+    paid = paid_orders(since, until).annotate(paid_gateway=Subquery(last_gateway)).filter(paid_gateway__isnull=False)
+    accumulate(GatewayRollup, ['day', 'gateway_id'], ['paid_orders'], [
+        {'day': row['day'], 'gateway_id': row['paid_gateway'], 'paid_orders': row['paid_orders']}
+        for row in paid.annotate(day=TruncDate('paid_at')).values('day', 'paid_gateway').annotate(
+            paid_orders=Count('id')
+        ).order_by()
+    ])
+
+
+def update(until=None):
+    """
+    Adds the orders, payments and payment requests since the watermark to the rollups and moves
+    the watermark, so each run only reads new rows. The first run processes the whole history.
+    Returns the processed (since, until) window.
+    """
+    until = until or timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG)
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(name=WATERMARK)
+        # concurrent runs wait here instead of counting the same rows twice
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+        since = watermark.processed_until
+        if since is not None and since >= until:
+            return since, since
+        add_sales(since, until)
+        add_product_sales(since, until)
+        add_gateway_conversions(since, until)
+        watermark.processed_until = until
+        watermark.save()
+    return since, until
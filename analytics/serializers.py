@@ -0,0 +1,41 @@
+from rest_framework import serializers
+
+from .models import GatewayRollup, SalesRollup
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=SalesRollup.PERIODS, default=SalesRollup.PERIOD_DAY)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate(self, data):
+        if 'since' in data and 'until' in data and data['since'] > data['until']:
+            raise serializers.ValidationError({'message': 'since should be before until.'})
+        return data
+
+
+class SalesRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SalesRollup
+        fields = ['start', 'orders', 'paid_orders', 'revenue']
+
+
+class ProductSalesSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    title = serializers.CharField(source='product__title')
+    units = serializers.IntegerField()
+    revenue = serializers.IntegerField()
+
+
+class GatewayConversionSerializer(serializers.Serializer):
+    gateway = serializers.IntegerField()
+    name = serializers.CharField(source='gateway__name')
+    payment_requests = serializers.IntegerField()
+    paid_orders = serializers.IntegerField()
+    conversion = serializers.SerializerMethodField()
+
+    def get_conversion(self, row):
+        return GatewayRollup(
+            payment_requests=row['payment_requests'], paid_orders=row['paid_orders']
+        ).conversion
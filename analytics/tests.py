@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.test import TestCase
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from core.tokens import RefreshToken
+
+from orders.models import Order, OrderItem
+from payments.models import Gateway, PaymentRequest
+from products.models import Product
+
+from . import rollups
+from .views import AnalyticsView
+from .models import GatewayRollup, ProductSalesRollup, SalesRollup
+
+
+#################################################
+#                                               #
+#                                               #
+#             Rollups Test Cases                #
+#                                               #
+#                                               #
+#################################################
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(minute=30, second=0, microsecond=0)
+        self.user = get_user_model().objects.create_user(
+            username='testuser', phone_number='+989123456789', password='password'
+        )
+        self.gateway = Gateway.objects.create(name='Gateway', is_active=True, description='test gateway')
+        self.product = Product.objects.create(title='Test Product', price=10)
+
+    def order(self, created, paid=None, requested=True):
+        order = Order.objects.create(user=self.user, total_price=10, is_paid=paid is not None)
+        OrderItem.objects.create(order=order, product=self.product, price=10)
+        Order.objects.filter(id=order.id).update(datetime_created=created, datetime_paid=paid)
+        if requested:
+            request = PaymentRequest.objects.create(user=self.user, gateway=self.gateway, order=order)
+            PaymentRequest.objects.filter(id=request.id).update(timestamp=created)
+        return order
+
+    def test_update_is_incremental(self):
+        self.order(self.now - timedelta(hours=3), paid=self.now - timedelta(hours=2))
+        self.order(self.now - timedelta(hours=3))
+        rollups.update(self.now - timedelta(hours=1))
+
+        days = SalesRollup.objects.filter(period=SalesRollup.PERIOD_DAY)
+        self.assertEqual(days.aggregate(Sum('orders'), Sum('paid_orders'), Sum('revenue')), {
+            'orders__sum': 2, 'paid_orders__sum': 1, 'revenue__sum': 10
+        })
+
+        # rows older than the watermark aren't counted again, new ones are added
+        self.order(self.now - timedelta(minutes=50), paid=self.now - timedelta(minutes=40))
+        since, until = rollups.update(self.now)
+        self.assertEqual(since, self.now - timedelta(hours=1))
+        self.assertEqual(rollups.update(self.now), (self.now, self.now))
+
+        self.assertEqual(SalesRollup.objects.filter(period=SalesRollup.PERIOD_HOUR).count(), 3)
+        self.assertEqual(
+            sum(SalesRollup.objects.filter(period=SalesRollup.PERIOD_DAY).values_list('paid_orders', flat=True)), 2
+        )
+        self.assertEqual(sum(ProductSalesRollup.objects.values_list('units', flat=True)), 2)
+        gateway = GatewayRollup.objects.filter(gateway=self.gateway)
+        self.assertEqual(sum(gateway.values_list('payment_requests', flat=True)), 3)
+        self.assertEqual(sum(gateway.values_list('paid_orders', flat=True)), 2)
+
+    def test_first_run_counts_orders_paid_before_datetime_paid(self):
+        order = self.order(self.now - timedelta(days=2), requested=False)
+        Order.objects.filter(id=order.id).update(is_paid=True)
+        call_command('update_sales_rollups', stdout=StringIO())
+        self.assertEqual(SalesRollup.objects.get(period=SalesRollup.PERIOD_DAY).paid_orders, 1)
+
+
+#################################################
+#                                               #
+#                                               #
+#              Views Test Cases                 #
+#                                               #
+#                                               #
+#################################################
+
+
+class AnalyticsViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', phone_number='+989123456780', password='password'
+        )
+        product = Product.objects.create(title='Test Product', price=10)
+        gateway = Gateway.objects.create(name='Gateway', is_active=True, description='test gateway')
+        today = timezone.localdate()
+        ProductSalesRollup.objects.create(day=today, product=product, units=3, revenue=30)
+        GatewayRollup.objects.create(day=today, gateway=gateway, payment_requests=4, paid_orders=3)
+
+    def test_staff_only(self):
+        user = get_user_model().objects.create_user(
+            username='testuser', phone_number='+989123456789', password='password'
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('analytics_sales'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_reports(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('analytics_products'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['units'], 3)
+
+        response = self.client.get(reverse('analytics_gateways'))
+        self.assertEqual(response.data[0]['conversion'], 0.75)
+
+        response = self.client.get(reverse('analytics_sales'), {'since': '2024-02-01', 'until': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch.object(AnalyticsView, 'authentication_classes', [JWTStatelessUserAuthentication])
+    def test_staff_with_stateless_tokens(self):
+        """
+        Test that staff status is read from the user row when tokens are authenticated without it.
+        """
+        access = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {access}')
+        response = self.client.get(reverse('analytics_products'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # tokens issued while the user was staff stop working once it isn't
+        get_user_model().objects.filter(pk=self.admin.pk).update(is_staff=False)
+        response = self.client.get(reverse('analytics_products'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_dashboard(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:analytics_salesrollup_changelist'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, '75%')
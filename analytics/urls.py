@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+
+urlpatterns = [
+    path('sales/', views.SalesAnalyticsView.as_view(), name='analytics_sales'),
+    path('products/', views.ProductAnalyticsView.as_view(), name='analytics_products'),
+    path('gateways/', views.GatewayAnalyticsView.as_view(), name='analytics_gateways'),
+]
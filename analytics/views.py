@@ -0,0 +1,64 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+
+from drf_yasg.utils import swagger_auto_schema
+
+from core.permissions import IsStaffUser
+
+from . import reports
+from . import serializers
+
+
+class AnalyticsView(APIView):
+    """
+    Base of the analytics views, staff only. Reads the rollups kept by `update_sales_rollups`,
+    so figures lag behind the orders by up to the interval of that job.
+    """
+    http_method_names = ['get', ]
+    permission_classes = [IsStaffUser]
+
+    def get_params(self, request):
+        serializer = serializers.AnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        since, until = reports.date_range(params.get('since'), params.get('until'))
+        return params, since, until
+
+
+class SalesAnalyticsView(AnalyticsView):
+    @swagger_auto_schema(
+        operation_description="Orders, paid orders and revenue per hour or day, the last 30 days by default.",
+        query_serializer=serializers.AnalyticsQuerySerializer,
+        responses={200: serializers.SalesRollupSerializer(many=True)}
+    )
+    def get(self, request):
+        params, since, until = self.get_params(request)
+        serializer = serializers.SalesRollupSerializer(reports.sales(params['period'], since, until), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ProductAnalyticsView(AnalyticsView):
+    @swagger_auto_schema(
+        operation_description="Best selling products by units, the last 30 days by default.",
+        query_serializer=serializers.AnalyticsQuerySerializer,
+        responses={200: serializers.ProductSalesSerializer(many=True)}
+    )
+    def get(self, request):
+        params, since, until = self.get_params(request)
+        serializer = serializers.ProductSalesSerializer(
+            reports.top_products(since, until, params['limit']), many=True
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class GatewayAnalyticsView(AnalyticsView):
+    @swagger_auto_schema(
+        operation_description="Payment requests, paid orders and conversion per gateway, the last 30 days by default.",
+        query_serializer=serializers.AnalyticsQuerySerializer,
+        responses={200: serializers.GatewayConversionSerializer(many=True)}
+    )
+    def get(self, request):
+        _, since, until = self.get_params(request)
+        serializer = serializers.GatewayConversionSerializer(reports.gateway_conversions(since, until), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
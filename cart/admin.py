@@ -1,15 +1,47 @@
 from django.contrib import admin
 
+from core.pagination import EstimatedCountPaginator
+
 from . import models
 
 
 class CartItemInlines(admin.TabularInline):
+    """
+    Products in the cart are shown read only from one joined query, a product widget per line would query
+    the product again for each of them and carts can hold hundreds. Products are added with `AddCartItemInline`.
+    """
     model = models.CartItem
-    fields = ['id', 'product', ]
+    fields = ['product', ]
+    readonly_fields = ['product', ]
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class AddCartItemInline(admin.TabularInline):
+    """
+    Empty rows adding products to the cart, picked with the autocomplete widget instead of a select
+    of the whole catalog.
+    """
+    model = models.CartItem
+    fields = ['product', ]
+    autocomplete_fields = ['product', ]
+    extra = 1
+    verbose_name_plural = 'add products'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).none()
+
 
 @admin.register(models.Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'user']
-    inlines = [CartItemInlines, ]
+    list_select_related = ['user', ]
+    autocomplete_fields = ['user', ]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [CartItemInlines, AddCartItemInline, ]
@@ -4,6 +4,3 @@ from django.apps import AppConfig
 class CartConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cart'
-
-    def ready(self):
-        import cart.signals
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from products.models import Product
+from .models import CartItem, GuestCart
+from .utils import get_or_create_cart_id, purchased_by
+
+
+SIGNING_SALT = 'cart.guest'
+# cache value of carts kept in the database
+SPILLED = 'spilled'
+
+
+#################################################
+#                                               #
+#                                               #
+#                 Guest Tokens                  #
+#                                               #
+#                                               #
+#################################################
+
+
+def make_guest_token(cart_id):
+    return signing.dumps(str(cart_id), salt=SIGNING_SALT)
+
+
+def get_guest_cart_id(request):
+    """
+    Returns the guest cart id of the request from the guest cart cookie or the X-Guest-Cart header,
+    None if there is none or its signature is invalid or expired.
+    """
+    token = request.COOKIES.get(settings.GUEST_CART_COOKIE) or request.META.get('HTTP_X_GUEST_CART')
+    if not token:
+        return None
+    try:
+        return signing.loads(token, salt=SIGNING_SALT, max_age=settings.GUEST_CART_TIMEOUT)
+    except signing.BadSignature:
+        return None
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Guest Store                  #
+#                                               #
+#                                               #
+#################################################
+
+
+class GuestCartStore:
+    """
+    Keeps the product ids of each guest cart as a list under a single cache key.
+    Carts with more than `GUEST_CART_CACHE_MAX_ITEMS` products spill over to the `GuestCart` table
+    and their cache key only marks them as spilled.
+    """
+    prefix = 'guest_cart:'
+
+    def get(self, cart_id):
+        product_ids = cache.get(self.prefix + str(cart_id))
+        if product_ids is None or product_ids == SPILLED:
+            # a missing key may be a spilled cart whose marker was evicted
+            product_ids = GuestCart.objects.filter(id=cart_id).values_list('product_ids', flat=True).first()
+        return product_ids or []
+
+    def save(self, cart_id, product_ids):
+        key = self.prefix + str(cart_id)
+        timeout = settings.GUEST_CART_TIMEOUT.total_seconds()
+        if len(product_ids) > settings.GUEST_CART_CACHE_MAX_ITEMS:
+            GuestCart.objects.update_or_create(id=cart_id, defaults={'product_ids': product_ids})
+            cache.set(key, SPILLED, timeout=timeout)
+            return
+        self._delete_spilled(cart_id)
+        cache.set(key, product_ids, timeout=timeout)
+
+    def delete(self, cart_id):
+        self._delete_spilled(cart_id)
+        cache.delete(self.prefix + str(cart_id))
+
+    def _delete_spilled(self, cart_id):
+        # only carts not known to live in the cache can have a database row
+        if cache.get(self.prefix + str(cart_id)) in (None, SPILLED):
+            GuestCart.objects.filter(id=cart_id).delete()
+
+
+def merge_guest_cart(request, user):
+    """
+    Adds the products of the request's guest cart to the user's cart and deletes the guest cart.
+    Deleted and already purchased products are dropped, the rest is inserted in one query.
+    Returns the number of merged products.
+    """
+    guest_cart_id = get_guest_cart_id(request)
+    if guest_cart_id is None:
+        return 0
+
+    store = GuestCartStore()
+    product_ids = store.get(guest_cart_id)
+    if product_ids:
+        product_ids = list(
+            Product.objects.filter(id__in=product_ids)
+            .exclude(purchased_by(user))
+            .values_list('id', flat=True)
+        )
+    if product_ids:
+        cart_id = get_or_create_cart_id(user)
+        CartItem.objects.bulk_create(
+            [CartItem(cart_id=cart_id, product_id=product_id) for product_id in product_ids],
+            ignore_conflicts=True
+        )
+    store.delete(guest_cart_id)
+    return len(product_ids)
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.models import Cart, GuestCart
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes carts without items, except those touched in the last CART_PURGE_GRACE, '
+        'and expired guest carts in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows deleted per query.'
+        )
+
+    def handle(self, *args, **options):
+        deleted = 0
+        # a cart getting its first product is touched before the product is inserted, sparing recently
+        # touched carts keeps the insert from finding its cart deleted
+        empty = Cart.objects.filter(
+            items__isnull=True, datetime_updated__lt=timezone.now() - settings.CART_PURGE_GRACE
+        )
+
+        while True:
+            ids = list(empty.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            # check again in the delete so a cart filled or touched since the select is kept
+            count, _ = empty.filter(id__in=ids).delete()
+            deleted += count
+
+        self.stdout.write(self.style.SUCCESS(f'deleted {deleted} empty carts.'))
+
+        # guest carts spilled to the database outlive their cache keys
+        cutoff = timezone.now() - settings.GUEST_CART_TIMEOUT
+        deleted, _ = GuestCart.objects.filter(datetime_updated__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'deleted {deleted} expired guest carts.'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_alter_cart_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestCart',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('product_ids', models.JSONField(default=list)),
+                ('datetime_updated', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_guestcart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='datetime_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
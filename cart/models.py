@@ -12,6 +12,8 @@ class Cart(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
         verbose_name='Cart', related_name='cart'
     )
+    # touched when a product is added, so `purge_empty_carts` spares carts being filled
+    datetime_updated = models.DateTimeField(auto_now=True, db_index=True)
 
 
 class CartItem(models.Model):
@@ -20,3 +22,12 @@ class CartItem(models.Model):
 
     class Meta:
         unique_together = [['cart', 'product']]
+
+
+class GuestCart(models.Model):
+    """
+    Guest carts too big for the cache, see `cart.guest.GuestCartStore`.
+    """
+    id = models.UUIDField(primary_key=True)
+    product_ids = models.JSONField(default=list)
+    datetime_updated = models.DateTimeField(auto_now=True, db_index=True)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 from products.models import Product
 from . import models
 
@@ -30,7 +31,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', ]
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
 
@@ -41,3 +42,12 @@ class CartSerializer(serializers.ModelSerializer):
 
     def get_total_price(self, cart):
         return sum([item.product.price for item in cart.items.all()])
+
+
+class GuestCartSerializer(TimedSerializerMixin, serializers.Serializer):
+    id = serializers.UUIDField(allow_null=True)
+    products = CartProductSerializer(many=True)
+    total_price = serializers.SerializerMethodField()
+
+    def get_total_price(self, cart):
+        return sum([product.price for product in cart['products']])
@@ -1,15 +1,28 @@
 from django.urls import reverse
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from core.testing import QueryBudgetMixin
+from core.tokens import RefreshToken
 from products.models import Product
-from orders.models import Order, OrderItem
+from orders.archive import archive
+from orders.models import ArchivedOrderItem, Order, OrderItem
 
-from .models import CartItem
+from .models import Cart, CartItem, GuestCart
 from . import serializers
+from .views import CartView
 
 
 #################################################
@@ -33,7 +46,7 @@ class CartViewTests(TestCase):
             password='testpassword'
         )
         self.client.force_authenticate(user=self.user)
-        self.cart = self.user.cart
+        self.cart = Cart.objects.create(user=self.user)
         self.product_1 = Product.objects.create(
             title='Test Product 1', 
             price=10, 
@@ -62,6 +75,26 @@ class CartViewTests(TestCase):
         self.assertEqual(response.data['code'], 201)
         self.assertEqual(response.data['message'], 'product added to your cart.')
 
+    def test_get_cart_without_cart(self):
+        """
+        Test that a user without a cart gets an empty one without creating it.
+        """
+        self.cart.delete()
+        response = self.client.get(self.cart_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': None, 'items': [], 'total_price': 0})
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_add_product_creates_cart(self):
+        """
+        Test that adding the first product creates the user's cart.
+        """
+        self.cart.delete()
+        response = self.client.post(self.cart_url, {'product': self.product_1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(list(cart.items.values_list('product_id', flat=True)), [self.product_1.id])
+
     def test_add_existing_product_to_cart(self):
         """
         Test adding an already existing product to the current user's cart.
@@ -89,6 +122,42 @@ class CartViewTests(TestCase):
         self.assertEqual(response.data['code'], 400)
         self.assertEqual(response.data['message'], 'you have already purchased this product.')
 
+    def test_rejected_add_creates_no_cart(self):
+        """
+        Test that adding a purchased product doesn't leave an empty cart behind.
+        """
+        self.cart.delete()
+        order = Order.objects.create(user=self.user, total_price=10)
+        OrderItem.objects.create(order=order, product=self.product_1, price=10)
+        response = self.client.post(self.cart_url, {'product': self.product_1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_add_product_touches_cart(self):
+        """
+        Test that adding a product to an old empty cart touches it so the purge spares it.
+        """
+        Cart.objects.filter(id=self.cart.id).update(datetime_updated=timezone.now() - timedelta(days=1))
+        response = self.client.post(self.cart_url, {'product': self.product_1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.cart.refresh_from_db()
+        self.assertGreater(self.cart.datetime_updated, timezone.now() - timedelta(minutes=1))
+
+    def test_add_archived_purchase_to_cart(self):
+        """
+        Test that a product stays purchased once its order is moved to the archive.
+        """
+        order = Order.objects.create(user=self.user, total_price=10, status=Order.ORDER_STATUS_PAID, is_paid=True)
+        OrderItem.objects.create(order=order, product=self.product_1, price=10)
+        archive(timezone.now() + timedelta(days=1))
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertTrue(ArchivedOrderItem.objects.filter(product=self.product_1).exists())
+
+        response = self.client.post(self.cart_url, {'product': self.product_1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'you have already purchased this product.')
+        self.assertFalse(CartItem.objects.exists())
+
     def test_remove_product_from_cart(self):
         """
         Test removing a product from the current user's cart.
@@ -113,6 +182,183 @@ class CartViewTests(TestCase):
         self.assertEqual(response.data['message'], 'product not found in your cart.')
 
 
+@patch.object(CartView, 'authentication_classes', [JWTStatelessUserAuthentication])
+class CartViewStatelessAuthTests(TestCase):
+    def setUp(self):
+        """
+        Set up a user authenticated with an access token.
+        """
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            password='testpassword'
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {access}')
+
+    def test_token_carries_cart_id(self):
+        """
+        Test that access tokens carry the user's cart id.
+        """
+        access = RefreshToken.for_user(self.user).access_token
+        self.assertEqual(access['cart_id'], str(self.cart.id))
+
+    def test_get_cart_without_user_query(self):
+        """
+        Test that getting the cart only queries the cart and its items.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], str(self.cart.id))
+
+    def test_purged_cart_claim(self):
+        """
+        Test that a token whose cart was purged uses the cart created after it.
+        """
+        product = Product.objects.create(title='Test Product', price=10)
+        Cart.objects.update(datetime_updated=timezone.now() - timedelta(days=1))
+        call_command('purge_empty_carts', stdout=StringIO())
+        self.assertFalse(Cart.objects.filter(id=self.cart.id).exists())
+        response = self.client.post(reverse('cart'), {'product': product.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        cart = Cart.objects.get(user=self.user)
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['id'], str(cart.id))
+        self.assertEqual(len(response.data['items']), 1)
+        response = self.client.patch(reverse('cart'), {'product': product.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class GuestCartViewTests(TestCase):
+    def setUp(self):
+        """
+        Set up products and a clean cache for guest carts.
+        """
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.url = reverse('guest-cart')
+        self.client = APIClient()
+        self.product_1 = Product.objects.create(title='Test Product 1', price=10, thumbnail='https://picsum.photos/200/300')
+        self.product_2 = Product.objects.create(title='Test Product 2', price=20, thumbnail='https://picsum.photos/200/300')
+
+    def test_add_and_get_guest_cart(self):
+        """
+        Test that a guest builds a cart identified by the returned cookie.
+        """
+        response = self.client.post(self.url, {'product': self.product_1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('guest_token', response.data)
+
+        response = self.client.post(self.url, {'product': self.product_1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        response = self.client.get(self.url)
+        self.assertEqual([product['id'] for product in response.data['products']], [self.product_1.id])
+        self.assertEqual(response.data['total_price'], 10)
+        self.assertFalse(GuestCart.objects.exists())
+
+    def test_guest_token_header(self):
+        """
+        Test that the guest token is accepted in the X-Guest-Cart header and forged ones are ignored.
+        """
+        token = self.client.post(self.url, {'product': self.product_1.id}, format='json').data['guest_token']
+        client = APIClient()
+        self.assertEqual(len(client.get(self.url, HTTP_X_GUEST_CART=token).data['products']), 1)
+        self.assertEqual(client.get(self.url, HTTP_X_GUEST_CART=token + 'x').data['products'], [])
+
+    @override_settings(GUEST_CART_CACHE_MAX_ITEMS=1)
+    def test_large_guest_cart_spills_to_database(self):
+        """
+        Test that carts over the cache limit move to the database and back when they shrink.
+        """
+        self.client.post(self.url, {'product': self.product_1.id}, format='json')
+        self.client.post(self.url, {'product': self.product_2.id}, format='json')
+        self.assertEqual(GuestCart.objects.get().product_ids, [self.product_1.id, self.product_2.id])
+        self.assertEqual(len(self.client.get(self.url).data['products']), 2)
+
+        response = self.client.patch(self.url, {'product': self.product_2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(GuestCart.objects.exists())
+        self.assertEqual(len(self.client.get(self.url).data['products']), 1)
+
+    def test_merge_on_login(self):
+        """
+        Test that logging in merges the guest cart without purchased products and clears it.
+        """
+        user = get_user_model().objects.create_user(
+            username='testuser', phone_number='+989123456780', password='testpassword'
+        )
+        order = Order.objects.create(user=user, total_price=20)
+        OrderItem.objects.create(order=order, product=self.product_2, price=20)
+        product_3 = Product.objects.create(title='Test Product 3', price=30)
+        archived_order = Order.objects.create(user=user, total_price=30)
+        OrderItem.objects.create(order=archived_order, product=product_3, price=30)
+        Order.objects.filter(id=archived_order.id).update(datetime_created=timezone.now() - timedelta(days=400))
+        archive(timezone.now() - timedelta(days=365))
+        for product in [self.product_1, self.product_2, product_3]:
+            self.client.post(self.url, {'product': product.id}, format='json')
+
+        response = self.client.post(
+            reverse('login'), {'phone_number': '+989123456780', 'password': 'testpassword'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cart = Cart.objects.get(user=user)
+        self.assertEqual(list(cart.items.values_list('product_id', flat=True)), [self.product_1.id])
+        self.assertEqual(RefreshToken(response.data['refresh'])['cart_id'], str(cart.id))
+        self.assertEqual(self.client.get(self.url).data['products'], [])
+
+
+class CartQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        """
+        Set up a user with a cart and products to fill it with.
+        """
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = [
+            Product.objects.create(title=f'Test Product {number}', price=10, thumbnail='https://picsum.photos/200/300')
+            for number in range(6)
+        ]
+        CartItem.objects.create(cart=self.cart, product=self.products[0])
+
+    def fill_cart(self):
+        CartItem.objects.bulk_create([CartItem(cart=self.cart, product=product) for product in self.products[1:5]])
+
+    def test_get_cart_queries(self):
+        response = self.assertConstantQueries('GET cart', lambda: self.client.get(reverse('cart')), self.fill_cart)
+        self.assertEqual(len(response.data['items']), 5)
+
+    def test_add_product_queries(self):
+        response = self.assertQueryBudget(
+            'POST cart', lambda: self.client.post(reverse('cart'), {'product': self.products[5].id}, format='json')
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_remove_product_queries(self):
+        response = self.assertQueryBudget(
+            'PATCH cart', lambda: self.client.patch(reverse('cart'), {'product': self.products[0].id}, format='json')
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_get_guest_cart_queries(self):
+        client = APIClient()
+        client.post(reverse('guest-cart'), {'product': self.products[0].id}, format='json')
+
+        def fill_guest_cart():
+            for product in self.products[1:5]:
+                client.post(reverse('guest-cart'), {'product': product.id}, format='json')
+
+        response = self.assertConstantQueries('GET guest-cart', lambda: client.get(reverse('guest-cart')), fill_guest_cart)
+        self.assertEqual(len(response.data['products']), 5)
+
+
 #################################################
 #                                               #
 #                                               #
@@ -133,7 +379,7 @@ class CartSerializerTests(TestCase):
             password='testpassword'
         )
         self.client.force_authenticate(user=self.user)
-        self.cart = self.user.cart
+        self.cart = Cart.objects.create(user=self.user)
         self.product = Product.objects.create(
             title='Test Product 1', 
             price=10, 
@@ -187,7 +433,7 @@ class CartModelTests(TestCase):
             password='testpassword'
         )
         self.client.force_authenticate(user=self.user)
-        self.cart = self.user.cart
+        self.cart = Cart.objects.create(user=self.user)
         self.product_1 = Product.objects.create(
             title='Test Product 1', 
             price=10, 
@@ -202,6 +448,30 @@ class CartModelTests(TestCase):
     def test_create_cart(self):
         self.assertEqual(self.cart, self.user.cart)
 
+    def test_user_created_without_cart(self):
+        user = get_user_model().objects.create_user(
+            username='newuser', phone_number='+989123456780', password='testpassword'
+        )
+        self.assertFalse(Cart.objects.filter(user=user).exists())
+
+    def test_purge_empty_carts(self):
+        CartItem.objects.create(cart=self.cart, product=self.product_1)
+        user = get_user_model().objects.create_user(
+            username='newuser', phone_number='+989123456780', password='testpassword'
+        )
+        empty_cart = Cart.objects.create(user=user)
+        another_user = get_user_model().objects.create_user(
+            username='anotheruser', phone_number='+989123456781', password='testpassword'
+        )
+        touched_cart = Cart.objects.create(user=another_user)
+        Cart.objects.exclude(id=touched_cart.id).update(datetime_updated=timezone.now() - timedelta(days=1))
+
+        call_command('purge_empty_carts', stdout=StringIO())
+        self.assertTrue(Cart.objects.filter(id=self.cart.id).exists())
+        self.assertFalse(Cart.objects.filter(id=empty_cart.id).exists())
+        # a cart touched by a product being added stays until the grace period is over
+        self.assertTrue(Cart.objects.filter(id=touched_cart.id).exists())
+
     def test_add_cart_item(self):
         cart_item = CartItem.objects.create(cart=self.cart , product=self.product_1)
         self.assertEqual(cart_item.cart, self.cart)
@@ -217,3 +487,67 @@ class CartModelTests(TestCase):
         CartItem.objects.create(cart=self.cart , product=self.product_2)
         total_price = sum(item.product.price for item in self.cart .items.all())
         self.assertEqual(total_price, 30)
+
+
+#################################################
+#                                               #
+#                                               #
+#              Admin Test Cases                 #
+#                                               #
+#                                               #
+#################################################
+
+
+class CartAdminTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', phone_number='+989123456780', password='password'
+        )
+        self.client.force_login(self.admin)
+        self.cart = Cart.objects.create(user=self.admin)
+        self.product = Product.objects.create(title='Test Product', price=10)
+        self.url = reverse('admin:cart_cart_change', args=[self.cart.pk])
+
+    def fill_cart(self, count=5):
+        for number in range(count):
+            CartItem.objects.create(cart=self.cart, product=Product.objects.create(title=f'Filler {number}', price=10))
+
+    def test_add_cart_item_inline(self):
+        """
+        Test that staff can add cart lines from the cart page with the product autocomplete.
+        """
+        in_cart = CartItem.objects.create(
+            cart=self.cart, product=Product.objects.create(title='In Cart', price=10)
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'admin-autocomplete')
+
+        response = self.client.post(self.url, {
+            'id': self.cart.pk,
+            'user': self.admin.pk,
+            # the lines in the cart, read only
+            'items-TOTAL_FORMS': '1',
+            'items-INITIAL_FORMS': '1',
+            'items-MIN_NUM_FORMS': '0',
+            'items-MAX_NUM_FORMS': '1000',
+            'items-0-id': in_cart.pk,
+            'items-0-cart': self.cart.pk,
+            # the rows adding products
+            'items-2-TOTAL_FORMS': '1',
+            'items-2-INITIAL_FORMS': '0',
+            'items-2-MIN_NUM_FORMS': '0',
+            'items-2-MAX_NUM_FORMS': '1000',
+            'items-2-0-product': self.product.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertCountEqual(
+            self.cart.items.values_list('product_id', flat=True), [in_cart.product_id, self.product.pk]
+        )
+
+    def test_cart_change_queries(self):
+        self.fill_cart(1)
+        # warms up the content types cache
+        self.client.get(self.url)
+        response = self.assertConstantQueries('GET admin:cart_cart_change', lambda: self.client.get(self.url), self.fill_cart)
+        self.assertContains(response, 'Filler 4')
@@ -5,4 +5,5 @@ from . import views
 
 urlpatterns = [
     path('', views.CartView.as_view(), name='cart'),
+    path('guest/', views.GuestCartView.as_view(), name='guest-cart'),
 ]
@@ -0,0 +1,56 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Cart
+
+
+def cart_lookup(user):
+    # stateless jwt users carry their cart id in the token, other users' carts are found by user.
+    # the id is matched with the user too, the claim outlives carts purged while empty
+    cart_id = getattr(user, 'cart_id', None)
+    if cart_id:
+        return {'id': cart_id, 'user_id': user.pk}
+    return {'user_id': user.pk}
+
+
+def find_cart(queryset, user):
+    """
+    Returns the first row of `queryset` for the user's cart, found by the token's cart id,
+    or by user when the token has none or its cart was deleted since. None if the user has no cart.
+    """
+    lookup = cart_lookup(user)
+    cart = queryset.filter(**lookup).first()
+    if cart is None and 'id' in lookup:
+        cart = queryset.filter(user_id=user.pk).first()
+    return cart
+
+
+def get_cart_id(user):
+    """
+    Returns the id of the user's cart, None if the user has no cart yet.
+    Carts are created on the first product added, so readers should treat None as an empty cart.
+    """
+    return find_cart(Cart.objects.values_list('id', flat=True), user)
+
+
+def get_or_create_cart_id(user, cart_id=None):
+    """
+    Returns the id of the user's cart, `cart_id` if it still exists, creating the cart if the user has none.
+    Call it right before adding products: the cart is touched so `purge_empty_carts` doesn't delete it
+    while it is still empty.
+    """
+    now = timezone.now()
+    if cart_id and Cart.objects.filter(id=cart_id).update(datetime_updated=now):
+        return cart_id
+    # the unique cart user makes get_or_create safe when two first adds race
+    cart, created = Cart.objects.get_or_create(user_id=user.pk)
+    if not created:
+        Cart.objects.filter(id=cart.id).update(datetime_updated=now)
+    return cart.id
+
+
+def purchased_by(user):
+    """
+    Filter for `Product` matching the products the user has ordered, archived orders included.
+    """
+    return Q(order_items__order__user_id=user.pk) | Q(archived_order_items__order__user_id=user.pk)
@@ -1,16 +1,21 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db.models import Prefetch
 
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from . import serializers
 from . import models
-from orders.models import OrderItem
+from .guest import GuestCartStore, get_guest_cart_id, make_guest_token
+from .utils import find_cart, get_cart_id, get_or_create_cart_id, purchased_by
+from products.models import Product
+
+from uuid import uuid4
 
 
 class CartView(APIView):
@@ -36,16 +41,18 @@ class CartView(APIView):
         Retrieve the current state of the authenticated user's cart.
 
         This method fetches the user's cart, including all items and their associated products,
-        and returns it in a serialized format.
+        and returns it in a serialized format. Users without a cart get an empty one.
 
         Returns:
             Response: Contains the serialized cart data with a status of 200.
         """
-        cart_id = self.request.user.cart.id
-        cart = get_object_or_404(
-            models.Cart.objects.prefetch_related('items__product').all(),
-            id=cart_id
-        )
+        # two queries whatever the number of items, the cart and its items with their products
+        cart = find_cart(models.Cart.objects.prefetch_related(
+            Prefetch('items', queryset=models.CartItem.objects.select_related('product'))
+        ), self.request.user)
+        if cart is None:
+            # carts are created on the first product added
+            return Response({'id': None, 'items': [], 'total_price': 0}, status=status.HTTP_200_OK)
         serializer = serializers.CartSerializer(cart)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
@@ -94,10 +101,11 @@ class CartView(APIView):
         serializer = serializers.AddCartItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        cart_id = self.request.user.cart.id
+        # validated before the cart is created, so rejected adds don't leave empty carts behind
+        cart_id = get_cart_id(self.request.user)
         product = serializer.validated_data['product']
 
-        if models.CartItem.objects.filter(cart_id=cart_id, product_id=product.id).exists():
+        if cart_id and models.CartItem.objects.filter(cart_id=cart_id, product_id=product.id).exists():
             return Response(
                 {
                     'code': 405,
@@ -105,12 +113,8 @@ class CartView(APIView):
                 }, status=status.HTTP_405_METHOD_NOT_ALLOWED
             )
 
-        existing_order_item = OrderItem.objects.filter(
-            order__user=request.user,
-            product_id=product.id,
-        ).exists()
-
-        if existing_order_item:
+        # orders moved to the archive count as purchased too
+        if Product.objects.filter(purchased_by(request.user), id=product.id).exists():
             return Response(
                 {
                     'code': 400,
@@ -118,6 +122,7 @@ class CartView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST
             )
         
+        cart_id = get_or_create_cart_id(self.request.user, cart_id)
         models.CartItem.objects.create(cart_id=cart_id, product=product)
 
         return Response(
@@ -163,7 +168,7 @@ class CartView(APIView):
         serializer = serializers.RemoveCartItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        cart_id = self.request.user.cart.id
+        cart_id = get_cart_id(self.request.user)
         product = serializer.validated_data['product']
 
         try:
@@ -182,3 +187,139 @@ class CartView(APIView):
                     'message': 'product not found in your cart.'
                 }, status=status.HTTP_404_NOT_FOUND
             )
+
+
+class GuestCartView(APIView):
+    """
+    API view to manage the cart of an anonymous user.
+
+    The cart is identified by the signed guest token returned when the first product is added,
+    sent back as the guest cart cookie or the X-Guest-Cart header.
+    It is merged into the user's cart on login.
+    """
+    http_method_names = ['get', 'patch', 'post', ]
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    guest_token_parameter = openapi.Parameter(
+        'X-Guest-Cart', openapi.IN_HEADER, type=openapi.TYPE_STRING, required=False,
+        description='Guest token, alternatively sent as the guest cart cookie.'
+    )
+
+    @swagger_auto_schema(
+        manual_parameters=[guest_token_parameter],
+        responses={200: serializers.GuestCartSerializer()},
+        operation_description="Get the guest cart details."
+    )
+    def get(self, request):
+        cart_id = get_guest_cart_id(request)
+        product_ids = GuestCartStore().get(cart_id) if cart_id else []
+        products = Product.objects.filter(id__in=product_ids) if product_ids else []
+        serializer = serializers.GuestCartSerializer({'id': cart_id, 'products': products})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Add product to guest cart.",
+        manual_parameters=[guest_token_parameter],
+        request_body=serializers.AddCartItemSerializer,
+        responses={
+            201: openapi.Response('Created', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description='Product added to cart successfully.',
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=201),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='product added to your cart.'),
+                    'guest_token': openapi.Schema(type=openapi.TYPE_STRING, example='guest_token_example')
+                }
+            )),
+            405: openapi.Response('Method Not Allowed', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description='Product is already in your cart.',
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=405),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='product is already in your cart.')
+                }
+            ))
+        }
+    )
+    def post(self, request):
+        serializer = serializers.AddCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        store = GuestCartStore()
+        cart_id = get_guest_cart_id(request)
+        product_ids = store.get(cart_id) if cart_id else []
+        cart_id = cart_id or str(uuid4())
+        product = serializer.validated_data['product']
+
+        if product.id in product_ids:
+            return Response(
+                {
+                    'code': 405,
+                    'message': 'product is already in your cart.'
+                }, status=status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+
+        store.save(cart_id, product_ids + [product.id])
+
+        guest_token = make_guest_token(cart_id)
+        response = Response(
+            {
+                'code': 201,
+                'message': 'product added to your cart.',
+                'guest_token': guest_token,
+            }, status=status.HTTP_201_CREATED
+        )
+        response.set_cookie(
+            settings.GUEST_CART_COOKIE, guest_token,
+            max_age=settings.GUEST_CART_TIMEOUT, httponly=True, samesite='Lax'
+        )
+        return response
+
+    @swagger_auto_schema(
+        operation_description="Remove product from guest cart.",
+        manual_parameters=[guest_token_parameter],
+        request_body=serializers.RemoveCartItemSerializer,
+        responses={
+            204: openapi.Response('No Content', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description='Product Removed from cart successfully.',
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=204),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='product removed from your cart.')
+                }
+            )),
+            404: openapi.Response('Not Found', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description='Product not found in cart.',
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=404),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='product not found in your cart.')
+                }
+            ))
+        }
+    )
+    def patch(self, request):
+        serializer = serializers.RemoveCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        store = GuestCartStore()
+        cart_id = get_guest_cart_id(request)
+        product_ids = store.get(cart_id) if cart_id else []
+        product = serializer.validated_data['product']
+
+        if product.id not in product_ids:
+            return Response(
+                {
+                    'code': 404,
+                    'message': 'product not found in your cart.'
+                }, status=status.HTTP_404_NOT_FOUND
+            )
+
+        store.save(cart_id, [product_id for product_id in product_ids if product_id != product.id])
+        return Response(
+            {
+                'code': 204,
+                'message': 'product removed from your cart'
+            }, status=status.HTTP_204_NO_CONTENT
+        )
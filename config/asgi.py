@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# picks the database connection defaults suited to ASGI, see DATABASE_POOL_MODE
+os.environ.setdefault('DJANGO_SERVER', 'asgi')
 
 application = get_asgi_application()
@@ -13,8 +13,12 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import importlib.util
 from datetime import timedelta
 
+import django
+from django.core.exceptions import ImproperlyConfigured
+
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -72,15 +76,18 @@ INSTALLED_APPS = [
     'cart.apps.CartConfig',
     'orders.apps.OrdersConfig',
     'payments.apps.PaymentsConfig',
+    'analytics.apps.AnalyticsConfig',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -121,6 +128,65 @@ DATABASES = {
   }
 }
 
+# Database connections
+# `none` opens a connection per request, the default under ASGI (config/asgi.py sets DJANGO_SERVER=asgi).
+# `persistent` keeps the connection of each worker thread for DATABASE_CONN_MAX_AGE seconds and checks it
+# before reusing it, the default under WSGI. It's for WSGI only: under ASGI sync code runs in sync_to_async
+# threads whose connections aren't closed reliably, and django's docs advise disabling persistent connections.
+# `pool` would use psycopg 3 connection pools shared by the threads of a process, it needs django 5.1+ and
+# psycopg[pool], so it can't be enabled with the pinned django 5.0 and psycopg2 and raises ImproperlyConfigured.
+DJANGO_SERVER = os.getenv('DJANGO_SERVER', default='wsgi')
+DATABASE_POOL_MODE = os.getenv('DATABASE_POOL_MODE', default='none' if DJANGO_SERVER == 'asgi' else 'persistent')
+
+if DATABASE_POOL_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DATABASE_CONN_MAX_AGE', default=60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DATABASE_POOL_MODE == 'pool':
+    if django.VERSION < (5, 1) or importlib.util.find_spec('psycopg_pool') is None:
+        raise ImproperlyConfigured('DATABASE_POOL_MODE `pool` needs django 5.1+ and psycopg[pool].')
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', default=2)),
+            'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', default=10)),
+            'timeout': int(os.getenv('DATABASE_POOL_TIMEOUT', default=10)),
+        },
+    }
+elif DATABASE_POOL_MODE != 'none':
+    raise ImproperlyConfigured(f'unknown DATABASE_POOL_MODE `{DATABASE_POOL_MODE}`.')
+
+# Read replicas
+# comma separated hosts of replicas of the default database, safe requests of catalog and history views
+# read from them. Users read from the primary for DATABASE_REPLICA_PIN_SECONDS after writing,
+# which should be above the replication lag.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', default='').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', default=10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+
+# Otp store
+# `cache` keeps otps in expiring cache keys and needs a cache shared by all workers,
+# otherwise otps are kept in the database and purged by the `purge_expired_otps` command
+OTP_STORE = os.getenv(
+    'OTP_STORE',
+    default='database' if CACHES['default']['BACKEND'].endswith('LocMemCache') else 'cache'
+)
+OTP_CACHE_GRACE = timedelta(minutes=10)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -141,6 +207,34 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# the preferred hasher is picked by PROFILE (`pbkdf2`, `scrypt` or `argon2`, which needs argon2-cffi),
+# the others stay installed so existing hashes verify and get upgraded on login.
+# POOL_SIZE > 0 runs hashing in a bounded thread pool, 0 runs it in the request thread.
+PASSWORD_HASHING = {
+    'PROFILE': os.getenv('PASSWORD_HASHER_PROFILE', default='pbkdf2'),
+    'PBKDF2_ITERATIONS': int(os.getenv('PBKDF2_ITERATIONS', default=720000)),
+    'SCRYPT_WORK_FACTOR': int(os.getenv('SCRYPT_WORK_FACTOR', default=2 ** 14)),
+    'ARGON2_TIME_COST': int(os.getenv('ARGON2_TIME_COST', default=2)),
+    'ARGON2_MEMORY_COST': int(os.getenv('ARGON2_MEMORY_COST', default=102400)),
+    'ARGON2_PARALLELISM': int(os.getenv('ARGON2_PARALLELISM', default=8)),
+    'POOL_SIZE': int(os.getenv('PASSWORD_HASHING_POOL_SIZE', default=0)),
+}
+
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'core.hashers.ScryptPasswordHasher',
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PROFILES[PASSWORD_HASHING['PROFILE']],
+    *[hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHING['PROFILE']],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -165,14 +259,67 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # SMS provider
-KavenegarAPIKey = os.getenv('KavenegarAPIKey')
-KavenegarTemplate = os.getenv('KavenegarTemplate')
+KAVENEGAR_API_KEY = os.getenv('KavenegarAPIKey')
+KAVENEGAR_TEMPLATE = os.getenv('KavenegarTemplate')
+# `kavenegar` or `fake` (local provider for development and load tests)
+SMS_PROVIDER = os.getenv('SMS_PROVIDER', default='kavenegar')
+# send sms from background workers instead of the request thread
+SMS_ASYNC = os.getenv('SMS_ASYNC', default='True') == 'True'
+SMS_TIMEOUT = float(os.getenv('SMS_TIMEOUT', default=5))
+SMS_POOL_SIZE = int(os.getenv('SMS_POOL_SIZE', default=10))
+SMS_WORKERS = int(os.getenv('SMS_WORKERS', default=2))
+SMS_MAX_RETRIES = int(os.getenv('SMS_MAX_RETRIES', default=3))
+SMS_RETRY_BACKOFF = float(os.getenv('SMS_RETRY_BACKOFF', default=1))
+SMS_QUEUE_SIZE = int(os.getenv('SMS_QUEUE_SIZE', default=1000))
+SMS_FAKE_LATENCY = float(os.getenv('SMS_FAKE_LATENCY', default=0))
+
+# Rate limits
+# storage is `cache` (shared through CACHES), `database` (the RateLimit table, purged by the
+# `purge_rate_limits` command) or `memory` (per process). `cache` needs a cache shared by all workers,
+# a per process cache would reset limits like the one payment per hour on restarts and across workers
+RATE_LIMIT_STORAGE = os.getenv(
+    'RATE_LIMIT_STORAGE',
+    default='database' if CACHES['default']['BACKEND'].endswith('LocMemCache') else 'cache'
+)
+RATE_LIMITS = {
+    'payment': {'rate': '1/60m', 'algorithm': 'sliding_window'},
+    'login': {'rate': os.getenv('LOGIN_RATE_LIMIT', default='10/m'), 'algorithm': 'token_bucket'},
+    'otp_send': {'rate': os.getenv('OTP_SEND_RATE_LIMIT', default='5/h'), 'algorithm': 'sliding_window'},
+    'otp_verify': {'rate': os.getenv('OTP_VERIFY_RATE_LIMIT', default='5/m'), 'algorithm': 'token_bucket'},
+}
+
+# Metrics
+# share of the requests whose latency, queries and serializer time are recorded and served on /metrics/,
+# the endpoint requires `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', default=1))
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', default='True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Pagination
+# lists of more than PAGINATION_ESTIMATE_THRESHOLD rows aren't counted on every page: unfiltered ones use
+# the PostgreSQL row estimate, filtered ones a count cached for PAGINATION_COUNT_CACHE_SECONDS, see `core.pagination`
+PAGINATION_ESTIMATE_THRESHOLD = int(os.getenv('PAGINATION_ESTIMATE_THRESHOLD', default=100000))
+PAGINATION_COUNT_CACHE_SECONDS = int(os.getenv('PAGINATION_COUNT_CACHE_SECONDS', default=600))
+
+# Async views
+# threads async views wait in for blocking calls to the gateways and the sms provider
+ASYNC_IO_THREADS = int(os.getenv('ASYNC_IO_THREADS', default=64))
 
 # Rest
+# JWT_AUTH_MODE `stateless` builds request.user from the access token claims without a database query,
+# `database` loads the user row on every request (deactivated users are rejected immediately)
+JWT_AUTH_MODE = os.getenv('JWT_AUTH_MODE', default='database')
+JWT_AUTHENTICATION_CLASSES = {
+    'database': 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'stateless': 'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        JWT_AUTHENTICATION_CLASSES[JWT_AUTH_MODE],
     ),
+    # lists are only paginated by views setting a page size
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.EstimatedCountPageNumberPagination',
 }
 
 
@@ -188,10 +335,21 @@ AUTHENTICATION_BACKENDS = (
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT', ),
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=1)
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.serializers.TokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'core.authentication.ClaimsUser',
 }
 
 
+# `cache` keeps blacklisted refresh token jtis in expiring cache keys and needs a cache shared by all workers,
+# otherwise the token_blacklist tables are used and pruned by the `prune_token_blacklist` command
+JWT_BLACKLIST_BACKEND = os.getenv(
+    'JWT_BLACKLIST_BACKEND',
+    default='database' if CACHES['default']['BACKEND'].endswith('LocMemCache') else 'cache'
+)
+
+
 # Djoser
 DJOSER = {
     "USER_CREATE_PASSWORD_RETYPE": False,
@@ -213,3 +371,72 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
 # Payment gateways
 OXAPAY_MERCHANT_API_KEY = 'sandbox'
+PAYMENT_REQUEST_RETENTION_DAYS = int(os.getenv('PAYMENT_REQUEST_RETENTION_DAYS', default=30))
+PAYMENT_GATEWAY_TIMEOUT = float(os.getenv('PAYMENT_GATEWAY_TIMEOUT', default=10))
+PAYMENT_GATEWAY_CIRCUIT_BREAKER = {
+    'FAILURE_RATE_THRESHOLD': float(os.getenv('PAYMENT_GATEWAY_FAILURE_RATE_THRESHOLD', default=0.5)),
+    'MINIMUM_CALLS': int(os.getenv('PAYMENT_GATEWAY_MINIMUM_CALLS', default=5)),
+    'SLOW_CALL_THRESHOLD': float(os.getenv('PAYMENT_GATEWAY_SLOW_CALL_THRESHOLD', default=5)),
+    'WINDOW': int(os.getenv('PAYMENT_GATEWAY_BREAKER_WINDOW', default=60)),
+    'RECOVERY_TIMEOUT': int(os.getenv('PAYMENT_GATEWAY_RECOVERY_TIMEOUT', default=30)),
+    'HIDE_UNHEALTHY': os.getenv('PAYMENT_GATEWAY_HIDE_UNHEALTHY', default='True') == 'True',
+}
+
+
+# Carts
+# purge_empty_carts only deletes empty carts untouched for CART_PURGE_GRACE, adding a product touches the cart
+CART_PURGE_GRACE = timedelta(minutes=int(os.getenv('CART_PURGE_GRACE_MINUTES', default=60)))
+
+
+# Guest carts
+# anonymous carts are identified by a signed token sent back as a cookie or the X-Guest-Cart header,
+# carts with more than GUEST_CART_CACHE_MAX_ITEMS products are kept in the database instead of the cache
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_TIMEOUT = timedelta(days=int(os.getenv('GUEST_CART_TIMEOUT_DAYS', default=7)))
+GUEST_CART_CACHE_MAX_ITEMS = int(os.getenv('GUEST_CART_CACHE_MAX_ITEMS', default=20))
+
+
+# Product ranking
+# best seller sorts of the product list return pages of PRODUCT_RANKING_PAGE_SIZE products,
+# clients may ask for up to PRODUCT_RANKING_MAX_PAGE_SIZE with ?limit=
+PRODUCT_RANKING_PAGE_SIZE = int(os.getenv('PRODUCT_RANKING_PAGE_SIZE', default=20))
+PRODUCT_RANKING_MAX_PAGE_SIZE = int(os.getenv('PRODUCT_RANKING_MAX_PAGE_SIZE', default=100))
+
+
+# Product recommendations
+# "customers also bought" products shown on the product detail, rebuilt offline by
+# the build_product_recommendations command from the orders of the last PRODUCT_RECOMMENDATION_DAYS
+PRODUCT_RECOMMENDATIONS = int(os.getenv('PRODUCT_RECOMMENDATIONS', default=10))
+PRODUCT_RECOMMENDATION_DAYS = int(os.getenv('PRODUCT_RECOMMENDATION_DAYS', default=365))
+
+
+# Sales analytics
+# update_sales_rollups only processes rows older than ANALYTICS_ROLLUP_LAG seconds,
+# so transactions still in flight when it runs are not skipped by the watermark
+ANALYTICS_ROLLUP_LAG = int(os.getenv('ANALYTICS_ROLLUP_LAG', default=300))
+
+
+# Order archive
+# the archive_orders command moves settled orders older than ORDER_ARCHIVE_DAYS, whose payment requests
+# were pruned, to the archive tables. Order history pages (?limit=&offset=) only read the archive
+# once they are past the recent orders, pages hold ORDER_HISTORY_PAGE_SIZE orders by default and
+# up to ORDER_HISTORY_MAX_PAGE_SIZE. Without ?limit or ?offset the whole history is returned as a list,
+# the response existing clients read
+ORDER_ARCHIVE_DAYS = int(os.getenv('ORDER_ARCHIVE_DAYS', default=365))
+ORDER_HISTORY_PAGE_SIZE = int(os.getenv('ORDER_HISTORY_PAGE_SIZE', default=20))
+ORDER_HISTORY_MAX_PAGE_SIZE = int(os.getenv('ORDER_HISTORY_MAX_PAGE_SIZE', default=100))
+
+
+# OpenAPI schema
+# generate_openapi_schema writes the schema and its gzip version to OPENAPI_SCHEMA_FILE at deploy time,
+# /openapi.json serves them, or generates the schema once per process when the file is missing.
+# The swagger and redoc pages are cached for OPENAPI_UI_CACHE_SECONDS
+OPENAPI_SCHEMA_FILE = os.getenv('OPENAPI_SCHEMA_FILE', default=str(STATIC_ROOT / 'openapi.json'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', default=300))
+OPENAPI_UI_CACHE_SECONDS = int(os.getenv('OPENAPI_UI_CACHE_SECONDS', default=3600))
+SWAGGER_SETTINGS = {
+    'SPEC_URL': 'openapi_schema',
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': 'openapi_schema',
+}
@@ -18,21 +18,17 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.schema import API_INFO
+from core.views import metrics, openapi_schema
 
+
+# the pages load the schema from /openapi.json (SWAGGER_SETTINGS), they don't introspect the views
 schema_view = get_schema_view(
-   openapi.Info(
-      title="SigloyLand API",
-      default_version='v1',
-      description="SigloyLand API Documentation",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="esi.taheri@yahoo.com"),
-      license=openapi.License(name="BSD License"),
-   ),
+   API_INFO,
    public=True,
    permission_classes=(permissions.AllowAny,),
 )
@@ -46,9 +42,12 @@ urlpatterns = [
     path('cart/', include('cart.urls')),
     path('orders/', include('orders.urls')),
     path('payment/', include('payments.urls')),
+    path('analytics/', include('analytics.urls')),
     path('auth/', include('djoser.urls.jwt')),
     path('auth/', include('core.urls')),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('metrics/', metrics, name='metrics'),
+    path('openapi.json', openapi_schema, name='openapi_schema'),
+    path('swagger/', schema_view.with_ui('swagger', cache_timeout=settings.OPENAPI_UI_CACHE_SECONDS), name='schema-swagger-ui'),
+    path('redoc/', schema_view.with_ui('redoc', cache_timeout=settings.OPENAPI_UI_CACHE_SECONDS), name='schema-redoc'),
     path('', lambda request: redirect('/swagger/')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,7 +1,15 @@
 from django.contrib import admin
 
+from .pagination import EstimatedCountPaginator
 
 from . import models
 
 
-admin.site.register(models.CustomUser)
+@admin.register(models.CustomUser)
+class CustomUserAdmin(admin.ModelAdmin):
+    list_display = ['id', 'username', 'phone_number', 'email', 'is_staff', 'date_joined', ]
+    list_display_links = ['username', ]
+    # exact lookups stay on the unique indexes, the autocomplete widgets of other admins search here
+    search_fields = ['=username', '=phone_number', '=email', ]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
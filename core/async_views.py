@@ -0,0 +1,69 @@
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+
+from rest_framework.views import APIView
+
+from concurrent.futures import ThreadPoolExecutor
+import inspect
+import threading
+
+
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+
+def get_io_executor():
+    """
+    Returns the pool blocking calls to other services wait in, sized by `ASYNC_IO_THREADS`.
+    The default executor of the event loop only has a few threads per core, too few for calls that mostly wait.
+    """
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_IO_THREADS, thread_name_prefix='async-io')
+    return _io_executor
+
+
+async def run_io(func, *args, **kwargs):
+    """
+    Awaits a blocking call that needs no database, e.g. an http request, in the io pool.
+    """
+    return await sync_to_async(func, thread_sensitive=False, executor=get_io_executor())(*args, **kwargs)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, for endpoints that mostly wait on other services.
+
+    Under ASGI a request waiting on a gateway or sms provider doesn't hold a worker,
+    under WSGI django runs the view with `async_to_sync` so the same views keep working.
+    Authentication, permissions and throttling may query the database, so they run through
+    `sync_to_async` like the async ORM methods do.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # options and http_method_not_allowed stay synchronous
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+
+from rest_framework_simplejwt.models import TokenUser
+
+
+class ClaimsUser(TokenUser):
+    """
+    Lightweight user built from the claims of an access token by `JWTStatelessUserAuthentication`,
+    so authenticated requests don't load the user row.
+    Views that need the full user use `instance`, which loads it once.
+    """
+
+    def __str__(self):
+        return str(self.id)
+
+    @cached_property
+    def cart_id(self):
+        return self.token.get('cart_id')
+
+    @cached_property
+    def instance(self):
+        # None once the user is deleted, like an anonymous request
+        return get_user_model().objects.filter(pk=self.pk).first()
@@ -0,0 +1,316 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import islice
+import random
+import statistics
+import threading
+import time
+from typing import Callable
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from payments.models import Gateway
+from products.models import Product
+
+from . import sms
+from .otp import get_otp_store
+from .tokens import RefreshToken
+
+
+PREFIX = 'bench_'
+PASSWORD = 'bench-password'
+
+
+#################################################
+#                                               #
+#                                               #
+#                    Seeding                    #
+#                                               #
+#                                               #
+#################################################
+
+
+def bench_phone_number(index):
+    return f'+98915{index:07d}'
+
+
+def seed(users, products, orders_per_user, cart_items, rng):
+    """
+    Creates the benchmark users, products with features, carts and orders that don't exist yet,
+    so consecutive runs reuse the same data. Everything is named with `PREFIX`.
+    """
+    existing = Product.objects.filter(title__startswith=PREFIX).count()
+    Product.objects.bulk_create([
+        Product(
+            title=f'{PREFIX}product {index}',
+            price=rng.randint(5, 500),
+            offprice=rng.choice([0, 0, 0, rng.randint(1, 5)]),
+            exclusive=rng.random() < 0.1,
+            features={
+                'pages': rng.randint(10, 900),
+                'format': rng.choice(['pdf', 'epub', 'video']),
+                'tags': rng.sample(['python', 'django', 'trading', 'design', 'music', 'cooking'], 2),
+            },
+        ) for index in range(existing, products)
+    ], batch_size=1000)
+
+    User = get_user_model()
+    existing = User.objects.filter(username__startswith=PREFIX).count()
+    # one hash for everyone, hashing each password would dominate the seeding time
+    password = make_password(PASSWORD)
+    new_users = User.objects.bulk_create([
+        User(username=f'{PREFIX}{index}', phone_number=bench_phone_number(index), password=password)
+        for index in range(existing, users)
+    ], batch_size=1000)
+
+    titles = dict(Product.objects.filter(title__startswith=PREFIX).values_list('id', 'title'))
+    product_ids = list(titles)
+    with transaction.atomic():
+        for user in new_users:
+            # a user never has a product both in the cart and in an order
+            picked = iter(rng.sample(product_ids, cart_items + orders_per_user * 3))
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.bulk_create([CartItem(cart=cart, product_id=next(picked)) for _ in range(cart_items)])
+            orders = Order.objects.bulk_create([
+                Order(user=user, total_price=0, status=Order.ORDER_STATUS_PAID, is_paid=True)
+                for _ in range(orders_per_user)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=product_id, price=100, title=titles[product_id])
+                for order in orders for product_id in islice(picked, rng.randint(1, 3))
+            ])
+
+    Gateway.objects.get_or_create(
+        name=f'{PREFIX}gateway', defaults={'is_active': True, 'description': 'benchmark gateway'}
+    )
+
+
+def cleanup():
+    # order items protect orders and products from cascading deletes
+    OrderItem.objects.filter(order__user__username__startswith=PREFIX).delete()
+    get_user_model().objects.filter(username__startswith=PREFIX).delete()
+    OrderItem.objects.filter(product__title__startswith=PREFIX).delete()
+    Product.objects.filter(title__startswith=PREFIX).delete()
+    Gateway.objects.filter(name__startswith=PREFIX).delete()
+
+
+#################################################
+#                                               #
+#                                               #
+#                Local Services                 #
+#                                               #
+#                                               #
+#################################################
+
+
+def fake_oxapay(latency):
+    def post_json(url, data):
+        time.sleep(latency)
+        if url.endswith('/request'):
+            return {'result': 100, 'message': 'success', 'trackId': uuid4().hex, 'payLink': 'https://oxapay.test/pay'}
+        return {'result': 100, 'status': 'Paid'}
+    return post_json
+
+
+def local_services(gateway_latency, sms_latency):
+    """
+    Replaces Oxapay and Kavenegar with local fakes taking the given seconds,
+    and lifts the rate limits so every request reaches the view.
+    """
+    stack = ExitStack()
+    stack.enter_context(patch('payments.utils._post_json', fake_oxapay(gateway_latency)))
+    stack.enter_context(patch('core.sms.get_provider', return_value=sms.FakeProvider()))
+    stack.enter_context(override_settings(
+        SMS_FAKE_LATENCY=sms_latency,
+        RATE_LIMITS={
+            scope: {**config, 'rate': '1000000/s'} for scope, config in settings.RATE_LIMITS.items()
+        },
+        ALLOWED_HOSTS=['*'],
+    ))
+    return stack
+
+
+#################################################
+#                                               #
+#                                               #
+#                   Scenarios                   #
+#                                               #
+#                                               #
+#################################################
+
+
+@dataclass
+class Context:
+    index: int
+    user: object
+    product_ids: list
+    gateway_id: int
+    rng: random.Random
+
+
+@dataclass
+class Scenario:
+    method: str
+    path: Callable
+    data: Callable = None
+    # runs before the request and isn't timed, e.g. to fill the cart an order is made from
+    prepare: Callable = None
+    authenticated: bool = True
+    statuses: tuple = (200, 201, 204)
+
+
+def pick_product(ctx):
+    # products the user bought can't be added to the cart again
+    purchased = set(OrderItem.objects.filter(order__user=ctx.user).values_list('product_id', flat=True))
+    ctx.product_id = ctx.rng.choice([product_id for product_id in ctx.product_ids if product_id not in purchased])
+
+
+def clear_cart(ctx):
+    CartItem.objects.filter(cart__user=ctx.user).delete()
+    pick_product(ctx)
+
+
+def fill_cart(ctx):
+    pick_product(ctx)
+    cart, _ = Cart.objects.get_or_create(user=ctx.user)
+    CartItem.objects.get_or_create(cart=cart, product_id=ctx.product_id)
+    ctx.cart_id = cart.id
+
+
+def free_otp_slot(ctx):
+    # a phone number that registered in an earlier run still waits for its resend cooldown
+    ctx.phone_number = f'+98916{ctx.index:07d}'
+    get_otp_store().delete(ctx.phone_number)
+
+
+def create_unpaid_order(ctx):
+    order = Order.objects.create(user=ctx.user, total_price=100)
+    OrderItem.objects.create(order=order, product_id=ctx.rng.choice(ctx.product_ids), price=100)
+    ctx.order_id = order.id
+
+
+SCENARIOS = {
+    'products_list': Scenario('get', lambda ctx: reverse('products_list'), authenticated=False),
+    'product_detail': Scenario(
+        'get', lambda ctx: reverse('product_detail', args=[ctx.rng.choice(ctx.product_ids)]), authenticated=False
+    ),
+    'cart_get': Scenario('get', lambda ctx: reverse('cart')),
+    'cart_add': Scenario(
+        'post', lambda ctx: reverse('cart'),
+        data=lambda ctx: {'product': ctx.product_id},
+        prepare=clear_cart,
+    ),
+    'guest_cart_add': Scenario(
+        'post', lambda ctx: reverse('guest-cart'),
+        data=lambda ctx: {'product': ctx.rng.choice(ctx.product_ids)},
+        authenticated=False,
+    ),
+    'orders_list': Scenario('get', lambda ctx: reverse('orders-list')),
+    'order_create': Scenario(
+        'post', lambda ctx: reverse('orders-list'),
+        data=lambda ctx: {'cart_id': str(ctx.cart_id)},
+        prepare=fill_cart,
+    ),
+    'payment_process': Scenario(
+        'post', lambda ctx: reverse('payment_process'),
+        data=lambda ctx: {'order_id': ctx.order_id, 'gateway_id': ctx.gateway_id},
+        prepare=create_unpaid_order,
+    ),
+    'login': Scenario(
+        'post', lambda ctx: reverse('login'),
+        data=lambda ctx: {'phone_number': str(ctx.user.phone_number), 'password': PASSWORD},
+        authenticated=False,
+    ),
+    'register': Scenario(
+        'post', lambda ctx: reverse('register'),
+        data=lambda ctx: {'phone_number': ctx.phone_number, 'password': PASSWORD},
+        prepare=free_otp_slot,
+        authenticated=False,
+    ),
+}
+
+
+#################################################
+#                                               #
+#                                               #
+#                    Runner                     #
+#                                               #
+#                                               #
+#################################################
+
+
+@dataclass
+class Result:
+    name: str
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0
+
+    def percentile(self, percent):
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0
+        return statistics.quantiles(self.latencies, n=100)[percent - 1]
+
+    def summary(self):
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'p50_ms': round(self.percentile(50), 2),
+            'p95_ms': round(self.percentile(95), 2),
+            'p99_ms': round(self.percentile(99), 2),
+            'throughput': round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0,
+        }
+
+
+def run(name, users, requests, concurrency, seed_value):
+    """
+    Sends `requests` requests of a scenario through the real url routes from `concurrency` threads,
+    each request as one of the benchmark users. A user has one request in flight at a time, otherwise
+    the preparation of one request, e.g. clearing the cart, would break another one of the same user.
+    Waiting for the user isn't timed, but fewer users than `concurrency` lowers the throughput.
+    """
+    scenario = SCENARIOS[name]
+    titles = dict(Product.objects.filter(title__startswith=PREFIX).values_list('id', 'title'))
+    product_ids = list(titles)
+    gateway_id = Gateway.objects.get(name=f'{PREFIX}gateway').id
+    tokens = {user.pk: str(RefreshToken.for_user(user).access_token) for user in users}
+    user_locks = {user.pk: threading.Lock() for user in users}
+    result = Result(name)
+    lock = threading.Lock()
+
+    def send(index):
+        user = users[index % len(users)]
+        ctx = Context(index, user, product_ids, gateway_id, random.Random(seed_value + index))
+        client = APIClient()
+        if scenario.authenticated:
+            client.credentials(HTTP_AUTHORIZATION=f'JWT {tokens[user.pk]}')
+        with user_locks[user.pk]:
+            if scenario.prepare:
+                scenario.prepare(ctx)
+            data = scenario.data(ctx) if scenario.data else None
+
+            started = time.perf_counter()
+            response = getattr(client, scenario.method)(scenario.path(ctx), data, format='json')
+            latency = (time.perf_counter() - started) * 1000
+        with lock:
+            result.latencies.append(latency)
+            if response.status_code not in scenario.statuses:
+                result.errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(requests)))
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,107 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+#################################################
+#                                               #
+#                                               #
+#                Tuned Hashers                  #
+#                                               #
+#                                               #
+#################################################
+
+
+# Same algorithm names as the django hashers so existing hashes keep verifying and
+# hashes made with another cost are upgraded on the next successful login.
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = settings.PASSWORD_HASHING['PBKDF2_ITERATIONS']
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = settings.PASSWORD_HASHING['SCRYPT_WORK_FACTOR']
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    time_cost = settings.PASSWORD_HASHING['ARGON2_TIME_COST']
+    memory_cost = settings.PASSWORD_HASHING['ARGON2_MEMORY_COST']
+    parallelism = settings.PASSWORD_HASHING['ARGON2_PARALLELISM']
+
+
+#################################################
+#                                               #
+#                                               #
+#                 Hashing Pool                  #
+#                                               #
+#                                               #
+#################################################
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the bounded pool password hashing runs in, None when `POOL_SIZE` is 0.
+    Hashing releases the GIL, so the pool caps how many cores hashing may take at once.
+    """
+    global _executor
+    pool_size = settings.PASSWORD_HASHING['POOL_SIZE']
+    if not pool_size:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='password-hashing')
+    return _executor
+
+
+def _run(func, *args):
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+    return executor.submit(func, *args).result()
+
+
+async def _arun(func, *args):
+    executor = get_executor()
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def _upgrade(user, raw_password, is_correct, must_update):
+    # rehashing with the preferred hasher runs in the pool too, the save in the caller thread uses its db connection
+    if is_correct and must_update:
+        user.password = _run(hashers.make_password, raw_password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def check_user_password(user, raw_password):
+    """
+    Same as `user.check_password` but hashing runs in the password hashing pool.
+    """
+    is_correct, must_update = _run(hashers.verify_password, raw_password, user.password)
+    return _upgrade(user, raw_password, is_correct, must_update)
+
+
+async def acheck_user_password(user, raw_password):
+    """
+    Async version of `check_user_password` for async views, the event loop is never blocked by hashing.
+    Without a pool the loop's default executor is used.
+    """
+    is_correct, must_update = await _arun(hashers.verify_password, raw_password, user.password)
+    if is_correct and must_update:
+        user.password = await _arun(hashers.make_password, raw_password)
+        await user.asave(update_fields=['password'])
+    return is_correct
+
+
+def hash_password(raw_password):
+    """
+    Same as `make_password` but hashing runs in the password hashing pool.
+    """
+    return _run(hashers.make_password, raw_password)
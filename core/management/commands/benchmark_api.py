@@ -0,0 +1,112 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds benchmark users, products, carts and orders, then sends concurrent requests through the '
+        'api urls with Oxapay and Kavenegar replaced by local fakes, and reports p50/p95/p99 latency '
+        'and throughput per scenario.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help=(
+                'Benchmark users, requests are spread over them. '
+                'A user has one request in flight at a time, keep it above --concurrency.'
+            )
+        )
+        parser.add_argument(
+            '--products', type=int, default=500,
+            help='Benchmark products.'
+        )
+        parser.add_argument(
+            '--orders-per-user', type=int, default=5,
+            help='Paid orders seeded for each user.'
+        )
+        parser.add_argument(
+            '--cart-items', type=int, default=3,
+            help='Items seeded in each cart.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests sent for each scenario.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Requests in flight at once.'
+        )
+        parser.add_argument(
+            '--scenarios', default=','.join(benchmark.SCENARIOS),
+            help='Comma separated scenarios to run, all by default.'
+        )
+        parser.add_argument(
+            '--gateway-latency', type=float, default=0.3,
+            help='Seconds the fake Oxapay takes to answer.'
+        )
+        parser.add_argument(
+            '--sms-latency', type=float, default=0.2,
+            help='Seconds the fake sms provider takes to send.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the generated data and of the requests.'
+        )
+        parser.add_argument(
+            '--output',
+            help='File the results are written to as json, to compare releases.'
+        )
+        parser.add_argument(
+            '--cleanup', action='store_true',
+            help='Delete the benchmark data afterwards.'
+        )
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(names) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(f'unknown scenarios: {", ".join(sorted(unknown))}')
+        if options['products'] < options['cart_items'] + options['orders_per_user'] * 3 + 1:
+            raise CommandError('not enough products for the cart items and orders of a user.')
+
+        benchmark.seed(
+            options['users'], options['products'], options['orders_per_user'], options['cart_items'],
+            random.Random(options['seed']),
+        )
+        users = list(
+            get_user_model().objects.filter(username__startswith=benchmark.PREFIX).order_by('id')[:options['users']]
+        )
+
+        results = {}
+        self.stdout.write(
+            f'{"scenario":<18}{"requests":>10}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}'
+        )
+        try:
+            with benchmark.local_services(options['gateway_latency'], options['sms_latency']):
+                for name in names:
+                    summary = benchmark.run(
+                        name, users, options['requests'], options['concurrency'], options['seed']
+                    ).summary()
+                    results[name] = summary
+                    self.stdout.write(
+                        f'{name:<18}{summary["requests"]:>10}{summary["errors"]:>8}{summary["p50_ms"]:>10.2f}'
+                        f'{summary["p95_ms"]:>10.2f}{summary["p99_ms"]:>10.2f}{summary["throughput"]:>10.1f}'
+                    )
+        finally:
+            if options['cleanup']:
+                benchmark.cleanup()
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'options': {
+                    key: options[key] for key in (
+                        'users', 'products', 'orders_per_user', 'cart_items', 'requests', 'concurrency',
+                        'gateway_latency', 'sms_latency', 'seed',
+                    )
+                }, 'results': results}, file, indent=2)
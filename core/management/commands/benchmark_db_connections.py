@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the latency of requests going through the WSGI handler with a new database '
+        'connection per request and with persistent connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests sent for each mode.'
+        )
+        parser.add_argument(
+            '--path', default=None,
+            help='Path requested, the product list by default.'
+        )
+        parser.add_argument(
+            '--database', default='default',
+            help='Database alias whose connection settings are changed.'
+        )
+
+    def measure(self, connection, path, requests, conn_max_age, health_checks):
+        # the handler closes or keeps the connection on request_finished from these settings
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+
+        handler = WSGIHandler()
+        factory = RequestFactory(SERVER_NAME='localhost')
+        timings = []
+        for _ in range(requests):
+            environ = factory.get(path).environ
+            started = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            response.close()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        path = options['path'] or reverse('products_list')
+        original = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        modes = [
+            ('per request', 0, False),
+            ('persistent', 60, True),
+        ]
+        if connection.settings_dict['OPTIONS'].get('pool'):
+            # the driver pool can't be turned off at runtime, compare with a run in another DATABASE_POOL_MODE
+            modes = [('pool', 0, original['CONN_HEALTH_CHECKS'])]
+
+        self.stdout.write(f'{"mode":<14}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}')
+        try:
+            for name, conn_max_age, health_checks in modes:
+                timings = self.measure(connection, path, options['requests'], conn_max_age, health_checks)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                self.stdout.write(
+                    f'{name:<14}{statistics.mean(timings):>10.2f}{statistics.median(timings):>10.2f}{p95:>10.2f}'
+                )
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Measures password verifications (logins) per second of each password hasher profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', default=list(settings.PASSWORD_HASHER_PROFILES),
+            help='Hasher profiles to measure.'
+        )
+        parser.add_argument(
+            '--verifications', type=int, default=20,
+            help='Verifications per thread for each measurement.'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=os.cpu_count(),
+            help='Threads for the parallel measurement.'
+        )
+
+    def measure(self, hasher, encoded, verifications, threads):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda _: hasher.verify('benchmark-password', encoded), range(verifications * threads)))
+        return verifications * threads / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        verifications = options['verifications']
+        threads = options['threads']
+        self.stdout.write(f'{"profile":<10}{"logins/s per core":>20}{f"logins/s ({threads} threads)":>26}')
+
+        for profile in options['profiles']:
+            hasher = import_string(settings.PASSWORD_HASHER_PROFILES[profile])()
+            try:
+                encoded = hasher.encode('benchmark-password', hasher.salt())
+            except ValueError as e:
+                # hasher library is not installed
+                self.stdout.write(f'{profile:<10}{"skipped: " + str(e):>46}')
+                continue
+
+            single = self.measure(hasher, encoded, verifications, 1)
+            parallel = self.measure(hasher, encoded, verifications, threads)
+            self.stdout.write(f'{profile:<10}{single:>20.1f}{parallel:>26.1f}')
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    help = 'Writes the OpenAPI schema and its gzip version, served by /openapi.json instead of generating it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=str(settings.OPENAPI_SCHEMA_FILE),
+            help='Path of the schema file, the gzip version is written next to it.'
+        )
+
+    def handle(self, *args, **options):
+        written = schema.write(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f'wrote {options["output"]} ({len(written.content)} bytes, {len(written.compressed)} gzipped).'
+        ))
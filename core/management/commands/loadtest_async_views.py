@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from core.otp import get_otp_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares how many concurrent register requests the WSGI and ASGI deployments serve '
+        'while the sms provider is slow. Needs SMS_PROVIDER=fake.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests sent to each deployment.'
+        )
+        parser.add_argument(
+            '--wsgi-threads', type=int, default=4,
+            help='Worker threads of the WSGI deployment.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=50,
+            help='Requests in flight at once against the ASGI deployment.'
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0.2,
+            help='Seconds the fake sms provider takes to send.'
+        )
+
+    def payload(self, prefix, number):
+        return {'phone_number': f'+98912{prefix}{number:06d}', 'password': 'loadtest-password'}
+
+    def run_wsgi(self, url, requests, threads):
+        client = Client()
+
+        def send(number):
+            return client.post(url, self.payload(1, number), content_type='application/json').status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            statuses = list(executor.map(send, range(requests)))
+        return statuses, time.perf_counter() - started
+
+    async def run_asgi(self, url, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(number):
+            async with semaphore:
+                response = await client.post(url, self.payload(2, number), content_type='application/json')
+                return response.status_code
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(send(number) for number in range(requests)))
+        return statuses, time.perf_counter() - started
+
+    def report(self, name, statuses, elapsed):
+        ok = sum(1 for code in statuses if code == 200)
+        self.stdout.write(f'{name:<6}{ok:>10}/{len(statuses):<6}{elapsed:>12.2f}{len(statuses) / elapsed:>14.1f}')
+
+    def handle(self, *args, **options):
+        if settings.SMS_PROVIDER != 'fake':
+            raise CommandError('set SMS_PROVIDER=fake, the load test must not send real sms.')
+
+        url = reverse('register')
+        requests = options['requests']
+        # the sms is sent in the request so its latency is what the deployments wait on
+        with override_settings(SMS_ASYNC=False, SMS_FAKE_LATENCY=options['latency'], ALLOWED_HOSTS=['*']):
+            try:
+                self.stdout.write(f'{"":<6}{"succeeded":>17}{"seconds":>12}{"requests/s":>14}')
+                self.report('wsgi', *self.run_wsgi(url, requests, options['wsgi_threads']))
+                self.report('asgi', *asyncio.run(self.run_asgi(url, requests, options['concurrency'])))
+            finally:
+                otp_store = get_otp_store()
+                for prefix in (1, 2):
+                    for number in range(requests):
+                        otp_store.delete(self.payload(prefix, number)['phone_number'])
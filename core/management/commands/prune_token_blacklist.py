@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired outstanding and blacklisted refresh tokens in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows deleted per query.'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+
+        # expired tokens can't be used anyway, deleting an outstanding token cascades to its blacklist row
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'deleted {deleted} expired refresh tokens.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.otp import DatabaseOtpStore
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired otps from the database. Run it periodically, e.g. from cron.'
+
+    def handle(self, *args, **options):
+        # the cache store expires its keys on its own, only the database needs purging
+        deleted = DatabaseOtpStore().purge()
+        self.stdout.write(self.style.SUCCESS(f'deleted {deleted} expired otps.'))
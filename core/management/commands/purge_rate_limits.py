@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.ratelimit import DatabaseStorage
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired rate limit state from the database. Run it periodically, e.g. from cron.'
+
+    def handle(self, *args, **options):
+        # the cache and memory storages expire their keys on their own, only the database needs purging
+        deleted = DatabaseStorage().purge()
+        self.stdout.write(self.style.SUCCESS(f'deleted {deleted} expired rate limits.'))
@@ -0,0 +1,100 @@
+from datetime import datetime, time as datetime_time, timezone
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.models import CartItem
+from core import scale
+from orders.models import Order, OrderItem
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates users, products, carts and orders at production scale with skewed distributions, '
+        'written in chunks with COPY on PostgreSQL. The same seed and --end give the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=100_000,
+            help='Users generated.'
+        )
+        parser.add_argument(
+            '--products', type=int, default=200_000,
+            help='Products generated.'
+        )
+        parser.add_argument(
+            '--orders', type=int, default=2_000_000,
+            help='Orders generated, spread over the users with a zipf distribution.'
+        )
+        parser.add_argument(
+            '--items-per-order', type=float, default=3,
+            help='Mean number of items of an order.'
+        )
+        parser.add_argument(
+            '--cart-share', type=float, default=0.3,
+            help='Share of the users having a cart.'
+        )
+        parser.add_argument(
+            '--items-per-cart', type=float, default=4,
+            help='Mean number of items of a cart.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=730,
+            help='Days of history the timestamps are spread over.'
+        )
+        parser.add_argument(
+            '--end', type=datetime.fromisoformat, default=None,
+            help='Date the history ends at, today by default. Pass it to reproduce a dataset.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the random generator.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=50_000,
+            help='Rows written per statement and transaction.'
+        )
+        parser.add_argument(
+            '--flush', action='store_true',
+            help='Delete previously generated data first.'
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['flush']:
+            deleted = scale.flush()
+            self.stdout.write(f'deleted {deleted} generated rows.')
+        if User.objects.filter(username__startswith=scale.PREFIX).exists():
+            raise CommandError('generated data already exists, pass --flush to replace it.')
+        if options['users'] < 1 or options['products'] < 1:
+            raise CommandError('at least one user and one product are needed.')
+
+        end = options['end'] or datetime.combine(datetime.now(timezone.utc).date(), datetime_time())
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        generator = scale.ScaleGenerator(
+            random.Random(options['seed']), end, options['days'], options['chunk_size'],
+            log=lambda message: self.stdout.write(message, ending='\r'),
+        )
+        started = time.perf_counter()
+
+        product_ids, prices = generator.products(options['products'])
+        user_ids = generator.users(options['users'])
+        orders, order_items = generator.orders(
+            options['orders'], user_ids, product_ids, prices, options['items_per_order']
+        )
+        carts, cart_items = generator.carts(
+            user_ids, product_ids, options['cart_share'], options['items_per_cart']
+        )
+        scale.reset_sequences([Product, User, Order, OrderItem, CartItem])
+
+        rows = len(product_ids) + len(user_ids) + orders + order_items + carts + cart_items
+        self.stdout.write(self.style.SUCCESS(
+            f'generated {len(product_ids)} products, {len(user_ids)} users, {orders} orders with '
+            f'{order_items} items and {carts} carts with {cart_items} items: {rows} rows in '
+            f'{time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,203 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+
+import contextvars
+import random
+import threading
+import time
+
+
+# measurements of the current request, None when it isn't sampled
+_request_state = contextvars.ContextVar('metrics_request_state', default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Histograms                   #
+#                                               #
+#                                               #
+#################################################
+
+
+class Histogram:
+    """
+    Prometheus histogram labelled by view and method, kept in the memory of the process.
+    Each worker process exposes its own series, they are summed by the scraper.
+    """
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts = self.series.setdefault(labels, [0] * len(self.buckets) + [0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {labels: list(counts) for labels, counts in self.series.items()}
+        for (view, method), counts in sorted(series.items()):
+            labels = f'view="{view}",method="{method}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {counts[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {counts[-1]}')
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'Database queries per request.', QUERY_BUCKETS)
+DB_TIME = Histogram('http_request_db_duration_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS)
+SERIALIZER_TIME = Histogram(
+    'http_request_serializer_duration_seconds', 'Time spent serializing responses per request.', LATENCY_BUCKETS
+)
+HISTOGRAMS = [REQUEST_LATENCY, DB_QUERIES, DB_TIME, SERIALIZER_TIME]
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+#################################################
+#                                               #
+#                                               #
+#                 Measurements                  #
+#                                               #
+#                                               #
+#################################################
+
+
+def query_wrapper(execute, sql, params, many, context):
+    state = _request_state.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state['db_time'] += time.perf_counter() - started
+        state['queries'] += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    `connection_created` receiver adding `query_wrapper` to every database connection.
+    Connections are per thread, so this also counts queries async views run through `sync_to_async`.
+    """
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding the time spent in `to_representation` to the request's serializer time,
+    including the queries made while serializing. Nested timed serializers are counted once.
+    """
+
+    def to_representation(self, instance):
+        state = _request_state.get()
+        if state is None or state['serializing']:
+            return super().to_representation(instance)
+        state['serializing'] = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            state['serializing'] = False
+            state['serializer_time'] += time.perf_counter() - started
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Middleware                   #
+#                                               #
+#                                               #
+#################################################
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, database queries, database time and serializer time of a
+    `METRICS_SAMPLE_RATE` share of the requests into the histograms of their view,
+    and reports them in a `Server-Timing` header when `METRICS_SERVER_TIMING` is enabled.
+    Should be the first middleware so the latency covers the others.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        state, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        self.finish(request, response, state, started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        state, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        self.finish(request, response, state, started)
+        return response
+
+    def sampled(self):
+        rate = settings.METRICS_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+    def start(self):
+        state = {'queries': 0, 'db_time': 0.0, 'serializer_time': 0.0, 'serializing': False}
+        return state, _request_state.set(state), time.perf_counter()
+
+    def finish(self, request, response, state, started):
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        labels = (match.view_name if match else 'unmatched', request.method)
+
+        REQUEST_LATENCY.observe(labels, total)
+        DB_QUERIES.observe(labels, state['queries'])
+        DB_TIME.observe(labels, state['db_time'])
+        SERIALIZER_TIME.observe(labels, state['serializer_time'])
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={state["db_time"] * 1000:.1f};desc="{state["queries"]} queries"',
+                f'serializer;dur={state["serializer_time"] * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['receiver', 'expiration_time'], name='core_otp_receive_e28861_idx'),
+        ),
+    ]
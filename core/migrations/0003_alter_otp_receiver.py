@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:43
+
+import phonenumber_field.modelfields
+from django.db import migrations
+from django.db.models import Count, F
+
+
+def remove_duplicate_otps(apps, schema_editor):
+    # keep only the latest otp of each phone number before making receiver unique
+    Otp = apps.get_model('core', 'Otp')
+    duplicates = Otp.objects.values('receiver').annotate(count=Count('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        ids = list(
+            Otp.objects.filter(receiver=duplicate['receiver'])
+            .order_by(F('expiration_time').desc(nulls_last=True))
+            .values_list('id', flat=True)
+        )
+        Otp.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_otp_core_otp_receive_e28861_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_otps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='otp',
+            name='receiver',
+            field=phonenumber_field.modelfields.PhoneNumberField(max_length=128, region=None, unique=True),
+        ),
+    ]
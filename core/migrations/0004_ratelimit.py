@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_otp_receiver'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimit',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Key')),
+                ('value', models.JSONField(null=True, verbose_name='Value')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+            ],
+        ),
+    ]
@@ -11,13 +11,27 @@ class CustomUser(AbstractUser):
 
 class Otp(models.Model):
     id = models.UUIDField('ID', default=uuid4, primary_key=True)
-    receiver = PhoneNumberField()
+    receiver = PhoneNumberField(unique=True)
     token = models.CharField('Token', max_length=6)
     expiration_time = models.DateTimeField('Expiration Time', null=True)
     password = models.CharField('Password' ,max_length=60, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['receiver', 'expiration_time']),
+        ]
+
 
 class ForgetPasswordToken(models.Model):
     id = models.UUIDField('ID', default=uuid4, primary_key=True)
     phone_number = PhoneNumberField()
     expiration_time = models.DateTimeField('Expiration Time', null=True)
+
+
+class RateLimit(models.Model):
+    """
+    Limiter state of a rate limited key, used by `core.ratelimit.DatabaseStorage`.
+    """
+    key = models.CharField('Key', max_length=255, primary_key=True)
+    value = models.JSONField('Value', null=True)
+    expires_at = models.DateTimeField('Expires At', db_index=True)
@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+from datetime import datetime
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from . import models
+
+
+@dataclass
+class OtpRecord:
+    receiver: str
+    token: str
+    expiration_time: datetime
+    password: str = None
+
+    @property
+    def is_expired(self):
+        return self.expiration_time <= timezone.now()
+
+
+def remaining_seconds(expiration_time):
+    if expiration_time is None:
+        return 0
+    return max(0, math.ceil((expiration_time - timezone.now()).total_seconds()))
+
+
+class DatabaseOtpStore:
+    """
+    Keeps otps in the `Otp` table, one row per phone number.
+    Expired rows are replaced by the next claim or removed by the `purge_expired_otps` command.
+    """
+
+    def claim(self, receiver, token, lifetime, password=None):
+        """
+        Stores a new otp unless the phone number has a valid one.
+        Returns 0 if the otp was stored, otherwise the seconds left on the current otp.
+        The unique receiver makes concurrent claims for the same number fail except one.
+        """
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                models.Otp.objects.filter(
+                    Q(expiration_time__lte=now) | Q(expiration_time__isnull=True),
+                    receiver=receiver
+                ).delete()
+                models.Otp.objects.create(
+                    receiver=receiver,
+                    token=token,
+                    expiration_time=now + lifetime,
+                    password=password
+                )
+        except IntegrityError:
+            return max(1, self.cooldown(receiver))
+        return 0
+
+    def cooldown(self, receiver):
+        # seconds left on the valid otp of the phone number, 0 if there is none
+        expiration_time = models.Otp.objects.filter(
+            receiver=receiver, expiration_time__gt=timezone.now()
+        ).values_list('expiration_time', flat=True).first()
+        return remaining_seconds(expiration_time)
+
+    def get(self, receiver, token):
+        # returns the otp even if it has expired so callers can tell expired and invalid tokens apart
+        otp = models.Otp.objects.filter(receiver=receiver, token=token).first()
+        return self._record(otp) if otp else None
+
+    def delete(self, receiver):
+        models.Otp.objects.filter(receiver=receiver).delete()
+
+    def purge(self):
+        deleted, _ = models.Otp.objects.filter(expiration_time__lte=timezone.now()).delete()
+        return deleted
+
+    def _record(self, otp):
+        return OtpRecord(str(otp.receiver), otp.token, otp.expiration_time, otp.password)
+
+
+class CacheOtpStore:
+    """
+    Keeps the otp of each phone number under a single cache key that expires on its own,
+    so every operation is one key lookup and nothing has to be purged.
+    Entries outlive their expiration by `OTP_CACHE_GRACE` to report expired tokens as such.
+    A second key living exactly as long as the otp is the send slot of the phone number.
+    """
+    prefix = 'otp:'
+    slot_prefix = 'otp:slot:'
+
+    def claim(self, receiver, token, lifetime, password=None):
+        """
+        Stores a new otp unless the phone number has a valid one.
+        Returns 0 if the otp was stored, otherwise the seconds left on the current otp.
+        `cache.add` only succeeds for one of several concurrent claims.
+        """
+        record = OtpRecord(str(receiver), token, timezone.now() + lifetime, password)
+        claimed = cache.add(
+            self.slot_prefix + record.receiver,
+            record.expiration_time,
+            timeout=math.ceil(lifetime.total_seconds())
+        )
+        if not claimed:
+            return max(1, self.cooldown(receiver))
+
+        cache.set(
+            self.prefix + record.receiver,
+            record,
+            timeout=math.ceil((lifetime + settings.OTP_CACHE_GRACE).total_seconds())
+        )
+        return 0
+
+    def cooldown(self, receiver):
+        return remaining_seconds(cache.get(self.slot_prefix + str(receiver)))
+
+    def get(self, receiver, token):
+        record = cache.get(self.prefix + str(receiver))
+        if record is None or not constant_time_compare(record.token, token):
+            return None
+        return record
+
+    def delete(self, receiver):
+        cache.delete_many([self.prefix + str(receiver), self.slot_prefix + str(receiver)])
+
+    def purge(self):
+        return 0
+
+
+STORES = {
+    'database': DatabaseOtpStore,
+    'cache': CacheOtpStore,
+}
+
+
+def get_otp_store():
+    return STORES[settings.OTP_STORE]()
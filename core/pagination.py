@@ -0,0 +1,79 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
+
+
+COUNT_CACHE_PREFIX = 'pagination_count:'
+
+
+def estimated_count(queryset):
+    """
+    Number of rows of the table of an unfiltered queryset from the PostgreSQL planner statistics,
+    kept current by autovacuum. None when the queryset is filtered, on other databases, or
+    when the table was never analyzed.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where or queryset.query.distinct:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def approximate_count(queryset):
+    """
+    Exact count of querysets with up to `PAGINATION_ESTIMATE_THRESHOLD` rows. Above it, the table estimate
+    for unfiltered querysets and an exact count cached for `PAGINATION_COUNT_CACHE_SECONDS` for filtered ones,
+    so a big filtered list is counted once per period instead of once per page.
+    """
+    threshold = settings.PAGINATION_ESTIMATE_THRESHOLD
+    estimate = estimated_count(queryset)
+    if estimate is not None and estimate > threshold:
+        return estimate
+
+    queryset = queryset.order_by()
+    # stops counting after threshold + 1 rows
+    bounded = queryset[:threshold + 1].count()
+    if bounded <= threshold:
+        return bounded
+
+    sql, params = queryset.query.sql_with_params()
+    key = COUNT_CACHE_PREFIX + hashlib.sha256(f'{queryset.db}:{sql}:{params}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout=settings.PAGINATION_COUNT_CACHE_SECONDS)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting with `approximate_count`, the last page numbers of big lists are then approximate.
+    Used by the admin changelists of big tables and by the DRF paginations below.
+    """
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return approximate_count(self.object_list)
+        return super().count
+
+
+class EstimatedCountPageNumberPagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
+
+
+class EstimatedCountLimitOffsetPagination(LimitOffsetPagination):
+    def get_count(self, queryset):
+        if hasattr(queryset, 'query'):
+            return approximate_count(queryset)
+        return super().get_count(queryset)
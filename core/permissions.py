@@ -0,0 +1,16 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsStaffUser(BasePermission):
+    """
+    Same as `IsAdminUser`, but under stateless authentication `is_staff` is read from the user row.
+    Access tokens don't carry it, and a claim would outlive the user losing staff status.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        # ClaimsUser, see core.authentication
+        user = getattr(user, 'instance', user)
+        return bool(user and user.is_active and user.is_staff)
@@ -0,0 +1,359 @@
+from contextlib import contextmanager
+from datetime import timedelta
+import functools
+import inspect
+import math
+import threading
+import time
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import models
+
+
+TOKEN_BUCKET = 'token_bucket'
+SLIDING_WINDOW = 'sliding_window'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parses a rate like `10/m`, `5/h` or `1/60m` into (limit, period in seconds).
+    """
+    limit, period = rate.split('/')
+    multiplier = int(period[:-1] or 1)
+    return int(limit), multiplier * PERIODS[period[-1]]
+
+
+@contextmanager
+def cache_lock(key, timeout):
+    """
+    Serializes updates of shared cache state across workers with a lock key taken by `cache.add`,
+    which expires after `timeout` seconds if its holder died.
+    """
+    while not cache.add(key, True, timeout=timeout):
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+#################################################
+#                                               #
+#                                               #
+#                   Storages                    #
+#                                               #
+#                                               #
+#################################################
+
+
+class CacheStorage:
+    """
+    Keeps limiter state in the default django cache, shared by every worker using the same cache.
+    Updates of a key are serialized by a `cache_lock` held at most `lock_timeout` seconds.
+    """
+    prefix = 'ratelimit:'
+    lock_timeout = 5
+
+    def lock(self, key):
+        return cache_lock(f'{self.prefix}lock:{key}', self.lock_timeout)
+
+    def get(self, key):
+        return cache.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        cache.set(self.prefix + key, value, timeout=math.ceil(ttl))
+
+    def delete(self, key):
+        cache.delete(self.prefix + key)
+
+
+class InMemoryStorage:
+    """
+    Keeps limiter state in a dict of the current process. Useful for tests and single process deployments.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.data_lock = threading.Lock()
+        self.key_locks = {}
+
+    @contextmanager
+    def lock(self, key):
+        with self.data_lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            yield
+
+    def get(self, key):
+        with self.data_lock:
+            value, expires_at = self.data.get(key, (None, 0))
+            if expires_at <= time.time():
+                self.data.pop(key, None)
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self.data_lock:
+            self.data[key] = (value, time.time() + ttl)
+
+    def delete(self, key):
+        with self.data_lock:
+            self.data.pop(key, None)
+
+
+class DatabaseStorage:
+    """
+    Keeps limiter state in the `RateLimit` table, shared by every worker using the database.
+    Updates of a key lock its row with `select_for_update` until their transaction ends.
+    Expired rows are reused by their key or removed by the `purge_rate_limits` command.
+    """
+
+    @contextmanager
+    def lock(self, key):
+        with transaction.atomic():
+            # the row must exist to be locked, an expired one reads as empty
+            models.RateLimit.objects.get_or_create(key=key, defaults={'expires_at': timezone.now()})
+            list(models.RateLimit.objects.select_for_update().filter(key=key).values_list('key', flat=True))
+            yield
+
+    def get(self, key):
+        return models.RateLimit.objects.filter(
+            key=key, expires_at__gt=timezone.now()
+        ).values_list('value', flat=True).first()
+
+    def set(self, key, value, ttl):
+        models.RateLimit.objects.update_or_create(
+            key=key, defaults={'value': value, 'expires_at': timezone.now() + timedelta(seconds=ttl)}
+        )
+
+    def delete(self, key):
+        models.RateLimit.objects.filter(key=key).delete()
+
+    def purge(self):
+        deleted, _ = models.RateLimit.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+STORAGES = {
+    'cache': CacheStorage,
+    'database': DatabaseStorage,
+    'memory': InMemoryStorage,
+}
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Algorithms                   #
+#                                               #
+#                                               #
+#################################################
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to `limit` hits, refilled continuously at `limit / period` tokens per second.
+    State per key is a (tokens, timestamp) pair.
+    """
+
+    def __init__(self, limit, period, storage):
+        self.capacity = limit
+        self.refill_rate = limit / period
+        self.storage = storage
+
+    def _tokens(self, key, now):
+        state = self.storage.get(key)
+        if state is None:
+            return self.capacity
+        tokens, timestamp = state
+        return min(self.capacity, tokens + (now - timestamp) * self.refill_rate)
+
+    def check(self, key):
+        # returns seconds to wait before the next hit is allowed, 0 if allowed now
+        tokens = self._tokens(key, time.time())
+        if tokens >= 1:
+            return 0
+        return (1 - tokens) / self.refill_rate
+
+    def _save(self, key, tokens, now):
+        self.storage.set(key, (tokens, now), ttl=(self.capacity - tokens) / self.refill_rate)
+
+    def hit(self, key, hit_id=None):
+        # takes a token, returns seconds to wait instead when there is none
+        with self.storage.lock(key):
+            now = time.time()
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                return (1 - tokens) / self.refill_rate
+            self._save(key, tokens - 1, now)
+            return 0
+
+    def release(self, key, hit_id=None):
+        # gives back the token of a hit that shouldn't count, tokens are alike so the id isn't needed
+        with self.storage.lock(key):
+            now = time.time()
+            self._save(key, min(self.capacity, self._tokens(key, now) + 1), now)
+
+    def reset(self, key):
+        self.storage.delete(key)
+
+
+class SlidingWindow:
+    """
+    Allows at most `limit` hits inside any `period` long window.
+    State per key is the list of (timestamp, hit id) pairs still inside the window, so it never exceeds `limit` entries.
+    """
+
+    def __init__(self, limit, period, storage):
+        self.limit = limit
+        self.period = period
+        self.storage = storage
+
+    def _hits(self, key, now):
+        return [hit for hit in self.storage.get(key) or [] if hit[0] > now - self.period]
+
+    def _wait(self, hits, now):
+        if len(hits) < self.limit:
+            return 0
+        return hits[-self.limit][0] + self.period - now
+
+    def check(self, key):
+        now = time.time()
+        return self._wait(self._hits(key, now), now)
+
+    def hit(self, key, hit_id=None):
+        # records a hit, returns seconds to wait instead when the window is full
+        with self.storage.lock(key):
+            now = time.time()
+            hits = self._hits(key, now)
+            wait = self._wait(hits, now)
+            if wait:
+                return wait
+            hits.append([now, hit_id])
+            self.storage.set(key, hits, ttl=self.period)
+            return 0
+
+    def release(self, key, hit_id):
+        # forgets the hit recorded with `hit_id`, for a hit that shouldn't count.
+        # other requests may have hit the key since, so the latest hit isn't necessarily this one
+        with self.storage.lock(key):
+            hits = self._hits(key, time.time())
+            remaining = [hit for hit in hits if hit[1] != hit_id]
+            if len(remaining) != len(hits):
+                self.storage.set(key, remaining, ttl=self.period)
+
+    def reset(self, key):
+        self.storage.delete(key)
+
+
+ALGORITHMS = {
+    TOKEN_BUCKET: TokenBucket,
+    SLIDING_WINDOW: SlidingWindow,
+}
+
+
+_storages = {}
+
+
+def get_storage(name=None):
+    name = name or getattr(settings, 'RATE_LIMIT_STORAGE', 'cache')
+    if name not in _storages:
+        _storages[name] = STORAGES[name]()
+    return _storages[name]
+
+
+def get_limiter(scope):
+    """
+    Builds the limiter of a scope from the `RATE_LIMITS` setting.
+    """
+    config = settings.RATE_LIMITS[scope]
+    limit, period = parse_rate(config['rate'])
+    algorithm = ALGORITHMS[config.get('algorithm', TOKEN_BUCKET)]
+    return algorithm(limit, period, get_storage(config.get('storage')))
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Decorator                    #
+#                                               #
+#                                               #
+#################################################
+
+
+def rate_limit(scope, key, only_successful=False, message='too many requests. please try again later.'):
+    """
+    Rate limits an APIView handler, sync or async.
+
+    `key` receives the request and returns the identity to limit on (user, phone number, ...).
+    A hit is taken before the handler runs, so concurrent requests can't all get past the limit.
+    With `only_successful` the request's own hit is given back when the handler responds with an
+    error status, e.g. for counting sent SMS instead of attempts.
+    Rejected requests get a 429 response in the same shape as the other API errors.
+    """
+    def decorator(handler):
+        def too_many_requests(wait):
+            return Response(
+                {
+                    'code': 429,
+                    'message': message,
+                    'remaining_time': math.ceil(wait)
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        if inspect.iscoroutinefunction(handler):
+            # limiter storage may be a network cache or the database, keep it off the event loop
+            @functools.wraps(handler)
+            async def async_wrapper(view, request, *args, **kwargs):
+                limiter = get_limiter(scope)
+                ident = f'{scope}:{key(request)}'
+                hit_id = uuid4().hex
+
+                wait = await sync_to_async(limiter.hit)(ident, hit_id)
+                if wait:
+                    return too_many_requests(wait)
+
+                try:
+                    response = await handler(view, request, *args, **kwargs)
+                except Exception:
+                    if only_successful:
+                        await sync_to_async(limiter.release)(ident, hit_id)
+                    raise
+                if only_successful and response.status_code >= 400:
+                    await sync_to_async(limiter.release)(ident, hit_id)
+                return response
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            limiter = get_limiter(scope)
+            ident = f'{scope}:{key(request)}'
+            hit_id = uuid4().hex
+
+            wait = limiter.hit(ident, hit_id)
+            if wait:
+                return too_many_requests(wait)
+
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except Exception:
+                if only_successful:
+                    limiter.release(ident, hit_id)
+                raise
+            if only_successful and response.status_code >= 400:
+                limiter.release(ident, hit_id)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,104 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.permissions import SAFE_METHODS
+
+import contextvars
+import random
+
+
+# state of the current request, set by ReplicaMiddleware
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+PIN_PREFIX = 'db_pinned:'
+
+
+def is_pinned(user):
+    # users who wrote recently read from the primary until the replicas caught up
+    return user.is_authenticated and cache.get(PIN_PREFIX + str(user.pk)) is not None
+
+
+def pin(request):
+    # the user may be the lazy session user, which can query the database
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(PIN_PREFIX + str(user.pk), True, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of views using `ReplicaReadMixin` to a random `DATABASE_REPLICAS` alias,
+    every other query goes to the primary (`default`).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state and state['replica'] and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaMiddleware:
+    """
+    Keeps the replica routing state of each request and pins users to the primary for
+    `DATABASE_REPLICA_PIN_SECONDS` after a request of theirs wrote, so they read their own writes.
+    Must come after the authentication middleware, DRF sets `request.user` once the view authenticated.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {'replica': False, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state['wrote']:
+            pin(request)
+        return response
+
+    async def __acall__(self, request):
+        state = {'replica': False, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state['wrote']:
+            await sync_to_async(pin)(request)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    View mixin sending the reads of safe requests to the replicas, unless the user is pinned to the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _request_state.get()
+        if state is not None and settings.DATABASE_REPLICAS:
+            state['replica'] = request.method in SAFE_METHODS and not is_pinned(request.user)
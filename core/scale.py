@@ -0,0 +1,301 @@
+from datetime import timedelta
+from io import StringIO
+from itertools import accumulate
+import json
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from analytics.models import ProductSalesRollup
+from cart.models import Cart, CartItem
+from orders.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from payments.models import PaymentRequest
+from products.models import Product, ProductDailySales, ProductPopularity, ProductRecommendation
+
+
+PREFIX = 'scale_'
+PHONE_PREFIX = '+98917'
+TAGS = ['python', 'django', 'trading', 'design', 'music', 'cooking', 'data', 'marketing', 'photography', 'writing']
+
+
+#################################################
+#                                               #
+#                                               #
+#                    Writing                    #
+#                                               #
+#                                               #
+#################################################
+
+
+def copy_escape(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+class TableWriter:
+    """
+    Inserts rows of python values into the table of `model`, with `COPY` on PostgreSQL
+    and multi-row inserts elsewhere. The rows skip the ORM, so they must list every column
+    in `columns` order, primary keys included.
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.fields = [model._meta.get_field(column) for column in columns]
+        self.table = connection.ops.quote_name(model._meta.db_table)
+        self.columns = ', '.join(connection.ops.quote_name(field.column) for field in self.fields)
+        self.written = 0
+
+    def prepare(self, row):
+        values = []
+        for field, value in zip(self.fields, row):
+            if isinstance(field, models.JSONField):
+                values.append(None if value is None else json.dumps(value))
+            elif isinstance(field, (models.DateTimeField, models.UUIDField, models.ForeignKey)):
+                values.append(field.get_db_prep_save(value, connection))
+            else:
+                values.append(value)
+        return values
+
+    def write(self, rows):
+        if not rows:
+            return
+        rows = [self.prepare(row) for row in rows]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                data = StringIO()
+                for row in rows:
+                    data.write('\t'.join(copy_escape(value) for value in row))
+                    data.write('\n')
+                data.seek(0)
+                cursor.cursor.copy_expert(f'COPY {self.table} ({self.columns}) FROM STDIN', data)
+            else:
+                placeholders = ', '.join(['%s'] * len(self.fields))
+                cursor.executemany(
+                    f'INSERT INTO {self.table} ({self.columns}) VALUES ({placeholders})', rows
+                )
+        self.written += len(rows)
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def reset_sequences(models_list):
+    # rows written with explicit ids leave the PostgreSQL sequences behind
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models_list):
+            cursor.execute(sql)
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Generation                   #
+#                                               #
+#                                               #
+#################################################
+
+
+def zipf_weights(count, exponent):
+    # cumulative weights of a zipf distribution, the first entries are the most popular
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def product_title(index):
+    # order items keep the title of their product, which follows from its index
+    return f'{PREFIX}product {index}'
+
+
+def timestamp(rng, end, days):
+    # activity grows over time, recent days get more rows than old ones
+    return end - timedelta(seconds=days * 86400 * rng.random() ** 1.5)
+
+
+class ScaleGenerator:
+    """
+    Generates users, products, carts and orders with skewed distributions: a zipf share of the users
+    make most of the orders, a zipf share of the products sell most, carts and orders have long tailed sizes.
+    The data only depends on `rng` and `end` as long as the tables start empty.
+    """
+
+    def __init__(self, rng, end, days, chunk_size, log=None):
+        self.rng = rng
+        self.end = end
+        self.days = days
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+
+    def chunks(self, count):
+        for start in range(0, count, self.chunk_size):
+            yield start, min(start + self.chunk_size, count)
+
+    def products(self, count):
+        writer = TableWriter(Product, [
+            'id', 'title', 'price', 'offprice', 'exclusive', 'features', 'thumbnail',
+            'datetime_created', 'datetime_modified',
+        ])
+        first = next_id(Product)
+        rng = self.rng
+        prices = []
+        for start, stop in self.chunks(count):
+            rows = []
+            for index in range(start, stop):
+                created = timestamp(rng, self.end, self.days)
+                prices.append(max(1, min(2000, int(rng.lognormvariate(3.5, 0.8)))))
+                rows.append((
+                    first + index,
+                    product_title(index),
+                    prices[-1],
+                    rng.randint(1, 20) if rng.random() < 0.2 else 0,
+                    rng.random() < 0.05,
+                    {
+                        'pages': rng.randint(10, 900),
+                        'format': rng.choice(['pdf', 'epub', 'video', 'audio']),
+                        'tags': rng.sample(TAGS, rng.randint(1, 4)),
+                    },
+                    '',
+                    created,
+                    created,
+                ))
+            with transaction.atomic():
+                writer.write(rows)
+            self.log(f'products: {writer.written}/{count}')
+        return list(range(first, first + count)), prices
+
+    def users(self, count):
+        User = get_user_model()
+        writer = TableWriter(User, [
+            'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+            'is_staff', 'is_active', 'date_joined', 'phone_number', 'otp_created_at',
+        ])
+        first = next_id(User)
+        # one hash for everyone, hashing each password would take longer than everything else
+        password = make_password(f'{PREFIX}password')
+        for start, stop in self.chunks(count):
+            rows = [
+                (
+                    first + index, password, None, False, f'{PREFIX}{index}', '', '', '',
+                    False, True, timestamp(self.rng, self.end, self.days), f'{PHONE_PREFIX}{index:07d}', None,
+                )
+                for index in range(start, stop)
+            ]
+            with transaction.atomic():
+                writer.write(rows)
+            self.log(f'users: {writer.written}/{count}')
+        return list(range(first, first + count))
+
+    def orders(self, count, user_ids, product_ids, prices, mean_items):
+        rng = self.rng
+        order_writer = TableWriter(Order, [
+            'id', 'user', 'total_price', 'status', 'is_paid', 'gateway', 'gateway_track_id',
+            'gateway_response', 'datetime_created', 'datetime_paid',
+        ])
+        item_writer = TableWriter(OrderItem, ['id', 'order', 'product', 'price', 'title', 'thumbnail'])
+        order_id, item_id = next_id(Order), next_id(OrderItem)
+
+        # popularity doesn't follow the id order
+        users = rng.sample(user_ids, len(user_ids))
+        products = rng.sample(range(len(product_ids)), len(product_ids))
+        user_weights = zipf_weights(len(users), 0.8)
+        product_weights = zipf_weights(len(products), 1.05)
+        statuses = [Order.ORDER_STATUS_PAID, Order.ORDER_STATUS_UNPAID, Order.ORDER_STATUS_PENDING]
+
+        for start, stop in self.chunks(count):
+            orders, items = [], []
+            buyers = rng.choices(users, cum_weights=user_weights, k=stop - start)
+            for user_id in buyers:
+                size = min(1 + int(rng.expovariate(1 / (mean_items - 1))) if mean_items > 1 else 1, 30)
+                # repeated picks of a popular product collapse, an order has each product once
+                picked = set(rng.choices(products, cum_weights=product_weights, k=size))
+                total = 0
+                for position in picked:
+                    items.append((
+                        item_id, order_id, product_ids[position], prices[position], product_title(position), '',
+                    ))
+                    total += prices[position]
+                    item_id += 1
+                status = rng.choices(statuses, weights=[75, 15, 10])[0]
+                created = timestamp(rng, self.end, self.days)
+                paid = status == Order.ORDER_STATUS_PAID
+                orders.append((
+                    order_id, user_id, total, status, paid, Order.OXAPAY_GATEWAY,
+                    uuid.UUID(int=rng.getrandbits(128)).hex if status != Order.ORDER_STATUS_UNPAID else '',
+                    None, created, created + timedelta(seconds=rng.randint(30, 1800)) if paid else None,
+                ))
+                order_id += 1
+            with transaction.atomic():
+                order_writer.write(orders)
+                item_writer.write(items)
+            self.log(f'orders: {order_writer.written}/{count}, items: {item_writer.written}')
+        return order_writer.written, item_writer.written
+
+    def carts(self, user_ids, product_ids, share, mean_items):
+        rng = self.rng
+        cart_writer = TableWriter(Cart, ['id', 'user', 'datetime_updated'])
+        item_writer = TableWriter(CartItem, ['id', 'cart', 'product'])
+        item_id = next_id(CartItem)
+        owners = [user_id for user_id in user_ids if rng.random() < share]
+
+        for start, stop in self.chunks(len(owners)):
+            carts, items = [], []
+            for user_id in owners[start:stop]:
+                cart_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+                carts.append((cart_id, user_id, self.end))
+                # most carts are small, a few hold hundreds of products
+                size = min(int(rng.paretovariate(1.5) * mean_items / 3), 300, len(product_ids))
+                for product_id in rng.sample(product_ids, size):
+                    items.append((item_id, cart_id, product_id))
+                    item_id += 1
+            with transaction.atomic():
+                cart_writer.write(carts)
+                item_writer.write(items)
+            self.log(f'carts: {cart_writer.written}/{len(owners)}, items: {item_writer.written}')
+        return cart_writer.written, item_writer.written
+
+
+def flush():
+    """
+    Deletes the generated data with plain DELETEs, the ORM would load millions of rows to cascade them.
+    So every table referencing generated rows is listed here, referencing tables first, including the ones
+    derived from the orders: archives, popularity, recommendations and product rollups, and the
+    tokens issued to the seeded users.
+    """
+    users = get_user_model().objects.filter(username__startswith=PREFIX)
+    products = Product.objects.filter(title__startswith=PREFIX)
+    querysets = [
+        OrderItem.objects.filter(order__user__in=users),
+        OrderItem.objects.filter(product__in=products),
+        ArchivedOrderItem.objects.filter(order__user__in=users),
+        ArchivedOrderItem.objects.filter(product__in=products),
+        PaymentRequest.objects.filter(user__in=users),
+        Order.objects.filter(user__in=users),
+        ArchivedOrder.objects.filter(user__in=users),
+        CartItem.objects.filter(cart__user__in=users),
+        CartItem.objects.filter(product__in=products),
+        Cart.objects.filter(user__in=users),
+        ProductDailySales.objects.filter(product__in=products),
+        ProductPopularity.objects.filter(product__in=products),
+        ProductRecommendation.objects.filter(product__in=products),
+        ProductRecommendation.objects.filter(recommended__in=products),
+        ProductSalesRollup.objects.filter(product__in=products),
+        BlacklistedToken.objects.filter(token__user__in=users),
+        OutstandingToken.objects.filter(user__in=users),
+        products,
+        users,
+    ]
+    deleted = 0
+    with transaction.atomic():
+        for queryset in querysets:
+            deleted += queryset._raw_delete(queryset.db)
+    return deleted
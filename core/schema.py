@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+import gzip
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+
+API_INFO = openapi.Info(
+   title="SigloyLand API",
+   default_version='v1',
+   description="SigloyLand API Documentation",
+   terms_of_service="https://www.google.com/policies/terms/",
+   contact=openapi.Contact(email="esi.taheri@yahoo.com"),
+   license=openapi.License(name="BSD License"),
+)
+
+
+@dataclass(frozen=True)
+class Schema:
+    content: bytes
+    compressed: bytes
+    etag: str
+
+    @classmethod
+    def from_content(cls, content, compressed=None):
+        # mtime=0 keeps the compressed bytes the same for the same schema
+        return cls(
+            content,
+            compressed or gzip.compress(content, compresslevel=9, mtime=0),
+            '"%s"' % hashlib.sha256(content).hexdigest()[:32],
+        )
+
+    @property
+    def compressed_etag(self):
+        # each encoding is a representation of its own, caches must not validate one with the other
+        return self.etag[:-1] + '-gzip"'
+
+
+def generate():
+    """
+    Introspects every view into the OpenAPI document as JSON. The schema is public and has no host,
+    so it's the same for every request and can be built ahead of time.
+    """
+    document = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(document)
+
+
+def write(path):
+    """
+    Writes the generated schema to `path` and its gzip version to `path`.gz, replacing
+    the previous files atomically. Returns the schema.
+    """
+    schema = Schema.from_content(generate())
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    for target, content in ((path, schema.content), (f'{path}.gz', schema.compressed)):
+        with open(f'{target}.tmp', 'wb') as file:
+            file.write(content)
+        os.replace(f'{target}.tmp', target)
+    return schema
+
+
+def read(path):
+    try:
+        with open(path, 'rb') as file:
+            content = file.read()
+    except FileNotFoundError:
+        return None
+    try:
+        with open(f'{path}.gz', 'rb') as file:
+            compressed = file.read()
+    except FileNotFoundError:
+        compressed = None
+    return Schema.from_content(content, compressed)
+
+
+_schema = None
+_lock = threading.Lock()
+
+
+def get_schema():
+    """
+    The schema written by the `generate_openapi_schema` command, or when it wasn't run, the schema
+    generated on the first call. Either way it's kept for the life of the process.
+    """
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                _schema = read(settings.OPENAPI_SCHEMA_FILE) or Schema.from_content(generate())
+    return _schema
+
+
+def clear():
+    global _schema
+    _schema = None
@@ -3,6 +3,10 @@ from djoser.serializers import UserSerializer as DjoserUserSerializer
 from phonenumber_field.serializerfields import PhoneNumberField
 
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as SimpleJWTTokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as SimpleJWTTokenRefreshSerializer
+
+from .tokens import RefreshToken
 
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
@@ -15,6 +19,14 @@ class UserSerializer(DjoserUserSerializer):
         fields = ['id', 'username', 'email', 'phone_number', 'first_name', 'last_name', ]
 
 
+class TokenObtainPairSerializer(SimpleJWTTokenObtainPairSerializer):
+    token_class = RefreshToken
+
+
+class TokenRefreshSerializer(SimpleJWTTokenRefreshSerializer):
+    token_class = RefreshToken
+
+
 class SignUpSerializer(serializers.Serializer):
     phone_number = PhoneNumberField()
     password = serializers.CharField(max_length=60)
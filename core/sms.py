@@ -0,0 +1,182 @@
+import collections
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class SmsTemporaryError(Exception):
+    """
+    Raised by providers for failures worth retrying (timeouts, connection errors, 5xx responses).
+    """
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Providers                    #
+#                                               #
+#                                               #
+#################################################
+
+
+class SmsProvider:
+    """
+    Interface of sms providers.
+    `send_otp` returns True when the provider accepted the message and False when it rejected it,
+    and raises SmsTemporaryError when sending may succeed on a retry.
+    """
+
+    def send_otp(self, phone_number, code):
+        raise NotImplementedError
+
+
+class KavenegarProvider(SmsProvider):
+    """
+    Sends otp sms through the kavenegar verify lookup api over a pooled keep-alive session.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.SMS_POOL_SIZE)
+        self.session.mount('https://', adapter)
+
+    def send_otp(self, phone_number, code):
+        body = {
+            'receptor': f'+98{phone_number}',
+            'token': code,
+            'template': settings.KAVENEGAR_TEMPLATE,
+        }
+        url = f'https://api.kavenegar.com/v1/{settings.KAVENEGAR_API_KEY}/verify/lookup.json'
+        try:
+            response = self.session.post(url, params=body, timeout=settings.SMS_TIMEOUT)
+        except requests.RequestException as e:
+            raise SmsTemporaryError(str(e))
+
+        if response.status_code >= 500:
+            raise SmsTemporaryError(f'kavenegar responded with {response.status_code}')
+        return response.status_code == 200
+
+
+class FakeProvider(SmsProvider):
+    """
+    Local provider for development and load tests. Keeps the last sent messages in memory
+    and optionally sleeps `SMS_FAKE_LATENCY` seconds to simulate the real provider.
+    """
+
+    def __init__(self):
+        self.sent = collections.deque(maxlen=1000)
+
+    def send_otp(self, phone_number, code):
+        latency = getattr(settings, 'SMS_FAKE_LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+        self.sent.append((str(phone_number), code))
+        logger.info('fake sms to %s: %s', phone_number, code)
+        return True
+
+
+PROVIDERS = {
+    'kavenegar': KavenegarProvider,
+    'fake': FakeProvider,
+}
+
+
+#################################################
+#                                               #
+#                                               #
+#                  Dispatcher                   #
+#                                               #
+#                                               #
+#################################################
+
+
+class SmsDispatcher:
+    """
+    Delivers sms in background worker threads so requests don't wait on the provider.
+    Temporary failures are retried with exponential backoff.
+    """
+
+    def __init__(self, provider, workers, max_retries, retry_backoff, queue_size):
+        self.provider = provider
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        # workers are started lazily so they live in the process that serves requests
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self.work, name=f'sms-worker-{i}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def enqueue(self, phone_number, code):
+        """
+        Queues an otp sms, returns False if the queue is full.
+        """
+        self.start()
+        try:
+            self.queue.put_nowait((phone_number, code))
+        except queue.Full:
+            logger.error('sms queue is full, dropping otp sms to %s', phone_number)
+            return False
+        return True
+
+    def work(self):
+        while True:
+            phone_number, code = self.queue.get()
+            try:
+                self.deliver(phone_number, code)
+            except Exception:
+                logger.exception('unexpected error while sending otp sms to %s', phone_number)
+            finally:
+                self.queue.task_done()
+
+    def deliver(self, phone_number, code):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if not self.provider.send_otp(phone_number, code):
+                    logger.error('sms provider rejected otp sms to %s', phone_number)
+                return
+            except SmsTemporaryError as e:
+                logger.warning('sending otp sms to %s failed (attempt %s): %s', phone_number, attempt + 1, e)
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+        logger.error('giving up on otp sms to %s after %s attempts', phone_number, self.max_retries + 1)
+
+
+_provider = None
+_dispatcher = None
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        _provider = PROVIDERS[settings.SMS_PROVIDER]()
+    return _provider
+
+
+def get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = SmsDispatcher(
+            provider=get_provider(),
+            workers=settings.SMS_WORKERS,
+            max_retries=settings.SMS_MAX_RETRIES,
+            retry_backoff=settings.SMS_RETRY_BACKOFF,
+            queue_size=settings.SMS_QUEUE_SIZE,
+        )
+    return _dispatcher
@@ -0,0 +1,71 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+# most queries each endpoint may make, keyed by method and url name.
+# the counts must not depend on the amount of data, `assertConstantQueries` checks that they don't.
+# in tests the savepoints of atomic blocks are counted as queries too.
+QUERY_BUDGETS = {
+    'GET products_list': 1,
+    'GET product_detail': 2,
+    'GET cart': 2,
+    'POST cart': 6,
+    'PATCH cart': 4,
+    'GET guest-cart': 1,
+    'GET orders-list': 4,
+    'GET orders-detail': 3,
+    'POST orders-list': 9,
+    'GET gateways_list': 1,
+    # admin pages include the session and user lookups
+    'GET admin:orders_order_changelist': 6,
+    'GET admin:orders_orderitem_changelist': 4,
+    'GET admin:orders_order_change': 7,
+    'GET admin:cart_cart_change': 7,
+}
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin failing when an endpoint makes more queries than its `QUERY_BUDGETS` entry
+    or when its queries grow with the data, e.g. an N+1 in a serializer.
+    """
+
+    def capture_queries(self, request):
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        return response, context.captured_queries
+
+    def queries_message(self, queries):
+        return '\n'.join(f'{number}. {query["sql"]}' for number, query in enumerate(queries, start=1))
+
+    def check_budget(self, endpoint, queries):
+        budget = QUERY_BUDGETS[endpoint]
+        if len(queries) > budget:
+            self.fail(
+                f'{endpoint} made {len(queries)} queries, its budget is {budget}:\n{self.queries_message(queries)}'
+            )
+
+    def assertQueryBudget(self, endpoint, request):
+        """
+        Calls `request` and checks its queries against the budget of `endpoint`, returns the response.
+        """
+        response, queries = self.capture_queries(request)
+        self.check_budget(endpoint, queries)
+        return response
+
+    def assertConstantQueries(self, endpoint, request, grow):
+        """
+        Calls `request`, lets `grow` add data, e.g. more items, and calls `request` again.
+        Both calls must make the same number of queries within the budget of `endpoint`.
+        Returns the second response.
+        """
+        _, before = self.capture_queries(request)
+        grow()
+        response, after = self.capture_queries(request)
+        self.check_budget(endpoint, after)
+        if len(after) != len(before):
+            self.fail(
+                f'{endpoint} made {len(before)} queries, then {len(after)} with more data:\n'
+                f'{self.queries_message(after)}'
+            )
+        return response
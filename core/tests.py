@@ -1,13 +1,40 @@
 from django.urls import reverse
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.utils import timezone
 from datetime import timedelta
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from io import StringIO
+import gzip
+import json
+import os
+import tempfile
+import time
 from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
 from . import models
+from . import benchmark
+from . import hashers
+from . import metrics
+from . import ratelimit
+from . import scale
+from . import schema
+from .otp import CacheOtpStore, DatabaseOtpStore
+from . import sms
+from . import views
+from .pagination import EstimatedCountLimitOffsetPagination, EstimatedCountPaginator, estimated_count
+from .tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from orders.models import ArchivedOrder, Order
+from products.models import Product
 
 
 # Constants for the test
@@ -18,7 +45,8 @@ USER_CREATION_USERNAME = '09170001111'
 
 class LoginViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.url = reverse('login')  
         self.user_data = {
@@ -70,7 +98,8 @@ class LoginViewTestCase(TestCase):
 
 class LogoutViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.login_url = reverse('login')
         self.logout_url = reverse('logout')
@@ -111,7 +140,8 @@ class LogoutViewTestCase(TestCase):
 
 class RegisterViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.register_url = reverse('register')  
         self.phone_number = TEST_PHONE_NUMBER
@@ -136,8 +166,7 @@ class RegisterViewTestCase(TestCase):
         self.assertEqual(response.data['code'], 405)
         self.assertEqual(response.data['message'], 'user has already registerd.')
 
-    @patch('core.utils.check_otp_cooldown')
-    def test_register_too_many_requests(self, mock_check_otp_cooldown):
+    def test_register_too_many_requests(self):
         """
         Test registration when too many OTP requests have been made.
         """
@@ -149,12 +178,12 @@ class RegisterViewTestCase(TestCase):
             expiration_time=otp_expiration_time,
             password=self.password
         )
-        mock_check_otp_cooldown.return_value = otp.id
 
         response = self.client.post(self.register_url, self.user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
         self.assertEqual(response.data['code'], 429)
         self.assertEqual(response.data['message'], 'please wait before requesting a new OTP.')
+        self.assertAlmostEqual(response.data['remaining_time'], 120, delta=2)
 
 
     @patch('core.utils.send_otp_sms')
@@ -163,7 +192,7 @@ class RegisterViewTestCase(TestCase):
         Test successful registration and OTP sending.
         """
         # Mock the send OTP function to simulate a successful send
-        mock_send_otp_sms.return_value.status_code = 200
+        mock_send_otp_sms.return_value = True
         
         response = self.client.post(self.register_url, self.user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -181,7 +210,7 @@ class RegisterViewTestCase(TestCase):
         Test registration when OTP sending fails.
         """
         # Mock the send OTP function to simulate a failure
-        mock_send_otp_sms.return_value.status_code = 400
+        mock_send_otp_sms.return_value = False
         
         response = self.client.post(self.register_url, self.user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -191,7 +220,8 @@ class RegisterViewTestCase(TestCase):
 
 class VerifyAccessTokenViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.verify_url = reverse('verify_access_token')  
         self.phone_number = TEST_PHONE_NUMBER
@@ -253,7 +283,8 @@ class VerifyAccessTokenViewTestCase(TestCase):
 
 class ForgetPasswordViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.url = reverse('forget_password') 
         self.phone_number = TEST_PHONE_NUMBER
@@ -270,7 +301,7 @@ class ForgetPasswordViewTestCase(TestCase):
         Test successful forget password request where OTP is sent.
         """
         # Mock the send OTP function to simulate a successful send
-        mock_send_otp_sms.return_value.status_code = 200
+        mock_send_otp_sms.return_value = True
         
         data = {'phone_number': self.phone_number}
         
@@ -289,8 +320,7 @@ class ForgetPasswordViewTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['code'], 400)
 
-    @patch('core.utils.check_otp_cooldown')
-    def test_forget_password_too_many_requests(self, mock_check_otp_cooldown):
+    def test_forget_password_too_many_requests(self):
         """
         Test forget password request when too many OTP requests have been made.
         """
@@ -300,7 +330,6 @@ class ForgetPasswordViewTestCase(TestCase):
             token='1234',
             expiration_time=otp_expiration_time
         )
-        mock_check_otp_cooldown.return_value = otp.id
 
         data = {'phone_number': self.phone_number}
         response = self.client.post(self.url, data, format='json')
@@ -310,7 +339,8 @@ class ForgetPasswordViewTestCase(TestCase):
 
 class ForgetPasswordVerifyViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.url = reverse('forget_password_verify')  # مسیر URL صحیح را وارد کنید
         self.phone_number = '+989170001111'
@@ -366,7 +396,8 @@ class ForgetPasswordVerifyViewTestCase(TestCase):
 
 class PasswordResetViewTestCase(TestCase):
     def setUp(self):
-        # Initial setup for each test
+        # Initial setup for each test, rate limits are kept in the cache
+        cache.clear()
         self.client = APIClient()
         self.url = reverse('reset_password')  
         self.phone_number = TEST_PHONE_NUMBER
@@ -425,3 +456,632 @@ class PasswordResetViewTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['code'], 400)
         self.assertEqual(response.data['message'], 'invalid token.')
+
+
+
+class RateLimitTestCase(TestCase):
+    def setUp(self):
+        # Initial setup for each test
+        self.storage = ratelimit.InMemoryStorage()
+
+    def test_parse_rate(self):
+        """
+        Test parsing of rate strings with and without a period multiplier.
+        """
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('1/60m'), (1, 3600))
+
+    def test_token_bucket(self):
+        """
+        Test that a token bucket allows a burst up to its capacity and refills over time.
+        """
+        limiter = ratelimit.TokenBucket(2, 60, self.storage)
+        self.assertEqual(limiter.hit('key'), 0)
+        self.assertEqual(limiter.hit('key'), 0)
+        self.assertAlmostEqual(limiter.hit('key'), 30, delta=1)
+
+        with patch('core.ratelimit.time.time', return_value=timezone.now().timestamp() + 30):
+            self.assertEqual(limiter.hit('key'), 0)
+
+    def test_sliding_window(self):
+        """
+        Test that a sliding window allows the limit inside the window and the next hit after it.
+        """
+        limiter = ratelimit.SlidingWindow(1, 3600, self.storage)
+        self.assertEqual(limiter.check('key'), 0)
+        self.assertEqual(limiter.hit('key'), 0)
+        self.assertAlmostEqual(limiter.check('key'), 3600, delta=1)
+
+        with patch('core.ratelimit.time.time', return_value=timezone.now().timestamp() + 3601):
+            self.assertEqual(limiter.hit('key'), 0)
+
+    def test_released_hits_dont_count(self):
+        """
+        Test that a released hit gives its slot back.
+        """
+        for limiter in (ratelimit.TokenBucket(1, 3600, self.storage), ratelimit.SlidingWindow(1, 3600, self.storage)):
+            self.assertEqual(limiter.hit(limiter.__class__.__name__, 'first'), 0)
+            limiter.release(limiter.__class__.__name__, 'first')
+            self.assertEqual(limiter.hit(limiter.__class__.__name__, 'second'), 0)
+            self.assertGreater(limiter.hit(limiter.__class__.__name__, 'third'), 0)
+
+    def test_release_forgets_only_its_own_hit(self):
+        """
+        Test that releasing a hit doesn't free the slot of a hit made after it.
+        """
+        limiter = ratelimit.SlidingWindow(2, 3600, self.storage)
+        self.assertEqual(limiter.hit('key', 'failed'), 0)
+        self.assertEqual(limiter.hit('key', 'succeeded'), 0)
+        limiter.release('key', 'failed')
+        self.assertEqual([hit_id for _, hit_id in self.storage.get('key')], ['succeeded'])
+        self.assertEqual(limiter.hit('key', 'next'), 0)
+        self.assertGreater(limiter.hit('key', 'rejected'), 0)
+
+    def test_database_storage(self):
+        """
+        Test that limits kept in the database are shared and their expired rows purged.
+        """
+        limiter = ratelimit.SlidingWindow(1, 3600, ratelimit.DatabaseStorage())
+        self.assertEqual(limiter.hit('key', 'first'), 0)
+        # another process reads the same rows
+        self.assertGreater(ratelimit.SlidingWindow(1, 3600, ratelimit.DatabaseStorage()).hit('key', 'second'), 0)
+
+        models.RateLimit.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_rate_limits', stdout=StringIO())
+        self.assertFalse(models.RateLimit.objects.exists())
+
+    def test_default_storage_is_shared(self):
+        """
+        Test that limits aren't kept per process by default when the cache is.
+        """
+        if not settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.skipTest('the default cache is shared')
+        self.assertIsInstance(ratelimit.get_storage(), ratelimit.DatabaseStorage)
+
+    def test_concurrent_hits(self):
+        """
+        Test that concurrent hits can't take more slots than the limit.
+        """
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for storage in (self.storage, ratelimit.CacheStorage()):
+            limiter = ratelimit.SlidingWindow(2, 3600, storage)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                waits = list(executor.map(lambda _: limiter.hit('concurrent'), range(16)))
+            self.assertEqual(waits.count(0), 2)
+
+    def test_phone_number_key_is_normalized(self):
+        """
+        Test that every spelling of a phone number is limited together.
+        """
+        request = APIRequestFactory().post('/', {'phone_number': '+98 917 000 1111'}, format='json')
+        self.assertEqual(views.phone_number_key(Request(request, parsers=[JSONParser()])), TEST_PHONE_NUMBER)
+
+    def test_login_rate_limit(self):
+        """
+        Test that the login view rejects requests once the limit is reached.
+        """
+        cache.clear()
+        self.addCleanup(cache.clear)
+        data = {'phone_number': TEST_PHONE_NUMBER, 'password': TEST_PASSWORD}
+        limit, _ = ratelimit.parse_rate(settings.RATE_LIMITS['login']['rate'])
+        for _ in range(limit):
+            self.client.post(reverse('login'), data, format='json')
+
+        response = self.client.post(reverse('login'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response.data['code'], 429)
+        self.assertIn('remaining_time', response.data)
+
+
+
+class SmsDispatcherTestCase(TestCase):
+    def setUp(self):
+        # Initial setup for each test
+        self.provider = sms.FakeProvider()
+
+    def test_fake_provider_records_messages(self):
+        """
+        Test that the fake provider keeps sent messages in memory.
+        """
+        self.assertTrue(self.provider.send_otp(TEST_PHONE_NUMBER, '1234'))
+        self.assertEqual(list(self.provider.sent), [(TEST_PHONE_NUMBER, '1234')])
+
+    def test_dispatcher_sends_in_background(self):
+        """
+        Test that queued sms are delivered by the worker threads.
+        """
+        dispatcher = sms.SmsDispatcher(self.provider, workers=1, max_retries=0, retry_backoff=0, queue_size=10)
+        self.assertTrue(dispatcher.enqueue(TEST_PHONE_NUMBER, '1234'))
+        dispatcher.queue.join()
+        self.assertEqual(list(self.provider.sent), [(TEST_PHONE_NUMBER, '1234')])
+
+    def test_dispatcher_retries_temporary_errors(self):
+        """
+        Test that temporary provider errors are retried until the sms is sent.
+        """
+        dispatcher = sms.SmsDispatcher(self.provider, workers=1, max_retries=2, retry_backoff=0, queue_size=10)
+        with patch.object(self.provider, 'send_otp', side_effect=[sms.SmsTemporaryError('timeout'), True]) as mock_send:
+            dispatcher.deliver(TEST_PHONE_NUMBER, '1234')
+        self.assertEqual(mock_send.call_count, 2)
+
+    @patch('core.sms.requests.Session.post')
+    def test_kavenegar_provider_timeout_is_temporary(self, mock_post):
+        """
+        Test that kavenegar timeouts are raised as temporary errors.
+        """
+        mock_post.side_effect = sms.requests.Timeout()
+        with self.assertRaises(sms.SmsTemporaryError):
+            sms.KavenegarProvider().send_otp(TEST_PHONE_NUMBER, '1234')
+
+
+
+class OtpStoreTestCase(TestCase):
+    def setUp(self):
+        # Initial setup for each test
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_cache_store(self):
+        """
+        Test creating, looking up and deleting an otp in the cache store.
+        """
+        store = CacheOtpStore()
+        self.assertEqual(store.claim(TEST_PHONE_NUMBER, '1234', timedelta(minutes=2), password=TEST_PASSWORD), 0)
+
+        self.assertIsNone(store.get(TEST_PHONE_NUMBER, '0000'))
+        otp = store.get(TEST_PHONE_NUMBER, '1234')
+        self.assertEqual(otp.password, TEST_PASSWORD)
+        self.assertFalse(otp.is_expired)
+        self.assertAlmostEqual(store.cooldown(TEST_PHONE_NUMBER), 120, delta=1)
+
+        store.delete(TEST_PHONE_NUMBER)
+        self.assertIsNone(store.get(TEST_PHONE_NUMBER, '1234'))
+
+    def test_cache_store_reports_expired_otp(self):
+        """
+        Test that an expired otp is still found by token but is no longer active.
+        """
+        store = CacheOtpStore()
+        store.claim(TEST_PHONE_NUMBER, '1234', timedelta(seconds=-1))
+
+        self.assertTrue(store.get(TEST_PHONE_NUMBER, '1234').is_expired)
+        self.assertEqual(store.cooldown(TEST_PHONE_NUMBER), 0)
+
+    def test_claim_send_slot_once(self):
+        """
+        Test that only the first claim for a phone number wins while its otp is valid.
+        """
+        for store in [CacheOtpStore(), DatabaseOtpStore()]:
+            self.assertEqual(store.claim(TEST_PHONE_NUMBER, '1234', timedelta(minutes=2)), 0)
+            self.assertGreater(store.claim(TEST_PHONE_NUMBER, '5678', timedelta(minutes=2)), 0)
+            self.assertIsNotNone(store.get(TEST_PHONE_NUMBER, '1234'))
+            self.assertIsNone(store.get(TEST_PHONE_NUMBER, '5678'))
+
+    def test_purge_expired_otps(self):
+        """
+        Test that the purge command deletes only expired otps.
+        """
+        store = DatabaseOtpStore()
+        store.claim(TEST_PHONE_NUMBER, '1234', timedelta(minutes=-1))
+        store.claim('+989170002222', '1234', timedelta(minutes=2))
+
+        call_command('purge_expired_otps', stdout=StringIO())
+        self.assertEqual(
+            [str(receiver) for receiver in models.Otp.objects.values_list('receiver', flat=True)],
+            ['+989170002222']
+        )
+
+
+
+class PasswordHashingTestCase(TestCase):
+    def setUp(self):
+        # Initial setup for each test
+        self.user = get_user_model().objects.create_user(
+            phone_number=TEST_PHONE_NUMBER,
+            username=USER_CREATION_USERNAME,
+            password=TEST_PASSWORD
+        )
+
+    def test_check_user_password_upgrades_hash(self):
+        """
+        Test that a password hashed by another hasher is rehashed with the preferred one on login.
+        """
+        self.user.password = make_password(TEST_PASSWORD, hasher='scrypt')
+        self.user.save()
+
+        with patch('core.hashers._run', wraps=hashers._run) as run:
+            self.assertTrue(hashers.check_user_password(self.user, TEST_PASSWORD))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        # the rehash runs in the pool like the verification
+        self.assertEqual([call.args[0] for call in run.call_args_list], [hashers.hashers.verify_password, hashers.hashers.make_password])
+
+    async def test_acheck_user_password_upgrades_hash_off_the_loop(self):
+        """
+        Test that the async check rehashes an outdated hash in the pool, not on the event loop.
+        """
+        self.user.password = make_password(TEST_PASSWORD, hasher='scrypt')
+        await self.user.asave()
+
+        with patch('core.hashers._arun', wraps=hashers._arun) as arun, \
+                patch.object(self.user, 'set_password', side_effect=AssertionError('hashed on the loop')):
+            self.assertTrue(await hashers.acheck_user_password(self.user, TEST_PASSWORD))
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual([call.args[0] for call in arun.call_args_list], [hashers.hashers.verify_password, hashers.hashers.make_password])
+
+    def test_check_user_password_in_pool(self):
+        """
+        Test password verification and hashing through the bounded hashing pool.
+        """
+        with override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, 'POOL_SIZE': 2}):
+            self.assertIsNotNone(hashers.get_executor())
+            self.assertTrue(hashers.check_user_password(self.user, TEST_PASSWORD))
+            self.assertFalse(hashers.check_user_password(self.user, 'wrongpassword'))
+            self.assertTrue(check_password(TEST_PASSWORD, hashers.hash_password(TEST_PASSWORD)))
+
+
+
+class TokenBlacklistTestCase(TestCase):
+    def setUp(self):
+        # Initial setup for each test, the cache blacklist lives in the cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            phone_number=TEST_PHONE_NUMBER,
+            username=USER_CREATION_USERNAME,
+            password=TEST_PASSWORD
+        )
+
+    @override_settings(JWT_BLACKLIST_BACKEND='cache')
+    def test_cache_blacklist(self):
+        """
+        Test that issuing tokens writes no rows and a blacklisted token can't be refreshed.
+        """
+        refresh = RefreshToken.for_user(self.user)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {refresh.access_token}')
+        response = self.client.post(reverse('logout'), {'refresh_token': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+        response = self.client.post(reverse('jwt-refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_token_blacklist(self):
+        """
+        Test that the prune command deletes only expired outstanding and blacklisted tokens.
+        """
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(minutes=1))
+        valid = RefreshToken.for_user(self.user)
+
+        call_command('prune_token_blacklist', stdout=StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [valid['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_io_bound_views_are_async(self):
+        self.assertTrue(views.RegisterView.view_is_async)
+        self.assertTrue(views.ForgetPasswordView.view_is_async)
+        self.assertTrue(views.LoginView.view_is_async)
+
+    @patch('core.utils.send_otp_sms', return_value=True)
+    async def test_register_under_asgi(self, mock_send_otp_sms):
+        """
+        Test that registration runs through the ASGI handler and keeps the otp cooldown.
+        """
+        client = AsyncClient()
+        data = {'phone_number': TEST_PHONE_NUMBER, 'password': TEST_PASSWORD}
+        response = await client.post(reverse('register'), data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(await models.Otp.objects.filter(receiver=TEST_PHONE_NUMBER).aexists())
+        # queries made through sync_to_async are counted too
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+        response = await client.post(reverse('register'), data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    async def test_login_under_asgi(self):
+        """
+        Test that login checks the password in the hashing pool through the ASGI handler.
+        """
+        await get_user_model().objects.acreate(
+            phone_number=TEST_PHONE_NUMBER,
+            username=USER_CREATION_USERNAME,
+            password=make_password(TEST_PASSWORD)
+        )
+        client = AsyncClient()
+        with patch('core.hashers._arun', wraps=hashers._arun) as mock_arun:
+            response = await client.post(
+                reverse('login'), {'phone_number': TEST_PHONE_NUMBER, 'password': TEST_PASSWORD},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.json())
+        mock_arun.assert_called_once()
+
+        response = await client.post(
+            reverse('login'), {'phone_number': TEST_PHONE_NUMBER, 'password': 'wrongpassword'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        # the replica alias points to the test database, picking it is what is checked
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            phone_number=TEST_PHONE_NUMBER,
+            username=USER_CREATION_USERNAME,
+            password=TEST_PASSWORD
+        )
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(title='Test Product', price=10, thumbnail='https://picsum.photos/200/300')
+
+    @patch('core.replicas.random.choice', return_value='default')
+    def test_catalog_reads_use_replicas(self, mock_choice):
+        response = self.client.get(reverse('products_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(mock_choice.called)
+
+    @patch('core.replicas.random.choice', return_value='default')
+    def test_other_views_use_primary(self, mock_choice):
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(mock_choice.called)
+
+    @patch('core.replicas.random.choice', return_value='default')
+    def test_user_reads_own_writes(self, mock_choice):
+        """
+        Test that a user who wrote reads from the primary until the pin expires.
+        """
+        response = self.client.post(reverse('cart'), {'product': self.product.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.get('/orders/')
+        self.assertFalse(mock_choice.called)
+
+        cache.delete(f'db_pinned:{self.user.pk}')
+        self.client.get('/orders/')
+        self.assertTrue(mock_choice.called)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Product.objects.create(title='Test Product', price=10, thumbnail='https://picsum.photos/200/300')
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('products_list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries", serializer;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('products_list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('http_request_db_queries_bucket{view="products_list",method="GET",le="1"} 1', response.content.decode())
+        self.assertIn('http_request_duration_seconds_count{view="products_list",method="GET"} 1', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        response = self.client.get(reverse('products_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics.REQUEST_LATENCY.series, {})
+
+
+class SeedScaleTestCase(TestCase):
+    options = {'users': 20, 'products': 30, 'orders': 50, 'chunk_size': 7, 'stdout': StringIO()}
+
+    def snapshot(self):
+        return list(Order.objects.order_by('id').values_list('user__username', 'total_price', 'status', 'datetime_created'))
+
+    def test_seed_scale(self):
+        """
+        Test that the generated orders are consistent with their items and the same seed gives the same data.
+        """
+        call_command('seed_scale', '--end=2024-01-01', **self.options)
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertEqual(get_user_model().objects.filter(username__startswith='scale_').count(), 20)
+        order = Order.objects.prefetch_related('items__product').first()
+        self.assertEqual(order.total_price, sum(item.product.price for item in order.items.all()))
+        first = self.snapshot()
+
+        call_command('seed_scale', '--end=2024-01-01', flush=True, **self.options)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_flush_after_derived_tables(self):
+        """
+        Test that flushing deletes the rows derived from the generated orders and the seeded users' tokens too.
+        """
+        call_command('seed_scale', '--end=2024-01-01', **self.options)
+        for command in ('refresh_product_popularity', 'update_sales_rollups', 'archive_orders'):
+            call_command(command, stdout=StringIO())
+        call_command('refresh_product_popularity', '--rebuild', stdout=StringIO())
+        call_command('build_product_recommendations', stdout=StringIO())
+        self.assertTrue(ArchivedOrder.objects.exists())
+        user = get_user_model().objects.filter(username__startswith='scale_').first()
+        RefreshToken.for_user(user).blacklist()
+        RefreshToken.for_user(user)
+
+        scale.flush()
+        connection.check_constraints()
+        self.assertFalse(Product.objects.filter(title__startswith='scale_').exists())
+        self.assertFalse(ArchivedOrder.objects.exists())
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    def setUp(self):
+        for number in range(3):
+            Product.objects.create(title=f'Test Product {number}', price=10)
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=1000)
+    def test_estimate_above_threshold(self):
+        with patch('core.pagination.estimated_count', return_value=5000):
+            self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('id'), 2).count, 5000)
+        with patch('core.pagination.estimated_count', return_value=500):
+            self.assertEqual(EstimatedCountPaginator(Product.objects.order_by('id'), 2).count, 3)
+
+    def test_filtered_querysets_are_counted(self):
+        # the planner estimate is for the whole table, sqlite has none
+        self.assertIsNone(estimated_count(Product.objects.filter(price=10)))
+        self.assertIsNone(estimated_count(Product.objects.all()))
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=2)
+    def test_big_filtered_counts_are_cached(self):
+        cache.clear()
+        queryset = Product.objects.filter(price=10).order_by('id')
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 3)
+        Product.objects.create(title='Test Product 3', price=10)
+        # counted again once the cached count expires
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 3)
+        self.assertEqual(EstimatedCountPaginator(Product.objects.filter(price=20), 2).count, 0)
+
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=2)
+    def test_limit_offset_pagination(self):
+        cache.clear()
+        request = Request(APIRequestFactory().get('/', {'limit': 1, 'offset': 1}))
+        paginator = EstimatedCountLimitOffsetPagination()
+        page = paginator.paginate_queryset(Product.objects.order_by('id'), request)
+        self.assertEqual(len(page), 1)
+        self.assertEqual(paginator.count, 3)
+
+
+class OpenApiSchemaTestCase(TestCase):
+    def setUp(self):
+        schema.clear()
+        self.addCleanup(schema.clear)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'openapi.json')
+
+    def test_precomputed_schema_is_served(self):
+        call_command('generate_openapi_schema', f'--output={self.path}', stdout=StringIO())
+        with override_settings(OPENAPI_SCHEMA_FILE=self.path), patch('core.schema.generate') as generate:
+            response = self.client.get(reverse('openapi_schema'), HTTP_ACCEPT_ENCODING='gzip, br')
+        generate.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        with open(self.path, 'rb') as file:
+            self.assertEqual(gzip.decompress(response.content), file.read())
+        self.assertIn('/orders/', json.loads(gzip.decompress(response.content))['paths'])
+
+    def test_gzip_follows_accept_encoding_quality(self):
+        for accept_encoding, gzipped in [
+            ('gzip', True), ('br, GZIP;q=0.5', True), ('*', True),
+            ('gzip;q=0', False), ('gzip; q=0.0, br', False), ('*;q=0', False), ('br', False), ('', False),
+        ]:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.client.get(reverse('openapi_schema'), HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(response.get('Content-Encoding') == 'gzip', gzipped)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_encodings_have_their_own_etag(self):
+        identity = self.client.get(reverse('openapi_schema'), HTTP_ACCEPT_ENCODING='identity')
+        gzipped = self.client.get(reverse('openapi_schema'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(identity['ETag'], gzipped['ETag'])
+
+        # a cached identity body isn't validated for a client asking for gzip, and the other way around
+        response = self.client.get(
+            reverse('openapi_schema'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=identity['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.get(
+            reverse('openapi_schema'), HTTP_ACCEPT_ENCODING='identity', HTTP_IF_NONE_MATCH=gzipped['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            reverse('openapi_schema'), HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=f'{identity["ETag"]}, {gzipped["ETag"]}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], gzipped['ETag'])
+
+    def test_generated_once_per_process_without_file(self):
+        with override_settings(OPENAPI_SCHEMA_FILE=self.path), patch(
+            'core.schema.generate', wraps=schema.generate
+        ) as generate:
+            response = self.client.get(reverse('openapi_schema'))
+            self.assertIn('/orders/', json.loads(response.content)['paths'])
+            response = self.client.get(reverse('openapi_schema'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(generate.call_count, 1)
+
+    def test_pages_load_the_served_schema(self):
+        with patch('core.schema.generate') as generate:
+            response = self.client.get(reverse('schema-swagger-ui'))
+        generate.assert_not_called()
+        self.assertContains(response, reverse('openapi_schema'))
+
+
+class BenchmarkApiTestCase(TransactionTestCase):
+    # the requests run in threads with their own connections, they must see the committed seed data.
+    # sqlite locks tables on concurrent writes, so the scenarios run one request at a time here
+
+    def test_smoke_run(self):
+        """
+        Test that a small run of every scenario completes without errors and cleans up after itself.
+        """
+        output = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'results.json')
+        call_command(
+            'benchmark_api', '--users=2', '--products=30', '--orders-per-user=1', '--cart-items=1',
+            '--requests=4', '--concurrency=1', '--gateway-latency=0', '--sms-latency=0',
+            f'--output={output}', '--cleanup', stdout=StringIO()
+        )
+        with open(output) as file:
+            results = json.load(file)['results']
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        for name, summary in results.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(summary['requests'], 4)
+                self.assertEqual(summary['errors'], 0)
+        self.assertFalse(Product.objects.filter(title__startswith=benchmark.PREFIX).exists())
+
+    def test_one_request_in_flight_per_user(self):
+        """
+        Test that concurrent requests of the same user don't overlap, e.g. one clearing the cart another orders from.
+        """
+        call_command(
+            'benchmark_api', '--users=2', '--products=30', '--orders-per-user=1', '--cart-items=1',
+            '--scenarios=cart_get', '--requests=1', stdout=StringIO()
+        )
+        users = list(get_user_model().objects.filter(username__startswith=benchmark.PREFIX).order_by('id'))
+        active, overlaps = set(), []
+
+        def prepare(ctx):
+            overlaps.append(ctx.user.pk in active)
+            active.add(ctx.user.pk)
+            time.sleep(0.01)
+            active.discard(ctx.user.pk)
+
+        scenario = benchmark.Scenario('get', lambda ctx: reverse('products_list'), prepare=prepare, authenticated=False)
+        with patch.dict(benchmark.SCENARIOS, {'overlap': scenario}):
+            result = benchmark.run('overlap', users, requests=16, concurrency=8, seed_value=0)
+        self.assertEqual(result.errors, 0)
+        self.assertEqual(len(overlaps), 16)
+        self.assertFalse(any(overlaps))
+        benchmark.cleanup()
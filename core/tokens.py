@@ -0,0 +1,53 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from cart.utils import get_cart_id
+
+
+def use_cache_blacklist():
+    return settings.JWT_BLACKLIST_BACKEND == 'cache'
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    Refresh token carrying the user's cart id, copied to the access tokens made from it,
+    so stateless authentication can serve the cart without looking it up.
+
+    With the `cache` blacklist backend, blacklisted jtis are cache keys expiring with the token,
+    so refresh checks are a single key lookup and issuing a token writes nothing.
+    """
+    blacklist_prefix = 'jwt_blacklist:'
+
+    @classmethod
+    def for_user(cls, user):
+        if use_cache_blacklist():
+            # skip BlacklistMixin.for_user, which records every issued token in OutstandingToken
+            token = super(tokens.BlacklistMixin, cls).for_user(user)
+        else:
+            token = super().for_user(user)
+        cart_id = get_cart_id(user)
+        token['cart_id'] = str(cart_id) if cart_id else None
+        return token
+
+    def check_blacklist(self):
+        if not use_cache_blacklist():
+            return super().check_blacklist()
+        if cache.get(self.blacklist_prefix + self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        if not use_cache_blacklist():
+            return super().blacklist()
+        remaining = self.payload['exp'] - self.current_time.timestamp()
+        cache.set(
+            self.blacklist_prefix + self.payload[api_settings.JTI_CLAIM],
+            True,
+            timeout=max(1, math.ceil(remaining))
+        )
@@ -1,30 +1,23 @@
-import requests
 from django.conf import settings
-from django.utils import timezone
 
-from . import models
+from datetime import timedelta
 
+from . import sms
+from .otp import get_otp_store
 
-def send_otp_sms(phone_number, code):
-    # request to kavehnegar api for send otp sms and resturn response
-    body = {
-        'receptor': f'+98{phone_number}',
-        'token': code,
-        'template': settings.KavenegarTemplate,
-    }
-    url = f'https://api.kavenegar.com/v1/{settings.KavenegarAPIKey}/verify/lookup.json'
-    response = requests.post(url, params=body)
-    return response
-
-
-def check_otp_cooldown(phone_number):
-    # checks phonenumber last sent otp for cooldown
-    valid_otps = models.Otp.objects.filter(receiver=phone_number, expiration_time__gte=timezone.now())
 
-    otp = valid_otps.last()
-
-    if not otp:
-        return None
-
-    return otp.id
-    
\ No newline at end of file
+def send_otp_sms(phone_number, code):
+    # hands the otp sms to the configured provider, in background workers when SMS_ASYNC is enabled.
+    # returns True if the sms was sent or queued
+    if settings.SMS_ASYNC:
+        return sms.get_dispatcher().enqueue(phone_number, code)
+    try:
+        return sms.get_provider().send_otp(phone_number, code)
+    except sms.SmsTemporaryError:
+        return False
+
+
+def claim_otp_send_slot(phone_number, code, password=None):
+    # stores a new otp for the phonenumber unless it is in cooldown, only one concurrent request can win.
+    # returns 0 if the caller may send the sms, otherwise the seconds left on the cooldown
+    return get_otp_store().claim(phone_number, code, lifetime=timedelta(minutes=2), password=password)
@@ -2,13 +2,20 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+
+from asgiref.sync import sync_to_async
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from phonenumber_field.phonenumber import to_python
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import make_password
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags
 from django.utils import timezone
 
 
@@ -17,15 +24,34 @@ import random
 import string
 
 
+from . import hashers
 from . import serializers
 from . import utils
 from . import models
-
-
-class RegisterView(APIView):
+from .otp import get_otp_store
+from .tokens import RefreshToken
+from .ratelimit import rate_limit
+from .async_views import AsyncAPIView, run_io
+from .metrics import render_metrics
+from .schema import get_schema
+from cart.guest import merge_guest_cart
+
+
+def phone_number_key(request):
+    # the number in E.164 like the serializers read it, so every spelling of a number shares its limit
+    value = request.data.get('phone_number')
+    if isinstance(value, str):
+        phone_number = to_python(value, region=getattr(settings, 'PHONENUMBER_DEFAULT_REGION', None))
+        if phone_number and phone_number.is_valid():
+            return phone_number.as_e164
+    return str(value)
+
+
+class RegisterView(AsyncAPIView):
     """ 
     Handles the user signup process, including OTP generation and validation, 
     and ensures the user doesn't already exist.
+    Async as it mostly waits on the sms provider.
     """
     http_method_names = ['post', ]
 
@@ -65,15 +91,15 @@ class RegisterView(APIView):
             ))
         }
     )
-    def post(self, request):
+    @rate_limit('otp_send', key=phone_number_key, only_successful=True)
+    async def post(self, request):
         serializer = serializers.SignUpSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         phone_number = serializer.validated_data['phone_number']
         password = serializer.validated_data['password']
 
-        try:
-            user = get_user_model().objects.get(phone_number=phone_number)
+        if await get_user_model().objects.filter(phone_number=phone_number).aexists():
             return Response(
                 {
                     'code': 405,
@@ -81,49 +107,43 @@ class RegisterView(APIView):
                 },
                 status=status.HTTP_405_METHOD_NOT_ALLOWED
             )
-        except get_user_model().DoesNotExist:
-            cooldown = utils.check_otp_cooldown(phone_number)
-            if cooldown is not None:
-                otp = models.Otp.objects.get(id=cooldown)
-                reamining_time = otp.expiration_time - timezone.now()
-                return Response(
-                    {
-                        'code': 429,
-                        'message': 'please wait before requesting a new OTP.',
-                        'remaining_time': int(reamining_time.total_seconds())
-                    },
-                    status=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            code = ''.join(random.choices(string.digits, k=4))
-            response = utils.send_otp_sms(phone_number, code)
-
-            if response.status_code == 200:
-                models.Otp.objects.create(
-                    receiver=phone_number,
-                    token=code,
-                    expiration_time=timezone.now() + timedelta(minutes=2),
-                    password=password
-                )
-                return Response(
-                    {
-                        'code': 200,
-                        'message': 'success.',
-                        'cooldown': '120',
-                    }, status=status.HTTP_200_OK
-                )
-            else:
-                return Response(
-                    {
-                        'code': 400,
-                        'message': 'something is wrong. please contact support.'
-                    }, status=status.HTTP_400_BAD_REQUEST
-                )
+
+        code = ''.join(random.choices(string.digits, k=4))
+        reamining_time = await sync_to_async(utils.claim_otp_send_slot)(phone_number, code, password=password)
+        if reamining_time:
+            return Response(
+                {
+                    'code': 429,
+                    'message': 'please wait before requesting a new OTP.',
+                    'remaining_time': reamining_time
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        if await run_io(utils.send_otp_sms, phone_number, code):
+            return Response(
+                {
+                    'code': 200,
+                    'message': 'success.',
+                    'cooldown': '120',
+                }, status=status.HTTP_200_OK
+            )
+        else:
+            # free the slot so the user can retry right away
+            await sync_to_async(get_otp_store().delete)(phone_number)
+            return Response(
+                {
+                    'code': 400,
+                    'message': 'something is wrong. please contact support.'
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
             
 
-class LoginView(APIView):
+class LoginView(AsyncAPIView):
     """
     Manages user login, including authentication, token generation, 
     and verifying if the user exists and the credentials are correct.
+    Async so a request waiting on the password hashing pool doesn't hold a worker.
     """
     http_method_names = ['post', ]
 
@@ -146,10 +166,19 @@ class LoginView(APIView):
                     'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=400),
                     'message': openapi.Schema(type=openapi.TYPE_STRING, example='invalid phone number or password.')
                 }
+            )),
+            429: openapi.Response('Too Many Requests', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=429),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='too many requests. please try again later.'),
+                    'remaining_time': openapi.Schema(type=openapi.TYPE_INTEGER, example=60)
+                }
             ))
         }
     )
-    def post(self, request):
+    @rate_limit('login', key=phone_number_key)
+    async def post(self, request):
         serializer = serializers.LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
@@ -157,24 +186,7 @@ class LoginView(APIView):
         password = serializer.validated_data['password']
 
         try:
-            user = get_user_model().objects.get(phone_number=phone_number)
-            if user.check_password(password):
-                refresh = RefreshToken.for_user(user)
-                return Response(
-                    {
-                        'code': 200,
-                        'expire': timezone.now() + timedelta(minutes=60),
-                        'refresh': str(refresh),
-                        'access': str(refresh.access_token),
-                    }, status=status.HTTP_200_OK
-                )
-            else:
-                return Response(
-                    {
-                        'code': 400,
-                        'message': 'invalid phone number or password.'
-                    }, status=status.HTTP_400_BAD_REQUEST
-                )
+            user = await get_user_model().objects.aget(phone_number=phone_number)
         except get_user_model().DoesNotExist:
             return Response(
                 {
@@ -182,6 +194,31 @@ class LoginView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST
             )
 
+        if await hashers.acheck_user_password(user, password):
+            response = await sync_to_async(self.login)(request, user)
+            response.delete_cookie(settings.GUEST_CART_COOKIE)
+            return response
+        else:
+            return Response(
+                {
+                    'code': 400,
+                    'message': 'invalid phone number or password.'
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
+
+    def login(self, request, user):
+        # merge first so the token carries the cart id if the merge created the cart
+        merge_guest_cart(request, user)
+        refresh = RefreshToken.for_user(user)
+        return Response(
+            {
+                'code': 200,
+                'expire': timezone.now() + timedelta(minutes=60),
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+            }, status=status.HTTP_200_OK
+        )
+
 
 class VerifyAccessTokenView(APIView):
     """
@@ -209,9 +246,18 @@ class VerifyAccessTokenView(APIView):
                     'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=400),
                     'message': openapi.Schema(type=openapi.TYPE_STRING, example='invalid phone number or token.')
                 }
+            )),
+            429: openapi.Response('Too Many Requests', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=429),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='too many requests. please try again later.'),
+                    'remaining_time': openapi.Schema(type=openapi.TYPE_INTEGER, example=60)
+                }
             ))
         }
     )
+    @rate_limit('otp_verify', key=phone_number_key)
     def post(self, request):
         serializer = serializers.ObtainAccessTokenSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -219,55 +265,59 @@ class VerifyAccessTokenView(APIView):
         phone_number = serializer.validated_data['phone_number']
         token = serializer.validated_data['token']
 
-        try:
-            otp = models.Otp.objects.get(receiver=phone_number, token=token)
+        otp_store = get_otp_store()
+        otp = otp_store.get(phone_number, token)
 
-            if otp.expiration_time > timezone.now():
-                try:
-                    user = get_user_model().objects.get(phone_number=phone_number)
+        if otp is None:
+            return Response(
+                {
+                    'code': 400,
+                    'message': 'invalid phone number or token.'
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
 
-                except get_user_model().DoesNotExist:
+        if not otp.is_expired:
+            try:
+                user = get_user_model().objects.get(phone_number=phone_number)
 
-                    hashed_password = make_password(otp.password)
+            except get_user_model().DoesNotExist:
 
-                    user = get_user_model().objects.create(
-                        username=phone_number,
-                        email=f'email{phone_number}@sigloy.com',
-                        password=hashed_password,
-                        phone_number=phone_number,
-                    )
+                hashed_password = hashers.hash_password(otp.password)
 
-                refresh = RefreshToken.for_user(user)
-                otp.delete()
-                return Response(
-                    {
-                        'code': 200,
-                        'expire': timezone.now() + timedelta(minutes=60),
-                        'refresh': str(refresh),
-                        'access': str(refresh.access_token),
-                    }, status=status.HTTP_200_OK
-                )
-            else:
-                otp.delete()
-                return Response(
-                    {
-                        'code': 400,
-                        'message': 'token has expired.'
-                    }, status=status.HTTP_400_BAD_REQUEST
+                user = get_user_model().objects.create(
+                    username=phone_number,
+                    email=f'email{phone_number}@sigloy.com',
+                    password=hashed_password,
+                    phone_number=phone_number,
                 )
 
-        except models.Otp.DoesNotExist:
+            merge_guest_cart(request, user)
+            refresh = RefreshToken.for_user(user)
+            otp_store.delete(phone_number)
+            response = Response(
+                {
+                    'code': 200,
+                    'expire': timezone.now() + timedelta(minutes=60),
+                    'refresh': str(refresh),
+                    'access': str(refresh.access_token),
+                }, status=status.HTTP_200_OK
+            )
+            response.delete_cookie(settings.GUEST_CART_COOKIE)
+            return response
+        else:
+            otp_store.delete(phone_number)
             return Response(
                 {
                     'code': 400,
-                    'message': 'invalid phone number or token.'
+                    'message': 'token has expired.'
                 }, status=status.HTTP_400_BAD_REQUEST
             )
 
 
-class ForgetPasswordView(APIView):
+class ForgetPasswordView(AsyncAPIView):
     """
     Initiates the password reset process by sending an OTP to the user's phone number if the user exists.
+    Async as it mostly waits on the sms provider.
     """
     http_method_names = ['post', ]
 
@@ -298,50 +348,50 @@ class ForgetPasswordView(APIView):
             ))
         }
     )
-    def post(self, request):
+    @rate_limit('otp_send', key=phone_number_key, only_successful=True)
+    async def post(self, request):
         serializer = serializers.ForgetPasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         phone_number = serializer.validated_data['phone_number']
 
-        try : 
-            user = get_user_model().objects.get(phone_number=phone_number)
-            cooldown = utils.check_otp_cooldown(phone_number)
-            if cooldown is not None:
-                otp = models.Otp.objects.get(id=cooldown)
-                reamining_time = otp.expiration_time - timezone.now()
-                return Response(
-                    {
-                        'message': 'please wait before requesting a new OTP.',
-                        'remaining_time': int(reamining_time.total_seconds())
-                    },
-                    status=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            code = ''.join(random.choices(string.digits, k=4))
-            response = utils.send_otp_sms(phone_number, code)
-
-            if response.status_code == 200:
-                models.Otp.objects.create(
-                    receiver=phone_number,
-                    token=code,
-                    expiration_time=timezone.now() + timedelta(minutes=2),
-                )
-                return Response(
-                    {
-                        'code': 200,
-                        'message': 'success.',
-                        'cooldown': '120'
-                    },
-                    status=status.HTTP_200_OK
-                )
-
-        except get_user_model().DoesNotExist:
+        if not await get_user_model().objects.filter(phone_number=phone_number).aexists():
             return Response(
                 {
                     'code': 400
                 }, status=status.HTTP_400_BAD_REQUEST
             )
 
+        code = ''.join(random.choices(string.digits, k=4))
+        reamining_time = await sync_to_async(utils.claim_otp_send_slot)(phone_number, code)
+        if reamining_time:
+            return Response(
+                {
+                    'message': 'please wait before requesting a new OTP.',
+                    'remaining_time': reamining_time
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        if await run_io(utils.send_otp_sms, phone_number, code):
+            return Response(
+                {
+                    'code': 200,
+                    'message': 'success.',
+                    'cooldown': '120'
+                },
+                status=status.HTTP_200_OK
+            )
+        else:
+            # free the slot so the user can retry right away
+            await sync_to_async(get_otp_store().delete)(phone_number)
+            return Response(
+                {
+                    'code': 400,
+                    'message': 'something is wrong. please contact support.'
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
+
 
 class ForgetPasswordVerifyView(APIView):
     """
@@ -367,9 +417,18 @@ class ForgetPasswordVerifyView(APIView):
                     'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=400),
                     'message': openapi.Schema(type=openapi.TYPE_STRING, example='token has expired or invalid phone number or token.')
                 }
+            )),
+            429: openapi.Response('Too Many Requests', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=429),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='too many requests. please try again later.'),
+                    'remaining_time': openapi.Schema(type=openapi.TYPE_INTEGER, example=60)
+                }
             ))
         }
     )
+    @rate_limit('otp_verify', key=phone_number_key)
     def post(self, request):
         serializer = serializers.ForgetPasswordVerifySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -377,37 +436,37 @@ class ForgetPasswordVerifyView(APIView):
         phone_number = serializer.validated_data['phone_number']
         token = serializer.validated_data['token']
 
-        try:
-            otp = models.Otp.objects.get(receiver=phone_number, token=token)
-
-            if otp.expiration_time > timezone.now():
-                forget_password_token = models.ForgetPasswordToken.objects.create(
-                    phone_number=phone_number,
-                    expiration_time = timezone.now() + timedelta(hours=2)
-                )
-                return Response(
-                    {
-                        'code': 200,
-                        'token': str(forget_password_token.id),
-                        'expire': timezone.now() + timedelta(hours=2)
-                    }, status=status.HTTP_200_OK
-                )
-            else:
-                otp.delete()
-                return Response(
-                    {
-                        'code': 400,
-                        'message': 'token has expired.'
-                    }, status=status.HTTP_400_BAD_REQUEST
-                )
+        otp_store = get_otp_store()
+        otp = otp_store.get(phone_number, token)
 
-        except models.Otp.DoesNotExist:
+        if otp is None:
             return Response(
                 {
                     'code': 400,
                     'message': 'invalid phone number or token.'
                 }, status=status.HTTP_400_BAD_REQUEST
             )
+
+        if not otp.is_expired:
+            forget_password_token = models.ForgetPasswordToken.objects.create(
+                phone_number=phone_number,
+                expiration_time = timezone.now() + timedelta(hours=2)
+            )
+            return Response(
+                {
+                    'code': 200,
+                    'token': str(forget_password_token.id),
+                    'expire': timezone.now() + timedelta(hours=2)
+                }, status=status.HTTP_200_OK
+            )
+        else:
+            otp_store.delete(phone_number)
+            return Response(
+                {
+                    'code': 400,
+                    'message': 'token has expired.'
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
         
 
 class PasswordResetView(APIView):
@@ -448,7 +507,7 @@ class PasswordResetView(APIView):
 
             if forget_password_token.expiration_time > timezone.now():
                 user = get_user_model().objects.get(phone_number=forget_password_token.phone_number)
-                user.password = make_password(password)
+                user.password = hashers.hash_password(password)
                 user.save()
                 forget_password_token.delete()
                 return Response(
@@ -490,4 +549,55 @@ class LogoutView(APIView):
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        
\ No newline at end of file
+        
+
+def metrics(request):
+    """
+    Serves the request histograms of this process in the Prometheus text format.
+    """
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4')
+
+
+def accepts_gzip(request):
+    """
+    Returns whether the `Accept-Encoding` header of `request` allows gzip, honoring q-values
+    so `gzip;q=0` or `*;q=0` without a gzip entry refuse it.
+    """
+    qualities = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def openapi_schema(request):
+    """
+    Serves the OpenAPI schema precomputed by `generate_openapi_schema`, or generated once per process,
+    gzipped to clients accepting it. The swagger and redoc pages load it from here.
+    """
+    schema = get_schema()
+    gzipped = accepts_gzip(request)
+    etag = schema.compressed_etag if gzipped else schema.etag
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    elif gzipped:
+        response = HttpResponse(schema.compressed, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(schema.content, content_type='application/json')
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
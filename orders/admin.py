@@ -1,21 +1,91 @@
 from django.contrib import admin
 
-from . models import Order, OrderItem
+from core.pagination import EstimatedCountPaginator
+
+from . models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
 
 
 class OrderItemInline(admin.TabularInline):
+    """
+    Purchased lines are shown read only from one joined query, a product widget per line would query
+    the product again for each of them. Lines are added with `AddOrderItemInline`.
+    """
     model = OrderItem
     fields = ['product', 'price', ]
+    readonly_fields = ['product', 'price', ]
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class AddOrderItemInline(admin.TabularInline):
+    """
+    Empty rows adding lines to the order, products are picked with the autocomplete widget instead of
+    a select of the whole catalog.
+    """
+    model = OrderItem
+    fields = ['product', 'price', ]
+    autocomplete_fields = ['product', ]
+    extra = 1
+    verbose_name_plural = 'add order items'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).none()
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'total_price', 'status', 'gateway', 'is_paid', 'datetime_created', ]
-    inlines = [OrderItemInline]
+    list_select_related = ['user', ]
+    search_fields = ['=id', '=user__username', ]
+    autocomplete_fields = ['user', ]
+    date_hierarchy = 'datetime_created'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [OrderItemInline, AddOrderItemInline]
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'price', ]
-    
\ No newline at end of file
+    list_select_related = ['order', 'product', ]
+    autocomplete_fields = ['order', 'product', ]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ['product', 'price', ]
+    readonly_fields = ['product', 'price', ]
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """
+    Archived orders are only looked at, they are moved here by the `archive_orders` command.
+    """
+    list_display = ['id', 'user', 'total_price', 'status', 'is_paid', 'datetime_created', ]
+    list_select_related = ['user', ]
+    search_fields = ['=id', '=user__username', ]
+    date_hierarchy = 'datetime_created'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,38 @@
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+def archived_copy(instance, model):
+    return model(**{field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields})
+
+
+def archivable(before):
+    """
+    Orders created before `before` that can't change anymore: paid or unpaid, not waiting for
+    a gateway, and without payment requests left, which are deleted with their order.
+    """
+    return Order.objects.filter(datetime_created__lt=before, paymentrequest__isnull=True).exclude(
+        status=Order.ORDER_STATUS_PENDING
+    )
+
+
+def archive(before, batch_size=1000):
+    """
+    Moves the archivable orders and their items to the archive tables, keeping their ids,
+    one short transaction per batch. Returns the number of moved orders.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            orders = list(archivable(before).select_for_update().order_by('id')[:batch_size])
+            if not orders:
+                break
+            ids = [order.id for order in orders]
+            items = OrderItem.objects.filter(order_id__in=ids)
+            ArchivedOrder.objects.bulk_create([archived_copy(order, ArchivedOrder) for order in orders])
+            ArchivedOrderItem.objects.bulk_create([archived_copy(item, ArchivedOrderItem) for item in items])
+            items.delete()
+            Order.objects.filter(id__in=ids).delete()
+        moved += len(orders)
+    return moved
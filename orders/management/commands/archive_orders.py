@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import archive
+
+
+class Command(BaseCommand):
+    help = 'Moves settled orders older than the archive horizon and their items to the archive tables in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_DAYS,
+            help='Keep the orders of the last N days.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of orders moved per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        moved = archive.archive(before, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'archived {moved} orders created before {before}.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='datetime_paid',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Paid At'),
+        ),
+    ]
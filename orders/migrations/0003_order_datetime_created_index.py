@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_datetime_paid'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='datetime_created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Created At'),
+        ),
+    ]
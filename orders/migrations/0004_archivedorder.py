@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_datetime_created_index'),
+        ('products', '0003_productrecommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_price', models.IntegerField(default=0, verbose_name='Total Price')),
+                ('status', models.CharField(choices=[('paid', 'Paid'), ('unpaid', 'Unpaid'), ('pending', 'Pending')], default='unpaid', max_length=7, verbose_name='Status')),
+                ('is_paid', models.BooleanField(default=False, verbose_name='Is Paid')),
+                ('gateway', models.CharField(choices=[('oxapay', 'Oxapay')], default='oxapay', max_length=10, verbose_name='Gateway')),
+                ('gateway_track_id', models.CharField(blank=True, default='', max_length=255, verbose_name='Gateway Track ID')),
+                ('gateway_response', models.TextField(blank=True, null=True, verbose_name='Gateway Response')),
+                ('datetime_created', models.DateTimeField(verbose_name='Created At')),
+                ('datetime_paid', models.DateTimeField(blank=True, null=True, verbose_name='Paid At')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.IntegerField(verbose_name='Price')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-datetime_created'], name='order_user_history_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder', verbose_name='Order'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_order_items', to='products.product', verbose_name='Product'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', '-datetime_created'], name='archivedorder_user_history_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedorderitem',
+            unique_together={('order', 'product')},
+        ),
+    ]
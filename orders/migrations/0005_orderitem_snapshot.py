@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_archivedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='thumbnail',
+            field=models.ImageField(blank=True, default='', upload_to='products/product_thumbnails/', verbose_name='Product Thumbnail'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='title',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Product Title'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='thumbnail',
+            field=models.ImageField(blank=True, default='', upload_to='products/product_thumbnails/', verbose_name='Product Thumbnail'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='title',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Product Title'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+
+BATCH_SIZE = 10000
+
+
+def backfill_snapshots(apps, schema_editor):
+    # one UPDATE per range of ids, each committed on its own so the items are never locked all at once
+    Product = apps.get_model('products', 'Product')
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+    for name in ('OrderItem', 'ArchivedOrderItem'):
+        model = apps.get_model('orders', name)
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        for start in range(0, last_id, BATCH_SIZE):
+            model.objects.filter(id__gt=start, id__lte=start + BATCH_SIZE).update(
+                title=Subquery(product.values('title')[:1]),
+                thumbnail=Subquery(product.values('thumbnail')[:1]),
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('orders', '0005_orderitem_snapshot'),
+        ('products', '0003_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
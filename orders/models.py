@@ -28,7 +28,11 @@ class Order(models.Model):
     gateway_track_id = models.CharField('Gateway Track ID', max_length=255, blank=True, default='')
     gateway_response = models.TextField('Gateway Response', blank=True, null=True)
 
-    datetime_created = models.DateTimeField('Created At', auto_now_add=True)
+    datetime_created = models.DateTimeField('Created At', auto_now_add=True, db_index=True)
+    datetime_paid = models.DateTimeField('Paid At', blank=True, null=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-datetime_created'], name='order_user_history_idx')]
 
     def __str__(self):
         return f'#{self.id}'
@@ -38,7 +42,54 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.PROTECT, related_name='items', verbose_name='Order')
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='order_items', verbose_name='Product')
     price = models.IntegerField('Price')
+    # the product as it was bought, order history is shown from the order items alone
+    title = models.CharField('Product Title', max_length=255, blank=True, default='')
+    thumbnail = models.ImageField('Product Thumbnail', upload_to='products/product_thumbnails/', blank=True, default='')
+
+    class Meta:
+        unique_together = [['order', 'product']]
+
+    def save(self, *args, **kwargs):
+        # lines added outside checkout, e.g. from the admin, snapshot their product too
+        if not self.title:
+            self.title = self.product.title
+            if not self.thumbnail:
+                self.thumbnail = self.product.thumbnail.name
+        super().save(*args, **kwargs)
+
+
+class ArchivedOrder(models.Model):
+    """
+    Orders older than `ORDER_ARCHIVE_DAYS` moved out of `Order` by the `archive_orders` command,
+    with their original ids. Same fields as `Order`.
+    """
+    id = models.BigIntegerField('ID', primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_orders', verbose_name='User')
+    total_price = models.IntegerField('Total Price', default=0)
+    status = models.CharField('Status', max_length=7, choices=Order.ORDER_STATUS, default=Order.ORDER_STATUS_UNPAID)
+    is_paid = models.BooleanField('Is Paid', default=False)
+
+    gateway = models.CharField('Gateway', max_length=10, choices=Order.GATEWAY_CHOICES, default=Order.OXAPAY_GATEWAY)
+    gateway_track_id = models.CharField('Gateway Track ID', max_length=255, blank=True, default='')
+    gateway_response = models.TextField('Gateway Response', blank=True, null=True)
+
+    datetime_created = models.DateTimeField('Created At')
+    datetime_paid = models.DateTimeField('Paid At', blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-datetime_created'], name='archivedorder_user_history_idx')]
+
+    def __str__(self):
+        return f'#{self.id}'
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField('ID', primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items', verbose_name='Order')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='archived_order_items', verbose_name='Product')
+    price = models.IntegerField('Price')
+    title = models.CharField('Product Title', max_length=255, blank=True, default='')
+    thumbnail = models.ImageField('Product Thumbnail', upload_to='products/product_thumbnails/', blank=True, default='')
 
     class Meta:
         unique_together = [['order', 'product']]
-    
\ No newline at end of file
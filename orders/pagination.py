@@ -0,0 +1,69 @@
+from django.conf import settings
+
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class OrderHistoryPagination(LimitOffsetPagination):
+    """
+    Limit/offset pages of the recent orders followed by the archived ones of the view,
+    `ORDER_HISTORY_PAGE_SIZE` orders when only `offset` is given. The archive is only read by the pages
+    reaching past the recent orders, so responses have no total `count`, a page has a `next` link
+    when more orders follow it.
+    Requests without `limit` and `offset` aren't paginated, they keep the list the history returned
+    before it had pages.
+    """
+    template = None
+
+    @property
+    def default_limit(self):
+        return settings.ORDER_HISTORY_PAGE_SIZE
+
+    @property
+    def max_limit(self):
+        return settings.ORDER_HISTORY_MAX_PAGE_SIZE
+
+    def get_limit(self, request):
+        if not {self.limit_query_param, self.offset_query_param} & request.query_params.keys():
+            return None
+        return super().get_limit(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+
+        # one order more than the page tells whether another page follows
+        wanted = self.limit + 1
+        orders = list(queryset[self.offset:self.offset + wanted])
+        if len(orders) < wanted:
+            # past the recent orders, the offset in the archive is what's left of the page offset
+            skipped = self.offset - queryset.count() if not orders and self.offset else 0
+            archived = view.get_archived_queryset()
+            orders += list(archived[skipped:skipped + wanted - len(orders)])
+
+        self.has_next = len(orders) > self.limit
+        return orders[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        del schema['properties']['count']
+        schema['required'] = ['results']
+        return schema
@@ -1,21 +1,22 @@
-from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.db.models import Exists, OuterRef
 
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
+
 from .models import Order, OrderItem
-from products.models import Product
 from cart.models import Cart, CartItem
 
 
-class OrderItemProductSerializer(serializers.ModelSerializer):
+class OrderItemProductSerializer(serializers.Serializer):
     """
-    Serializer for the Product model, used within OrderItemSerializer.
-    Serializes the 'id', 'title', and 'thumbnail' fields of the Product.
+    Serializer for the product snapshot of an OrderItem, used within OrderItemSerializer.
+    Serializes the 'id', 'title', and 'thumbnail' of the Product as it was bought, without loading the Product.
     """
-    class Meta:
-        model = Product
-        fields = ['id', 'title', 'thumbnail', ]
+    id = serializers.IntegerField(source='product_id')
+    title = serializers.CharField()
+    thumbnail = serializers.ImageField()
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -23,14 +24,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
     Serializer for the OrderItem model.
     Includes the nested OrderItemProductSerializer to serialize the product details.
     """
-    product = OrderItemProductSerializer()
+    product = OrderItemProductSerializer(source='*')
 
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'price', ]
 
 
-class OrderSerailizer(serializers.ModelSerializer):
+class OrderSerailizer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Order model.
     Includes the nested OrderItemSerializer to serialize order items details.
@@ -51,40 +52,40 @@ class OrderCreateSerializer(serializers.Serializer):
 
     # validate method to check the validity of cart_id
     def validate_cart_id(self, cart_id):
-        try:
-            if Cart.objects.prefetch_related('items').get(id=cart_id).items.count() == 0:
-                raise serializers.ValidationError('your cart is empty.')
-        except Cart.DoesNotExist:
+        cart = Cart.objects.filter(id=cart_id).annotate(
+            has_items=Exists(CartItem.objects.filter(cart_id=OuterRef('pk')))
+        ).values('has_items').first()
+        if cart is None:
             raise serializers.ValidationError('there is no cart with this cart id.')
+        if not cart['has_items']:
+            raise serializers.ValidationError('your cart is empty.')
         return cart_id
     
     # save method to create an order from the cart
     def save(self, **kwargs):
         cart_id = self.validated_data['cart_id']
         user_id = self.context['user_id']
-        user = get_user_model().objects.get(id=user_id)
 
         with transaction.atomic():
-            order = Order()
-            order.user = user
-            order.save()
-
-            cart_items = CartItem.objects.filter(cart_id=cart_id)
-            order.total_price = sum([item.product.price for item in cart_items])
-            order.save()
+            # a constant number of queries whatever the number of items
+            cart_items = list(CartItem.objects.filter(cart_id=cart_id).select_related('product'))
+            order = Order.objects.create(
+                user_id=user_id,
+                total_price=sum([item.product.price for item in cart_items])
+            )
             # Create a list of order items based on the cart items
             order_items = [
                 OrderItem(
                     order=order,
                     product=cart_item.product,
                     price=cart_item.product.price,
+                    title=cart_item.product.title,
+                    thumbnail=cart_item.product.thumbnail.name,
                 ) for cart_item in cart_items
             ]
 
             OrderItem.objects.bulk_create(order_items)
 
-            for item in cart_items:
-                item.delete()
+            CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
 
             return order
-        
\ No newline at end of file
@@ -1,14 +1,23 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from datetime import timedelta
+from io import StringIO
 from uuid import uuid4
 
-from .models import Order, OrderItem
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
 from products.models import Product
-from cart.models import CartItem
+from cart.models import Cart, CartItem
+from core.testing import QueryBudgetMixin
+from payments.models import Gateway, PaymentRequest
 
 
 #################################################
@@ -30,7 +39,7 @@ class OrderTests(TestCase):
             title='Test CopyTrader', price=100,
             thumbnail='https://picsum.photos/200/300'
         )
-        self.cart = self.user.cart
+        self.cart = Cart.objects.create(user=self.user)
 
     def test_create_order(self):
         # Test creating an order and verifying the response and database changes
@@ -53,6 +62,19 @@ class OrderTests(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['total_price'], 100)
 
+    def test_order_history_shows_products_as_bought(self):
+        CartItem.objects.create(cart=self.cart, product=self.product)
+        self.client.post('/orders/', {'cart_id': self.cart.id})
+        Product.objects.filter(id=self.product.id).update(title='Renamed', thumbnail='')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/orders/')
+        product = response.data[0]['items'][0]['product']
+        self.assertEqual(product['id'], self.product.id)
+        self.assertEqual(product['title'], 'Test CopyTrader')
+        self.assertIsNotNone(product['thumbnail'])
+        self.assertFalse(any('products_product' in query['sql'] for query in queries.captured_queries))
+
     def test_empty_cart_validation(self):
         # Test validation when trying to create an order with an empty cart
         response = self.client.post('/orders/', {'cart_id': self.cart.id})
@@ -67,6 +89,104 @@ class OrderTests(TestCase):
         self.assertEqual(response.data['cart_id'][0], 'there is no cart with this cart id.')
 
 
+class OrderQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(title=f'Test Product {number}', price=100, thumbnail='https://picsum.photos/200/300')
+            for number in range(5)
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_price=500)
+            OrderItem.objects.bulk_create([OrderItem(order=order, product=product, price=100) for product in self.products])
+
+    def test_list_orders_queries(self):
+        self.create_orders(1)
+        response = self.assertConstantQueries(
+            'GET orders-list', lambda: self.client.get(reverse('orders-list')), lambda: self.create_orders(3)
+        )
+        self.assertEqual(len(response.data), 4)
+
+    def test_retrieve_order_queries(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        self.assertQueryBudget('GET orders-detail', lambda: self.client.get(reverse('orders-detail', args=[order.id])))
+
+    def test_create_order_queries(self):
+        CartItem.objects.create(cart=self.cart, product=self.products[0])
+
+        def fill_cart():
+            CartItem.objects.bulk_create([CartItem(cart=self.cart, product=product) for product in self.products])
+
+        response = self.assertConstantQueries(
+            'POST orders-list', lambda: self.client.post(reverse('orders-list'), {'cart_id': self.cart.id}), fill_cart
+        )
+        self.assertEqual(len(response.data['items']), 5)
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='testuser', password='password')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(title='Test Product', price=100)
+
+    def create_order(self, days_ago, status=Order.ORDER_STATUS_PAID):
+        order = Order.objects.create(user=self.user, total_price=100, status=status)
+        OrderItem.objects.create(order=order, product=self.product, price=100)
+        Order.objects.filter(id=order.id).update(datetime_created=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_archive_moves_settled_orders(self):
+        old = self.create_order(400)
+        pending = self.create_order(400, Order.ORDER_STATUS_PENDING)
+        requested = self.create_order(400, Order.ORDER_STATUS_UNPAID)
+        gateway = Gateway.objects.create(name='Gateway', is_active=True, description='test gateway')
+        PaymentRequest.objects.create(user=self.user, gateway=gateway, order=requested)
+        recent = self.create_order(10)
+
+        call_command('archive_orders', '--days=365', '--batch-size=1', stdout=StringIO())
+
+        self.assertEqual(list(ArchivedOrder.objects.values_list('id', flat=True)), [old.id])
+        self.assertEqual(ArchivedOrderItem.objects.get().order_id, old.id)
+        self.assertCountEqual(Order.objects.values_list('id', flat=True), [pending.id, requested.id, recent.id])
+
+    def test_history_reads_the_archive_past_the_recent_orders(self):
+        archived = [self.create_order(400 + day) for day in range(2)]
+        recent = [self.create_order(day) for day in range(3)]
+        call_command('archive_orders', stdout=StringIO())
+        newest_first = [order.id for order in recent + archived]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders-list'), {'limit': 2})
+        self.assertEqual([order['id'] for order in response.data['results']], newest_first[:2])
+        self.assertIsNotNone(response.data['next'])
+        self.assertFalse(any('archivedorder' in query['sql'] for query in queries.captured_queries))
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([order['id'] for order in response.data['results']], newest_first[2:4])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([order['id'] for order in response.data['results']], newest_first[4:])
+        self.assertIsNone(response.data['next'])
+
+        # the default page doesn't read the archive either
+        with override_settings(ORDER_HISTORY_PAGE_SIZE=2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders-list'), {'offset': 0})
+        self.assertEqual([order['id'] for order in response.data['results']], newest_first[:2])
+        self.assertFalse(any('archivedorder' in query['sql'] for query in queries.captured_queries))
+
+        # without page parameters the whole history is still a list
+        response = self.client.get(reverse('orders-list'))
+        self.assertEqual([order['id'] for order in response.data], newest_first)
+        response = self.client.get(reverse('orders-detail', args=[archived[0].id]))
+        self.assertEqual(response.data['items'][0]['product']['id'], self.product.id)
+
+
 #################################################
 #                                               #
 #                                               #
@@ -137,3 +257,89 @@ class OrderItemModelTest(TestCase):
         self.assertEqual(order_item.order, self.order)
         self.assertEqual(order_item.product, self.product)
         self.assertEqual(order_item.price, 100)
+
+    def test_order_item_snapshots_product(self):
+        # Test that items added outside checkout, e.g. from the admin, keep their product title and thumbnail
+        order_item = OrderItem.objects.create(order=self.order, product=self.product, price=100)
+        self.assertEqual(order_item.title, self.product.title)
+        self.assertEqual(order_item.thumbnail.name, self.product.thumbnail.name)
+
+        Product.objects.filter(id=self.product.id).update(title='Renamed')
+        order_item.refresh_from_db()
+        order_item.save()
+        self.assertEqual(order_item.title, 'Test CopyTrader')
+
+
+#################################################
+#                                               #
+#                                               #
+#              Admin Test Cases                 #
+#                                               #
+#                                               #
+#################################################
+
+
+class OrderAdminQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', phone_number='+989123456780', password='password'
+        )
+        self.client.force_login(self.admin)
+        self.order = Order.objects.create(user=self.admin)
+
+    def create_items(self, count, order=None):
+        for number in range(count):
+            index = get_user_model().objects.count()
+            user = get_user_model().objects.create_user(username=f'user{index}', phone_number=f'+98912000{index:04d}')
+            product = Product.objects.create(title=f'Test Product {number}', price=10)
+            OrderItem.objects.create(order=order or Order.objects.create(user=user), product=product, price=10)
+
+    def test_order_changelist_queries(self):
+        self.assertConstantQueries(
+            'GET admin:orders_order_changelist',
+            lambda: self.client.get(reverse('admin:orders_order_changelist')), lambda: self.create_items(5)
+        )
+
+    def test_order_item_changelist_queries(self):
+        self.create_items(1)
+        self.assertConstantQueries(
+            'GET admin:orders_orderitem_changelist',
+            lambda: self.client.get(reverse('admin:orders_orderitem_changelist')), lambda: self.create_items(5)
+        )
+
+    def test_order_change_queries(self):
+        self.create_items(1, self.order)
+        url = reverse('admin:orders_order_change', args=[self.order.id])
+        # warms up the content types cache
+        self.client.get(url)
+        response = self.assertConstantQueries(
+            'GET admin:orders_order_change', lambda: self.client.get(url), lambda: self.create_items(5, self.order)
+        )
+        # products are picked with the autocomplete widget instead of a select of the whole catalog
+        self.assertNotContains(response, 'Test Product 4</option>')
+
+    def test_add_order_item_inline(self):
+        product = Product.objects.create(title='Added Product', price=25)
+        url = reverse('admin:orders_order_change', args=[self.order.id])
+        response = self.client.post(url, {
+            'user': self.admin.pk,
+            'total_price': 0,
+            'status': self.order.status,
+            'gateway': self.order.gateway,
+            'gateway_track_id': '',
+            'datetime_created_0': '2024-01-01',
+            'datetime_created_1': '00:00:00',
+            'items-TOTAL_FORMS': '0',
+            'items-INITIAL_FORMS': '0',
+            'items-MIN_NUM_FORMS': '0',
+            'items-MAX_NUM_FORMS': '1000',
+            'items-2-TOTAL_FORMS': '1',
+            'items-2-INITIAL_FORMS': '0',
+            'items-2-MIN_NUM_FORMS': '0',
+            'items-2-MAX_NUM_FORMS': '1000',
+            'items-2-0-product': product.pk,
+            'items-2-0-price': 25,
+        })
+        self.assertEqual(response.status_code, 302)
+        item = OrderItem.objects.get(order=self.order)
+        self.assertEqual((item.product, item.price, item.title), (product, 25, 'Added Product'))
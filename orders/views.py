@@ -1,37 +1,78 @@
+from django.http import Http404
+
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 from rest_framework import status
 
+from core.replicas import ReplicaReadMixin
+
 from . import serializers
 from . import models
+from .pagination import OrderHistoryPagination
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(ReplicaReadMixin, ModelViewSet):
     """
     ViewSet for managing Orders.
     Supports 'GET' to retrieve authenticatend user`s orders and 'POST' to create a new order from cart.
+    Orders are read from the replicas, except right after the user created one.
+    The history lists recent orders first, archived orders are read once pages reach them.
     """
     http_method_names = ['get', 'post', ]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.OrderSerailizer
+    pagination_class = OrderHistoryPagination
     
     def get_queryset(self):
         """
-        Retrieves the queryset of Orders for the authenticated user.
-        Prefetches related items and products for optimization.
+        Retrieves the queryset of Orders for the authenticated user, newest first.
+        Prefetches related items, which hold the product details they are shown with.
         """
-        queryset = models.Order.objects.prefetch_related(
-            'items__product'
-        ).filter(user_id=self.request.user)
+        if getattr(self, 'swagger_fake_view', False):
+            # the schema is generated without a request
+            return models.Order.objects.none()
+        queryset = models.Order.objects.prefetch_related('items').filter(
+            user_id=self.request.user.id
+        ).order_by('-datetime_created', '-id')
         return queryset
+
+    def get_archived_queryset(self):
+        """
+        Retrieves the archived Orders of the authenticated user, newest first, prefetched like the recent ones.
+        """
+        return models.ArchivedOrder.objects.prefetch_related('items').filter(
+            user_id=self.request.user.id
+        ).order_by('-datetime_created', '-id')
+
+    def get_object(self):
+        """
+        Looks the order up in the archive when it isn't a recent one.
+        """
+        try:
+            return super().get_object()
+        except Http404:
+            order = get_object_or_404(self.get_archived_queryset(), pk=self.kwargs['pk'])
+            self.check_object_permissions(self.request, order)
+            return order
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists a page of the user`s order history, or the whole history when no page is asked for.
+        """
+        page = self.paginate_queryset(self.get_queryset())
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        orders = [*self.get_queryset(), *self.get_archived_queryset()]
+        return Response(self.get_serializer(orders, many=True).data)
     
     def get_serializer_class(self):
         """
-        Returns the appropriate serializer class based on the request method.
+        Returns the appropriate serializer class based on the action.
         Uses OrderCreateSerializer for 'POST' requests and OrderSerailizer for 'GET' requests.
         """
-        if self.request.method == 'POST':
+        if self.action == 'create':
             return serializers.OrderCreateSerializer
         return serializers.OrderSerailizer
     
@@ -39,6 +80,9 @@ class OrderViewSet(ModelViewSet):
         """
         Provides additional context to the serializer, specifically the user ID.
         """
+        if getattr(self, 'swagger_fake_view', False):
+            # the schema is generated without a request
+            return {}
         return {'user_id': self.request.user.id}
     
     def create(self, request, *args, **kwargs):
@@ -53,5 +97,6 @@ class OrderViewSet(ModelViewSet):
         create_order_serializer.is_valid(raise_exception=True)
         created_order = create_order_serializer.save()
 
-        serializer = serializers.OrderSerailizer(created_order)
+        # the items are prefetched instead of loaded one by one
+        serializer = serializers.OrderSerailizer(self.get_queryset().get(pk=created_order.pk))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,141 @@
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.ratelimit import cache_lock
+
+
+DEFAULTS = {
+    # share of failed calls inside the window that trips the breaker
+    'FAILURE_RATE_THRESHOLD': 0.5,
+    # number of calls inside the window before the failure rate is considered
+    'MINIMUM_CALLS': 5,
+    # calls slower than this many seconds are counted as failures
+    'SLOW_CALL_THRESHOLD': 5,
+    # length of the rolling window in seconds
+    'WINDOW': 60,
+    # seconds an open breaker waits before letting a probe request through
+    'RECOVERY_TIMEOUT': 30,
+    # hide gateways with an open breaker from the gateways list
+    'HIDE_UNHEALTHY': True,
+}
+
+
+def get_config():
+    config = DEFAULTS.copy()
+    config.update(getattr(settings, 'PAYMENT_GATEWAY_CIRCUIT_BREAKER', {}))
+    return config
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of a remote service and short-circuits calls to it while it is failing.
+
+    The breaker is `closed` while the service is healthy. Once the failure rate inside the
+    rolling window crosses the threshold it becomes `open` and calls are rejected without
+    touching the network. After `RECOVERY_TIMEOUT` seconds it is `half_open`: a single probe
+    request is let through and its outcome either closes the breaker or opens it again.
+    Outcomes of calls let through before the breaker opened are ignored until it closes.
+    The state is kept in the default cache so every worker sharing the cache sees it, its
+    updates are serialized by a `cache_lock`.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    lock_timeout = 5
+
+    def __init__(self, name):
+        self.name = name
+        self.config = get_config()
+        self.state_key = f'circuit_breaker:{name}'
+        self.probe_key = f'circuit_breaker:{name}:probe'
+        self.lock_key = f'circuit_breaker:{name}:lock'
+
+    def _load(self):
+        return cache.get(self.state_key) or {
+            'state': self.CLOSED,
+            'calls': 0,
+            'failures': 0,
+            'window_start': time.time(),
+            'opened_at': None,
+        }
+
+    def _save(self, data):
+        cache.set(self.state_key, data, timeout=None)
+
+    def _open(self, data):
+        data.update(state=self.OPEN, opened_at=time.time(), calls=0, failures=0)
+        self._save(data)
+        cache.delete(self.probe_key)
+
+    def _reset(self):
+        cache.delete_many([self.state_key, self.probe_key])
+
+    def _record(self, failed, permit):
+        with cache_lock(self.lock_key, self.lock_timeout):
+            self._update(failed, permit)
+
+    def _update(self, failed, permit):
+        data = self._load()
+
+        # only the probe request of a half open breaker decides its next state, a call that
+        # started before the breaker opened says nothing about the service since
+        if data['state'] != self.CLOSED:
+            if not permit or cache.get(self.probe_key) != permit:
+                return
+            if failed:
+                self._open(data)
+            else:
+                self._reset()
+            return
+
+        now = time.time()
+        if now - data['window_start'] >= self.config['WINDOW']:
+            data.update(calls=0, failures=0, window_start=now)
+
+        data['calls'] += 1
+        if failed:
+            data['failures'] += 1
+
+        if (
+            data['calls'] >= self.config['MINIMUM_CALLS']
+            and data['failures'] / data['calls'] >= self.config['FAILURE_RATE_THRESHOLD']
+        ):
+            self._open(data)
+        else:
+            self._save(data)
+
+    @property
+    def state(self):
+        data = self._load()
+        if data['state'] == self.OPEN and time.time() - data['opened_at'] >= self.config['RECOVERY_TIMEOUT']:
+            return self.HALF_OPEN
+        return data['state']
+
+    def allow_request(self):
+        """
+        Returns a permit, truthy if a call to the service may be made right now, to pass back
+        with the outcome of the call. While half open only one caller gets the probe slot,
+        its permit is the probe id.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        probe = uuid4().hex
+        if cache.add(self.probe_key, probe, timeout=self.config['RECOVERY_TIMEOUT']):
+            return probe
+        return False
+
+    def record_success(self, duration=0, permit=True):
+        self._record(duration >= self.config['SLOW_CALL_THRESHOLD'], permit)
+
+    def record_failure(self, permit=True):
+        self._record(True, permit)
+
+
+def get_gateway_breaker(gateway):
+    return CircuitBreaker(f'gateway:{gateway.pk}')
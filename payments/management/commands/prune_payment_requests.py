@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.models import PaymentRequest
+
+
+class Command(BaseCommand):
+    help = 'Deletes payment requests older than the retention period in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.PAYMENT_REQUEST_RETENTION_DAYS,
+            help='Keep payment requests of the last N days.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows deleted per query.'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = 0
+
+        # delete in small batches to keep transactions and locks short on a large table
+        while True:
+            ids = list(
+                PaymentRequest.objects.filter(timestamp__lt=cutoff)
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            PaymentRequest.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'deleted {deleted} payment requests older than {cutoff}.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_alter_gateway_logo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentrequest',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from rest_framework import serializers
+
+from core.metrics import TimedSerializerMixin
+
 from .models import Gateway
+from .circuit_breaker import get_gateway_breaker
 
 # Serializer to handle creation of Payment Gateway
 # It takes `order_id` and `gateway_id` as input fields.
@@ -8,8 +12,14 @@ class CreatePaymentGateway(serializers.Serializer):
     gateway_id = serializers.IntegerField()
 
 # Serializer for the `Gateway` model
-# It serializes the `id`, `name`, `description`, and `logo` fields of the `Gateway` model.
-class GatewaySerializer(serializers.ModelSerializer):
+# It serializes the `id`, `name`, `description`, and `logo` fields of the `Gateway` model
+# and the `health` of the gateway as reported by its circuit breaker.
+class GatewaySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    health = serializers.SerializerMethodField()
+
     class Meta:
         model = Gateway
-        fields = ['id', 'name', 'description', 'logo']
\ No newline at end of file
+        fields = ['id', 'name', 'description', 'logo', 'health']
+
+    def get_health(self, gateway):
+        return get_gateway_breaker(gateway).state
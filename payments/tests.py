@@ -1,16 +1,29 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
 from django.utils import timezone
 from django.test import TestCase
 
+from datetime import timedelta
+from io import StringIO
+
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 
 from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
 
 from orders.models import Order
 from payments.models import PaymentRequest
 from .serializers import CreatePaymentGateway, Gateway
+from .circuit_breaker import CircuitBreaker, get_gateway_breaker
+from .utils import _save_payment_result
+from .views import PaymentProcessView
+from core.tokens import RefreshToken
+from core.ratelimit import get_limiter
+from core.testing import QueryBudgetMixin
 
 
 #################################################
@@ -72,6 +85,9 @@ class PaymentProcessViewTests(APITestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
         self.url = reverse('payment_process')
+        # rate limits are kept in the cache
+        cache.clear()
+        self.addCleanup(cache.clear)
 
     def test_order_not_found(self):
         # Test case for when the specified order is not found
@@ -109,13 +125,23 @@ class PaymentProcessViewTests(APITestCase):
         self.assertIn('paylink', response.data)
         self.assertTrue(PaymentRequest.objects.filter(user=self.user, order=self.order).exists())
 
+    @patch.object(PaymentProcessView, 'authentication_classes', [JWTStatelessUserAuthentication])
+    def test_gateway_description_names_stateless_user(self):
+        # the token only carries the user id, the description still names the user
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {RefreshToken.for_user(self.user).access_token}')
+        gateway_response = {'result': 100, 'message': 'success', 'trackId': '1', 'payLink': 'https://pay.example'}
+        with patch('payments.utils._post_json', return_value=gateway_response) as post_json:
+            response = self.client.post(
+                self.url, {'order_id': self.order.id, 'gateway_id': self.gateway.id}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(post_json.call_args.args[1]['description'], f'User: testuser for order: {self.order.id}')
+        self.assertTrue(PaymentRequest.objects.filter(user=self.user, order=self.order).exists())
+
     def test_create_payment_request_too_many_requests(self):
         # Test case for making too many payment requests within 60 minutes
-        PaymentRequest.objects.create(
-            user=self.user, order=self.order,
-            gateway=self.gateway,
-            timestamp=timezone.now()
-        )
+        get_limiter('payment').hit(f'payment:{self.user.pk}:{self.order.id}:{self.gateway.id}')
 
         data = {
             'order_id': self.order.id,
@@ -126,6 +152,18 @@ class PaymentProcessViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
         self.assertEqual(response.data['message'], 'you can only make a payment request for each order once every 60 minutes.')
 
+    def test_rate_limit_ignores_id_spelling(self):
+        # Test case for ids sent as strings sharing the limit of the same ids sent as numbers
+        get_limiter('payment').hit(f'payment:{self.user.pk}:{self.order.id}:{self.gateway.id}')
+
+        data = {
+            'order_id': str(self.order.id),
+            'gateway_id': str(self.gateway.id)
+        }
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
     def test_create_payment_request_already_paid(self):
         # Test case for creating a payment request for an already paid order
         self.order.is_paid = True
@@ -223,8 +261,145 @@ class PaymentCallbackViewTests(APITestCase):
             
             self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
             self.assertEqual(response.data['message'], 'transaction failed.')
+
+    def test_failed_callback_after_success_keeps_order_paid(self):
+        # This test checks that a failed callback racing a successful one doesn't mark the order unpaid.
+        _save_payment_result(self.track_id, True, '{}')
+        _save_payment_result(self.track_id, False, '{}')
+
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(self.order.status, Order.ORDER_STATUS_PAID)
         
 
+class GatewayCircuitBreakerTests(APITestCase):
+
+    def setUp(self):
+        # Initial setup for each test, breaker state lives in the cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(
+            username='testuser', 
+            password='password123'
+        )
+        self.order = Order.objects.create(user=self.user, total_price=1000)
+        self.gateway = Gateway.objects.create(
+            name='Gateway 1', is_active=True, 
+            description='test gateway', logo='https://picsum.photos/200/300'
+        )
+        self.breaker = get_gateway_breaker(self.gateway)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def trip_breaker(self):
+        for _ in range(self.breaker.config['MINIMUM_CALLS']):
+            self.breaker.record_failure()
+
+    def test_breaker_opens_after_failures(self):
+        # Test case for the breaker opening once the failure rate crosses the threshold
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.trip_breaker()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_slow_calls_count_as_failures(self):
+        # Test case for calls slower than the threshold tripping the breaker
+        for _ in range(self.breaker.config['MINIMUM_CALLS']):
+            self.breaker.record_success(self.breaker.config['SLOW_CALL_THRESHOLD'])
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_allows_single_probe(self):
+        # Test case for a single probe after the recovery timeout and closing on its success
+        self.trip_breaker()
+        with patch('payments.circuit_breaker.time.time') as mock_time:
+            mock_time.return_value = cache.get(self.breaker.state_key)['opened_at'] + self.breaker.config['RECOVERY_TIMEOUT']
+
+            self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+            probe = self.breaker.allow_request()
+            self.assertTrue(probe)
+            self.assertFalse(self.breaker.allow_request())
+
+            self.breaker.record_success(permit=probe)
+            self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_only_the_probe_changes_an_open_breaker(self):
+        # Test case for late outcomes of calls let through before the breaker opened
+        permit = self.breaker.allow_request()
+        self.trip_breaker()
+        opened_at = cache.get(self.breaker.state_key)['opened_at']
+
+        self.breaker.record_success(permit=permit)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with patch('payments.circuit_breaker.time.time', return_value=opened_at + 1):
+            self.breaker.record_failure(permit)
+        self.assertEqual(cache.get(self.breaker.state_key)['opened_at'], opened_at)
+
+        with patch('payments.circuit_breaker.time.time') as mock_time:
+            mock_time.return_value = opened_at + self.breaker.config['RECOVERY_TIMEOUT']
+            probe = self.breaker.allow_request()
+            self.breaker.record_success(permit=permit)
+            self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+            self.breaker.record_failure(probe)
+            self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_concurrent_outcomes_are_all_counted(self):
+        # Test case for failures recorded by concurrent workers not overwriting each other
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: self.breaker.record_success(), range(20)))
+        self.assertEqual(cache.get(self.breaker.state_key)['calls'], 20)
+
+    def test_payment_process_fails_fast_when_open(self):
+        # Test case for rejecting a payment request without calling the gateway
+        self.trip_breaker()
+        data = {
+            'order_id': self.order.id,
+            'gateway_id': self.gateway.id
+        }
+        with patch('payments.utils.oxapay_create_payment_gateway_request') as mock:
+            response = self.client.post(reverse('payment_process'), data, format='json')
+
+            mock.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_gateway_list_hides_unhealthy_gateways(self):
+        # Test case for leaving gateways with an open breaker out of the list
+        self.trip_breaker()
+        healthy_gateway = Gateway.objects.create(
+            name='Gateway 2', is_active=True, 
+            description='test gateway', logo='https://picsum.photos/200/300'
+        )
+        response = self.client.get(reverse('gateways_list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([gateway['id'] for gateway in response.data], [healthy_gateway.id])
+        self.assertEqual(response.data[0]['health'], CircuitBreaker.CLOSED)
+
+
+class GatewayListQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(username='testuser', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_gateways(self, count):
+        for number in range(count):
+            Gateway.objects.create(
+                name=f'Gateway {number}', is_active=True,
+                description='test gateway', logo='https://picsum.photos/200/300'
+            )
+
+    def test_list_gateways_queries(self):
+        self.create_gateways(1)
+        response = self.assertConstantQueries(
+            'GET gateways_list', lambda: self.client.get(reverse('gateways_list')), lambda: self.create_gateways(4)
+        )
+        self.assertEqual(len(response.data), 5)
+
+
 #################################################
 #                                               #
 #                                               #
@@ -319,3 +494,28 @@ class PaymentRequestModelTest(TestCase):
         # Test case for the __str__ method of PaymentRequest model
         expected_str = f'{self.user.username} - {self.payment_request.timestamp}'
         self.assertEqual(str(self.payment_request), expected_str)
+
+
+class PrunePaymentRequestsCommandTest(TestCase):
+
+    def setUp(self):
+        # Initial setup for each test
+        self.user = get_user_model().objects.create_user(
+            username='testuser', 
+            password='password123'
+        )
+        self.gateway = Gateway.objects.create(
+            name='Gateway 1', is_active=True, 
+            description='test gateway', logo='https://picsum.photos/200/300'
+        )
+        self.order = Order.objects.create(user=self.user, total_price=1000)
+
+    def test_prune_old_payment_requests(self):
+        # Test case for deleting only payment requests older than the retention period
+        old_request = PaymentRequest.objects.create(user=self.user, order=self.order, gateway=self.gateway)
+        PaymentRequest.objects.filter(id=old_request.id).update(timestamp=timezone.now() - timedelta(days=31))
+        recent_request = PaymentRequest.objects.create(user=self.user, order=self.order, gateway=self.gateway)
+
+        call_command('prune_payment_requests', days=30, batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(PaymentRequest.objects.values_list('id', flat=True)), [recent_request.id])
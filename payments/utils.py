@@ -1,12 +1,19 @@
-from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.conf import settings
+from django.utils import timezone
+
+from asgiref.sync import sync_to_async
+
+from core.async_views import run_io
 
 import requests
 import json
+import time
 
 from orders.models import Order
+from products import popularity
 from .models import PaymentRequest, Gateway
+from .circuit_breaker import get_gateway_breaker
 
 
 #################################################
@@ -18,12 +25,19 @@ from .models import PaymentRequest, Gateway
 #################################################
 
 
-def oxapay_create_payment_gateway_request(order: Order, gateway: Gateway, user):
+def _post_json(url, data):
+    response = requests.post(url, data=json.dumps(data), timeout=settings.PAYMENT_GATEWAY_TIMEOUT)
+    return response.json()
+
+
+async def oxapay_create_payment_gateway_request(order: Order, gateway: Gateway, user, permit=True):
     """
     This function initiates a payment request to the Oxapay payment gateway for a given order.
     It constructs the necessary data payload and sends a POST request to the Oxapay API.
     If the API response indicates success, it updates the order with the track ID, sets the order status to pending,
     and creates a PaymentRequest record. If the API response indicates failure, it returns an error message.
+    The outcome and latency of the call are reported to the gateway circuit breaker with the
+    `permit` its `allow_request` gave.
     """
     url = 'https://api.oxapay.com/merchants/request'
     data = {
@@ -32,35 +46,49 @@ def oxapay_create_payment_gateway_request(order: Order, gateway: Gateway, user):
         'lifeTime': 60,
         'feePaidByPayer': 1,
         'returnUrl': 'http://127.0.0.1:8000/payment/callback/',
-        'description': f'User: {order.user} for order: {order.id}',
+        'description': f'User: {user} for order: {order.id}',
         'orderId': order.id
     }
 
-    response = requests.post(url, data=json.dumps(data))
-    response = response.json()
+    breaker = get_gateway_breaker(gateway)
+    started = time.monotonic()
+    try:
+        response = await run_io(_post_json, url, data)
+    except (requests.RequestException, ValueError):
+        await sync_to_async(breaker.record_failure)(permit)
+        return {
+                'code': 400,
+                'message': 'someting is wrong. please call website support.'
+            }
+    await sync_to_async(breaker.record_success)(time.monotonic() - started, permit)
     
     if response['result'] == 100 and response['message'] == 'success':
-        with transaction.atomic():
-            order.gateway_track_id = response['trackId']
-            order.gateway = Order.OXAPAY_GATEWAY
-            order.status = Order.ORDER_STATUS_PENDING
-            order.save()
-            PaymentRequest.objects.create(
-                user=user,
-                gateway=gateway,
-                order=order
-            )
-            return {
-                    'code': 201,
-                    'paylink': response['payLink']
-            }
+        await sync_to_async(_save_payment_request)(order, gateway, user, response['trackId'])
+        return {
+                'code': 201,
+                'paylink': response['payLink']
+        }
     else:
         return {
                 'code': 400,
                 'message': 'someting is wrong. please call website support.'
             }
+
+
+def _save_payment_request(order, gateway, user, track_id):
+    with transaction.atomic():
+        order.gateway_track_id = track_id
+        order.gateway = Order.OXAPAY_GATEWAY
+        order.status = Order.ORDER_STATUS_PENDING
+        order.save()
+        PaymentRequest.objects.create(
+            user_id=user.pk,
+            gateway=gateway,
+            order=order
+        )
     
-def oxapay_payment_callback_handler(track_id):
+
+async def oxapay_payment_callback_handler(track_id):
     """
     This function handles the callback from the Oxapay payment gateway.
     It sends a POST request to the Oxapay API to inquire about the payment status of the given track ID.
@@ -73,29 +101,37 @@ def oxapay_payment_callback_handler(track_id):
         'trackId': track_id
     }
 
-    response = requests.post(url, data=json.dumps(data))
-    response = response.json()
+    response = await run_io(_post_json, url, data)
+    is_paid = response['result'] == 100 and response['status'] == 'Paid'
+    await sync_to_async(_save_payment_result)(track_id, is_paid, response)
 
-    order = get_object_or_404(Order, gateway_track_id=track_id)
-    
-    if response['result'] == 100 and response['status'] == 'Paid':
-        with transaction.atomic():
-            order.is_paid = True
-            order.status = Order.ORDER_STATUS_PAID
-            order.gateway_response = response
-            order.save()
+    if is_paid:
         return {
             'code': 200,
             'message': 'transaction success.',
             'track_id': track_id
         }
     else:
-        with transaction.atomic():
-            order.status = Order.ORDER_STATUS_UNPAID
-            order.save()
         return {
             'code': 400,
             'message': 'transaction failed.',
             'track_id': track_id
         }
-    
\ No newline at end of file
+
+
+def _save_payment_result(track_id, is_paid, response):
+    with transaction.atomic():
+        # locked so a repeated callback doesn't count the sales twice, and a failed one
+        # racing a successful one can't mark the paid order unpaid again
+        order = Order.objects.select_for_update().get(gateway_track_id=track_id)
+        if order.is_paid:
+            return
+        if is_paid:
+            order.datetime_paid = timezone.now()
+            popularity.record_sales(list(order.items.values_list('product_id', flat=True)))
+            order.is_paid = True
+            order.status = Order.ORDER_STATUS_PAID
+            order.gateway_response = response
+        else:
+            order.status = Order.ORDER_STATUS_UNPAID
+        order.save()
@@ -1,7 +1,3 @@
-from django.shortcuts import get_object_or_404
-from django.utils import timezone
-from django.db import transaction
-
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -10,17 +6,23 @@ from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from datetime import timedelta
+from asgiref.sync import sync_to_async
+
+from core.async_views import AsyncAPIView
+from core.ratelimit import rate_limit
+from core.replicas import ReplicaReadMixin
 
-from .models import PaymentRequest, Gateway
+from .models import Gateway
+from .circuit_breaker import CircuitBreaker, get_config, get_gateway_breaker
 from orders.models import Order
 from . import serializers
 from . import utils
 
 
-class GatewayListView(APIView):
+class GatewayListView(ReplicaReadMixin, APIView):
     """
-    View for list of active gateways
+    View for list of active gateways.
+    Gateways whose circuit breaker is open are left out when `HIDE_UNHEALTHY` is enabled.
     """
     http_method_names = ['get', ]
     permission_classes = [IsAuthenticated]
@@ -32,14 +34,27 @@ class GatewayListView(APIView):
 
     def get(self, request):
         gateways = Gateway.objects.filter(is_active=True).all()
+        if get_config()['HIDE_UNHEALTHY']:
+            gateways = [
+                gateway for gateway in gateways
+                if get_gateway_breaker(gateway).state != CircuitBreaker.OPEN
+            ]
         serializer = serializers.GatewaySerializer(gateways, many=True)
         return Response(serializer.data)
 
 
-class PaymentProcessView(APIView):
+def payment_rate_limit_key(request):
+    # one payment request per user, order and gateway, with the ids read like the view reads them so "5" and 5 match
+    serializer = serializers.CreatePaymentGateway(data=request.data)
+    data = serializer.validated_data if serializer.is_valid() else request.data
+    return f"{request.user.pk}:{data.get('order_id')}:{data.get('gateway_id')}"
+
+
+class PaymentProcessView(AsyncAPIView):
     """
     View for processing the payment.
     This view handles the creation of a payment request to the payment gateway.
+    Async as it mostly waits on the gateway.
     """
     http_method_names = ['post', ]
     permission_classes = [IsAuthenticated]
@@ -95,18 +110,32 @@ class PaymentProcessView(APIView):
                     'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=500),
                     'message': openapi.Schema(type=openapi.TYPE_STRING, example='something is wrong. please call website support.')
                 }
+            )),
+            503: openapi.Response('Service Unavailable', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description='Gateway is unhealthy and its circuit breaker is open.',
+                properties={
+                    'code': openapi.Schema(type=openapi.TYPE_INTEGER, example=503),
+                    'message': openapi.Schema(type=openapi.TYPE_STRING, example='gateway is temporarily unavailable. please try again later.')
+                }
             ))
         }
     )
-    def post(self, request):
+    @rate_limit(
+        'payment',
+        key=payment_rate_limit_key,
+        only_successful=True,
+        message='you can only make a payment request for each order once every 60 minutes.'
+    )
+    async def post(self, request):
         serializer = serializers.CreatePaymentGateway(data=request.data)
         serializer.is_valid(raise_exception=True)
         order_id = serializer.validated_data['order_id']
         gateway_id = serializer.validated_data['gateway_id']
         
         try:
-            order = Order.objects.get(id=order_id, user=request.user)
-            gateway = Gateway.objects.get(id=gateway_id)
+            order = await Order.objects.aget(id=order_id, user_id=request.user.id)
+            gateway = await Gateway.objects.aget(id=gateway_id)
         except Order.DoesNotExist:
             return Response(
                 {
@@ -138,26 +167,23 @@ class PaymentProcessView(APIView):
                 }, status=status.HTTP_405_METHOD_NOT_ALLOWED
             )
         
-        sixty_minutes_ago = timezone.now() - timedelta(minutes=60)
-        last_request = PaymentRequest.objects.filter(
-            user=request.user, 
-            timestamp__gte=sixty_minutes_ago,
-            gateway=gateway,
-            order=order
-        ).first()
-
-        if last_request:
+        # fail fast instead of waiting on a gateway that is known to be down
+        permit = await sync_to_async(get_gateway_breaker(gateway).allow_request)()
+        if not permit:
             return Response(
                 {
-                    'code': 429,
-                    'message': 'you can only make a payment request for each order once every 60 minutes.'
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS
+                    'code': 503,
+                    'message': 'gateway is temporarily unavailable. please try again later.'
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-        
-        gateway_response = utils.oxapay_create_payment_gateway_request(
+
+        # the gateway description names the user, stateless auth users only carry its id
+        user = await sync_to_async(getattr)(request.user, 'instance', request.user)
+        gateway_response = await utils.oxapay_create_payment_gateway_request(
             order=order, 
-            user=request.user,
+            user=user,
             gateway=gateway,
+            permit=permit,
         )
         if gateway_response['code'] == 201:
             return Response(
@@ -175,10 +201,11 @@ class PaymentProcessView(APIView):
         )
              
     
-class PeymentCallbackView(APIView):
+class PeymentCallbackView(AsyncAPIView):
     """
     View for handling payment callback.
     This view processes the callback from the payment gateway to update order status.
+    Async as it mostly waits on the gateway.
     """
     http_method_names = ['get', ]
 
@@ -224,42 +251,42 @@ class PeymentCallbackView(APIView):
             ))
         }
     )
-    def get(self, request):
-        with transaction.atomic():
-            try:
-                track_id = request.GET.get('trackId')
-                order = get_object_or_404(Order, gateway_track_id=track_id)
-            except:
-                return Response(
-                    {
-                        'code': 204,
-                        'message': 'something is wrong.'
-                    }, status=status.HTTP_204_NO_CONTENT
-                )
-            
-            if order.is_paid:
-                return Response(
-                    {
-                        'code': 405,
-                        'message': 'your order has already been paid.'
-                    }, status=status.HTTP_405_METHOD_NOT_ALLOWED
-                )
-            
-            gateway_response = utils.oxapay_payment_callback_handler(order.gateway_track_id)
+    async def get(self, request):
+        try:
+            track_id = request.GET.get('trackId')
+            order = await Order.objects.aget(gateway_track_id=track_id)
+        except:
+            return Response(
+                {
+                    'code': 204,
+                    'message': 'something is wrong.'
+                }, status=status.HTTP_204_NO_CONTENT
+            )
+        
+        if order.is_paid:
+            return Response(
+                {
+                    'code': 405,
+                    'message': 'your order has already been paid.'
+                }, status=status.HTTP_405_METHOD_NOT_ALLOWED
+            )
+        
+        # no transaction is held while waiting on the gateway, the order update has its own
+        gateway_response = await utils.oxapay_payment_callback_handler(order.gateway_track_id)
 
-            if gateway_response['code'] == 200:
-                return Response(
-                    {
-                        'code': 200,
-                        'message': 'transaction success.',
-                        'track_id': track_id
-                    }, status=status.HTTP_200_OK
-                )
-            else:
-                return Response(
-                    {
-                        'code': 400,
-                        'message': 'transaction failed.',
-                        'track_id': track_id
-                    }, status=status.HTTP_400_BAD_REQUEST
-                )
+        if gateway_response['code'] == 200:
+            return Response(
+                {
+                    'code': 200,
+                    'message': 'transaction success.',
+                    'track_id': track_id
+                }, status=status.HTTP_200_OK
+            )
+        else:
+            return Response(
+                {
+                    'code': 400,
+                    'message': 'transaction failed.',
+                    'track_id': track_id
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
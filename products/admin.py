@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from core.pagination import EstimatedCountPaginator
 
 from . import models
 
@@ -9,3 +10,5 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'price', 'offprice', 'exclusive', 'datetime_created', 'datetime_modified', ]
     list_display_links = ['title', ]
     search_fields = ['title', ]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the "customers also bought" recommendations from the products bought together in paid orders. '
+        'Run it periodically, e.g. nightly from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=settings.PRODUCT_RECOMMENDATIONS,
+            help='Recommendations kept per product.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=settings.PRODUCT_RECOMMENDATION_DAYS,
+            help='Only orders of the last days are used, 0 for all of them.'
+        )
+        parser.add_argument(
+            '--max-basket', type=int, default=50,
+            help='Orders with more items only count as sales, not as pairs.'
+        )
+        parser.add_argument(
+            '--min-support', type=int, default=2,
+            help='Orders two products must share to recommend each other.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per query.'
+        )
+
+    def handle(self, *args, **options):
+        count = recommendations.build(
+            options['top'], options['days'] or None, options['max_basket'], options['min_support'],
+            options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'built recommendations for {count} products.'))
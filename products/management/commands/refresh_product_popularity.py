@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from products import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves sales that left the rolling windows out of the product popularity table. '
+        'Run it daily, e.g. from cron, sales are added as orders are paid.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recompute everything from the paid orders instead, e.g. the first time.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per query.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            popularity.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('rebuilt product popularity from the paid orders.'))
+            return
+        changed = popularity.refresh_windows(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'updated the windows of {changed} products.'))
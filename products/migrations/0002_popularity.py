@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPopularity',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='products.product', verbose_name='Product')),
+                ('sales_7d', models.PositiveIntegerField(default=0, verbose_name='Sales in 7 days')),
+                ('sales_30d', models.PositiveIntegerField(default=0, verbose_name='Sales in 30 days')),
+                ('sales_total', models.PositiveIntegerField(default=0, verbose_name='Total Sales')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-sales_7d', 'product'], name='products_popularity_7d_idx'), models.Index(fields=['-sales_30d', 'product'], name='products_popularity_30d_idx'), models.Index(fields=['-sales_total', 'product'], name='products_popularity_total_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True, verbose_name='Day')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Units')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='products.product', verbose_name='Product')),
+            ],
+            options={
+                'unique_together': {('product', 'day')},
+            },
+        ),
+    ]
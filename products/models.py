@@ -25,3 +25,49 @@ class Product(models.Model):
 
     def __str__(self) -> str:
         return self.title
+
+
+class ProductDailySales(models.Model):
+    """
+    Units of a product sold per day, kept for the longest popularity window, see `products.popularity`.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales', verbose_name='Product')
+    day = models.DateField('Day', db_index=True)
+    units = models.PositiveIntegerField('Units', default=0)
+
+    class Meta:
+        unique_together = [['product', 'day']]
+
+
+class ProductPopularity(models.Model):
+    """
+    Units of a product sold over rolling windows, read by the best seller sorts of the product list.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='popularity', verbose_name='Product'
+    )
+    sales_7d = models.PositiveIntegerField('Sales in 7 days', default=0)
+    sales_30d = models.PositiveIntegerField('Sales in 30 days', default=0)
+    sales_total = models.PositiveIntegerField('Total Sales', default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-sales_7d', 'product'], name='products_popularity_7d_idx'),
+            models.Index(fields=['-sales_30d', 'product'], name='products_popularity_30d_idx'),
+            models.Index(fields=['-sales_total', 'product'], name='products_popularity_total_idx'),
+        ]
+
+
+class ProductRecommendation(models.Model):
+    """
+    Products often bought together with `product`, best first, built offline by `products.recommendations`.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations', verbose_name='Product')
+    recommended = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='+', verbose_name='Recommended Product'
+    )
+    rank = models.PositiveSmallIntegerField('Rank')
+    score = models.FloatField('Score')
+
+    class Meta:
+        unique_together = [['product', 'rank']]
@@ -0,0 +1,68 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import groupby, permutations
+from operator import itemgetter
+import heapq
+import math
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import OrderItem
+
+from .models import ProductRecommendation
+
+
+def count_co_purchases(days=None, max_basket=50, chunk_size=10000):
+    """
+    Streams the items of paid orders grouped by order and counts, as sparse counters, how many orders
+    contain each product and each pair of products. Baskets bigger than `max_basket` only count as sales,
+    their pairs grow quadratically and say little about what goes together.
+    """
+    items = OrderItem.objects.filter(order__is_paid=True)
+    if days:
+        items = items.filter(order__datetime_created__gte=timezone.now() - timedelta(days=days))
+    rows = items.order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=chunk_size)
+
+    sales = Counter()
+    pairs = defaultdict(Counter)
+    for _, basket in groupby(rows, key=itemgetter(0)):
+        products = [product_id for _, product_id in basket]
+        sales.update(products)
+        if 1 < len(products) <= max_basket:
+            for product_id, other_id in permutations(products, 2):
+                pairs[product_id][other_id] += 1
+    return sales, pairs
+
+
+def top_neighbors(sales, pairs, top_k, min_support=2):
+    """
+    Yields each product with its `top_k` neighbors by cosine similarity, so best sellers
+    don't top every list just for being in many orders. Pairs bought together less than
+    `min_support` times are ignored.
+    """
+    for product_id, others in pairs.items():
+        scored = (
+            (count / math.sqrt(sales[product_id] * sales[other_id]), other_id)
+            for other_id, count in others.items() if count >= min_support
+        )
+        neighbors = heapq.nlargest(top_k, scored)
+        if neighbors:
+            yield product_id, neighbors
+
+
+def build(top_k, days=None, max_basket=50, min_support=2, batch_size=1000):
+    """
+    Replaces the recommendations table with the neighbors computed from the paid orders.
+    Returns the number of products having recommendations.
+    """
+    sales, pairs = count_co_purchases(days, max_basket, batch_size * 10)
+    recommendations = [
+        ProductRecommendation(product_id=product_id, recommended_id=other_id, rank=rank, score=score)
+        for product_id, neighbors in top_neighbors(sales, pairs, top_k, min_support)
+        for rank, (score, other_id) in enumerate(neighbors, start=1)
+    ]
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(recommendations, batch_size=batch_size)
+    return len({recommendation.product_id for recommendation in recommendations})
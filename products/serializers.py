@@ -1,11 +1,45 @@
+from django.conf import settings
+
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
+
 
 from . import models
+from . import popularity
 
 
-class ProductSerilizer(serializers.ModelSerializer):
+class ProductSerilizer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Product
         fields = ['id', 'thumbnail', 'title', 'features', 'price', 'offprice', 'exclusive']
-    
\ No newline at end of file
+    
+
+class ProductRecommendationSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='recommended_id')
+    title = serializers.CharField(source='recommended.title')
+    thumbnail = serializers.ImageField(source='recommended.thumbnail')
+    price = serializers.IntegerField(source='recommended.price')
+    offprice = serializers.IntegerField(source='recommended.offprice')
+
+    class Meta:
+        model = models.ProductRecommendation
+        fields = ['id', 'thumbnail', 'title', 'price', 'offprice']
+
+
+class ProductDetailSerializer(ProductSerilizer):
+    recommendations = ProductRecommendationSerializer(many=True, read_only=True)
+
+    class Meta(ProductSerilizer.Meta):
+        fields = ProductSerilizer.Meta.fields + ['recommendations']
+
+
+class ProductListQuerySerializer(serializers.Serializer):
+    sort = serializers.ChoiceField(choices=list(popularity.RANKINGS), required=False)
+    limit = serializers.IntegerField(min_value=1, required=False)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_limit(self, limit):
+        if limit > settings.PRODUCT_RANKING_MAX_PAGE_SIZE:
+            raise serializers.ValidationError(f'limit can be at most {settings.PRODUCT_RANKING_MAX_PAGE_SIZE}.')
+        return limit
@@ -1,3 +1,156 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.testing import QueryBudgetMixin
+from orders.models import Order, OrderItem
+from payments.utils import _save_payment_result
+
+from . import popularity
+from . import recommendations
+from .models import Product, ProductDailySales, ProductPopularity
+
+
+#################################################
+#                                               #
+#                                               #
+#              Views Test Cases                 #
+#                                               #
+#                                               #
+#################################################
+
+
+class ProductQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_products(self, count):
+        return [
+            Product.objects.create(title=f'Test Product {number}', price=10, thumbnail='https://picsum.photos/200/300')
+            for number in range(count)
+        ]
+
+    def test_list_products_queries(self):
+        self.create_products(1)
+        response = self.assertConstantQueries(
+            'GET products_list', lambda: self.client.get(reverse('products_list')), lambda: self.create_products(5)
+        )
+        self.assertEqual(len(response.data), 6)
+
+    def test_product_detail_queries(self):
+        product, = self.create_products(1)
+        self.assertQueryBudget('GET product_detail', lambda: self.client.get(reverse('product_detail', args=[product.id])))
+
+
+class ProductPopularityTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', phone_number='+989123456789', password='password'
+        )
+        self.first, self.second, self.third = [
+            Product.objects.create(title=f'Test Product {number}', price=10) for number in range(3)
+        ]
+
+    def pay(self, *products, track_id):
+        order = Order.objects.create(user=self.user, gateway_track_id=track_id)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price)
+        _save_payment_result(track_id, True, {'result': 100, 'status': 'Paid'})
+
+    def popularity(self, product):
+        product = ProductPopularity.objects.get(product=product)
+        return product.sales_7d, product.sales_30d, product.sales_total
+
+    def test_paid_orders_rank_products(self):
+        self.pay(self.first, self.second, track_id='1')
+        self.pay(self.second, track_id='2')
+        # a repeated callback doesn't count the sales again
+        _save_payment_result('2', True, {'result': 100, 'status': 'Paid'})
+        self.assertEqual(self.popularity(self.second), (2, 2, 2))
+
+        response = self.assertQueryBudget(
+            'GET products_list', lambda: self.client.get(reverse('products_list'), {'sort': 'best_selling'})
+        )
+        self.assertEqual([product['id'] for product in response.data], [self.second.id, self.first.id])
+
+        response = self.client.get(reverse('products_list'), {'sort': 'best_selling_week', 'limit': 1, 'offset': 1})
+        self.assertEqual([product['id'] for product in response.data], [self.first.id])
+
+    def test_invalid_sort(self):
+        response = self.client.get(reverse('products_list'), {'sort': 'cheapest'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_windows(self):
+        today = timezone.localdate()
+        popularity.record_sales([self.first.id], day=today - timedelta(days=10))
+        popularity.record_sales([self.second.id], day=today)
+
+        popularity.refresh_windows(today)
+        self.assertEqual(self.popularity(self.first), (0, 1, 1))
+        self.assertEqual(self.popularity(self.second), (1, 1, 1))
+
+        popularity.refresh_windows(today + timedelta(days=30))
+        self.assertEqual(self.popularity(self.second), (0, 0, 1))
+        self.assertFalse(ProductDailySales.objects.exists())
+
+    def test_rebuild(self):
+        self.pay(self.first, self.second, track_id='1')
+        self.pay(self.second, track_id='2')
+        Order.objects.create(user=self.user).items.create(product=self.third, price=10)
+
+        popularity.rebuild()
+        self.assertEqual(self.popularity(self.second), (2, 2, 2))
+        self.assertEqual(self.popularity(self.first), (1, 1, 1))
+        self.assertFalse(ProductPopularity.objects.filter(product=self.third).exists())
+
+
+class ProductRecommendationTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username='testuser', phone_number='+989123456789', password='password'
+        )
+        self.book, self.course, self.video, self.podcast = [
+            Product.objects.create(title=f'Test Product {number}', price=10) for number in range(4)
+        ]
+
+    def order(self, *products, is_paid=True):
+        order = Order.objects.create(user=self.user, is_paid=is_paid)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price)
+
+    def test_customers_also_bought(self):
+        self.order(self.book, self.course, self.video)
+        self.order(self.book, self.course)
+        self.order(self.book, self.video)
+        self.order(self.book, self.course, self.podcast)
+        # unpaid orders aren't purchases
+        self.order(self.book, self.podcast, is_paid=False)
+
+        self.assertEqual(recommendations.build(top_k=2, min_support=1), 4)
+        response = self.assertQueryBudget(
+            'GET product_detail', lambda: self.client.get(reverse('product_detail', args=[self.book.id]))
+        )
+        self.assertEqual(
+            [product['id'] for product in response.data['recommendations']], [self.course.id, self.video.id]
+        )
+        self.assertEqual(
+            [recommendation.recommended_id for recommendation in self.podcast.recommendations.all()],
+            [self.course.id, self.book.id]
+        )
+
+    def test_min_support(self):
+        self.order(self.book, self.course)
+        self.order(self.book, self.course)
+        self.order(self.book, self.video)
 
-# Create your tests here.
+        recommendations.build(top_k=10, min_support=2)
+        response = self.client.get(reverse('product_detail', args=[self.book.id]))
+        self.assertEqual([product['id'] for product in response.data['recommendations']], [self.course.id])
@@ -1,44 +1,82 @@
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
 
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
 
+from core.replicas import ReplicaReadMixin
+
 from . import models
+from . import popularity
 from . import serializers
 
 
-class ProductListView(APIView):
+class ProductListView(ReplicaReadMixin, APIView):
     http_method_names = ['get', ]
     
     @swagger_auto_schema(
         operation_id='ProductsList',
+        manual_parameters=[
+            openapi.Parameter(
+                'sort', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(popularity.RANKINGS),
+                description='Best sellers of the last 30 days, 7 days or all time, in pages.'
+            ),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Page size.'),
+            openapi.Parameter('offset', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Products skipped.'),
+        ],
         responses={
             200: serializers.ProductSerilizer(many=True),
             400: 'Bad Request'
         }
     )
     def get(self, request):
-        queryset = models.Product.objects.all()
+        params = serializers.ProductListQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        sort = params.validated_data.get('sort')
+        limit = params.validated_data.get('limit')
+        offset = params.validated_data['offset']
+
+        if sort:
+            field, _ = popularity.RANKINGS[sort]
+            limit = limit or settings.PRODUCT_RANKING_PAGE_SIZE
+            # walks the popularity index for one page, products that didn't sell in the window are left out
+            queryset = models.Product.objects.filter(**{f'popularity__{field}__gt': 0}).order_by(
+                f'-popularity__{field}', 'popularity__product'
+            )
+        else:
+            queryset = models.Product.objects.order_by('id')
+        if limit:
+            queryset = queryset[offset:offset + limit]
+        elif offset:
+            queryset = queryset[offset:]
         serializer = serializers.ProductSerilizer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ProductDetailView(APIView):
+class ProductDetailView(ReplicaReadMixin, APIView):
     http_method_names = ['get', ]
     
     @swagger_auto_schema(
         operation_id='ProductDetail',
         responses={
-            200: serializers.ProductSerilizer(),
+            200: serializers.ProductDetailSerializer(),
             404: 'Not Found'
         }
     )
     def get(self, request, pk):
-        product = get_object_or_404(models.Product, pk=pk)
-        serializer = serializers.ProductSerilizer(product)
+        # one lookup on the (product, rank) index for the "customers also bought" products
+        recommendations = models.ProductRecommendation.objects.filter(
+            rank__lte=settings.PRODUCT_RECOMMENDATIONS
+        ).select_related('recommended').order_by('rank')
+        product = get_object_or_404(
+            models.Product.objects.prefetch_related(Prefetch('recommendations', queryset=recommendations)), pk=pk
+        )
+        serializer = serializers.ProductDetailSerializer(product)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
\ No newline at end of file